@@ -0,0 +1,88 @@
+"""Payload size and encode time of /api/fetch responses in each supported format.
+
+Builds fetch-shaped records in memory (no database needed) and compares the
+current list-of-objects JSON with gzip/brotli and the compact encodings:
+
+    python benchmarks/api_payloads.py
+"""
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from website.compression import to_columnar, brotli, msgpack  # noqa: E402
+
+SIZES = (1000, 10000, 100000)
+
+
+def make_records(n, seed=0):
+    rng = random.Random(seed)
+    farmers = [(str(uuid.UUID(int=rng.getrandbits(128))), f"Farmer {i}") for i in range(max(n // 50, 1))]
+    barangays = [f"Barangay {i}" for i in range(20)]
+    records = []
+    for i in range(n):
+        farmer_uuid, farmer_name = rng.choice(farmers)
+        records.append({
+            "uuid": str(uuid.UUID(int=rng.getrandbits(128))),
+            "batch_name": f"Batch {i}",
+            "initial_weight": round(rng.uniform(50, 500), 1),
+            "temperature": round(rng.uniform(26, 40), 1),
+            "humidity": round(rng.uniform(40, 90), 1),
+            "sensor_value": rng.randint(200, 900),
+            "initial_moisture": round(rng.uniform(20, 28), 1),
+            "final_moisture": round(rng.uniform(12, 15), 1),
+            "drying_time": f"{rng.randint(4, 60)} hours",
+            "drying_minutes": rng.randint(4, 60) * 60.0,
+            "final_weight": round(rng.uniform(40, 450), 1),
+            "date_planted": "2025-01-15",
+            "date_harvested": "2025-05-01",
+            "due_date": "2025-05-04",
+            "date_dried": "2025-05-03",
+            "farmer_id": i % 500,
+            "farmer_uuid": farmer_uuid,
+            "user_id": 1,
+            "barangay_id": i % 20,
+            "municipality_id": 1,
+            "farmer_name": farmer_name,
+            "barangay_name": barangays[i % 20],
+            "municipality_name": "Tagbilaran City",
+        })
+    return records
+
+
+def encoders():
+    yield 'json', lambda rows: json.dumps(rows).encode()
+    yield 'json+gzip', lambda rows: gzip.compress(json.dumps(rows).encode(), 6)
+    if brotli is not None:
+        yield 'json+br', lambda rows: brotli.compress(json.dumps(rows).encode(), quality=5)
+    yield 'columnar', lambda rows: json.dumps(to_columnar(rows), separators=(',', ':')).encode()
+    yield 'columnar+gzip', lambda rows: gzip.compress(json.dumps(to_columnar(rows), separators=(',', ':')).encode(), 6)
+    if brotli is not None:
+        yield 'columnar+br', lambda rows: brotli.compress(
+            json.dumps(to_columnar(rows), separators=(',', ':')).encode(), quality=5)
+    if msgpack is not None:
+        yield 'msgpack', lambda rows: msgpack.packb(to_columnar(rows), use_bin_type=True)
+        yield 'msgpack+gzip', lambda rows: gzip.compress(msgpack.packb(to_columnar(rows), use_bin_type=True), 6)
+
+
+def main():
+    for size in SIZES:
+        rows = make_records(size)
+        print(f"\n{size} records")
+        print(f"{'format':<15} {'bytes':>12} {'vs json':>8} {'encode':>10}")
+        baseline = None
+        for name, encode in encoders():
+            start = time.perf_counter()
+            body = encode(rows)
+            elapsed = (time.perf_counter() - start) * 1000
+            baseline = baseline or len(body)
+            print(f"{name:<15} {len(body):>12,} {len(body) / baseline:>7.1%} {elapsed:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Cold start cost: import time, app creation, first requests and gunicorn boot.
+
+Every sample is a fresh interpreter against a small seeded SQLite database, so
+nothing is cached between runs:
+
+    python benchmarks/cold_start.py --repeats 5 --importtime 15
+    python benchmarks/cold_start.py --gunicorn --workers 2
+
+The in-process probe times `import website`, `create_app()`, the optional
+warmup() hook and the first device-style API exchange (JSON login, then
+/api/bootstrap) and a repeat of it. --gunicorn also starts the server with
+preload/warmup on and off and times spawn until the first page is served and
+that first request's latency. Run the same command on two commits to compare.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sync_load import flask, free_port, stop_server  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'password'
+REPEATS = 5
+
+PROBE = r'''
+import json, os, time
+t0 = time.perf_counter()
+import website
+t1 = time.perf_counter()
+app = website.create_app()
+t2 = time.perf_counter()
+if os.environ.get('BENCH_WARMUP') == '1':
+    try:
+        from website.warmup import warmup
+    except ImportError:  # older commit
+        warmup = lambda app: None
+    warmup(app)
+t3 = time.perf_counter()
+client = app.test_client()
+login = client.post('/login', data={'email': os.environ['BENCH_EMAIL'], 'password': os.environ['BENCH_PASSWORD']},
+                    headers={'Accept': 'application/json'})
+t4 = time.perf_counter()
+client.get('/api/bootstrap').get_data()
+t5 = time.perf_counter()
+client.get('/api/fetch?farmer_uuid=none').get_data()
+t6 = time.perf_counter()
+assert login.status_code == 200, login.status_code
+ms = lambda a, b: round((b - a) * 1000, 1)
+print(json.dumps({'import': ms(t0, t1), 'create_app': ms(t1, t2), 'warmup': ms(t2, t3),
+                  'first_login': ms(t3, t4), 'first_api': ms(t4, t5), 'second_api': ms(t5, t6)}))
+'''
+
+
+def base_env(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, FLASK_APP='app.py', ADMISSION_CONTROL='0')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    return env
+
+
+def prepare(env):
+    flask(env, 'db', 'upgrade')
+    flask(env, 'seed', '--municipalities', '1', '--barangays', '2', '--farmers', '5',
+          '--records', '500', '--password', PASSWORD)
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(env['DATABASE_URL'])
+    with engine.connect() as conn:
+        email = conn.execute(text("SELECT email FROM users WHERE role = 'barangay' LIMIT 1")).scalar()
+    engine.dispose()
+    return email
+
+
+def probe(env, email, warm):
+    env = dict(env, BENCH_EMAIL=email, BENCH_PASSWORD=PASSWORD, BENCH_WARMUP='1' if warm else '0')
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def gunicorn_boot(env, email, workers, preload, warm):
+    """Milliseconds from spawn until /login answers, and that first login + bootstrap exchange."""
+    port = free_port()
+    env = dict(env, GUNICORN_PRELOAD='1' if preload else '0', WARMUP='1' if warm else '0')
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '-c', 'gunicorn.conf.py',
+               '--workers', str(workers), '--bind', f'127.0.0.1:{port}']
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        while True:
+            try:
+                requests.get(f'http://127.0.0.1:{port}/login', timeout=5)
+                break
+            except requests.RequestException:
+                if server.poll() is not None or time.perf_counter() - started > 60:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.02)
+        ready = (time.perf_counter() - started) * 1000
+
+        session = requests.Session()
+        first = time.perf_counter()
+        session.post(f'http://127.0.0.1:{port}/login', data={'email': email, 'password': PASSWORD},
+                     headers={'Accept': 'application/json'}, timeout=30).raise_for_status()
+        session.get(f'http://127.0.0.1:{port}/api/bootstrap', timeout=30).raise_for_status()
+        return ready, (time.perf_counter() - first) * 1000
+    finally:
+        stop_server(server)
+
+
+def import_profile(env, top):
+    """Modules with the largest cumulative import time for `import app`."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.replace('import time:', '', 1).split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    print("\nSlowest imports (cumulative ms) for `import app`:")
+    for cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f}  {name}")
+
+
+def summarize(samples):
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='also list the N slowest imports')
+    parser.add_argument('--gunicorn', action='store_true', help='also time gunicorn boot with preload/warmup on and off')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    env = base_env(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cold.db')}")
+    email = prepare(env)
+
+    print(f"{'median ms':<12}" + ''.join(f"{k:>12}" for k in
+          ('process', 'import', 'create_app', 'warmup', 'first_login', 'first_api', 'second_api')))
+    for warm in (False, True):
+        result = summarize([probe(env, email, warm) for _ in range(args.repeats)])
+        print(f"{'warmup' if warm else 'cold':<12}" + ''.join(f"{result[k]:>12.1f}" for k in
+              ('process', 'import', 'create_app', 'warmup', 'first_login', 'first_api', 'second_api')))
+
+    if args.importtime:
+        import_profile(env, args.importtime)
+
+    if args.gunicorn:
+        print(f"\ngunicorn, {args.workers} workers (median ms)")
+        print(f"{'preload':>8}{'warmup':>8}{'ready':>10}{'first req':>12}")
+        for preload, warm in ((False, False), (True, False), (True, True)):
+            runs = [gunicorn_boot(env, email, args.workers, preload, warm) for _ in range(args.repeats)]
+            print(f"{str(preload):>8}{str(warm):>8}{statistics.median(r[0] for r in runs):>10.0f}"
+                  f"{statistics.median(r[1] for r in runs):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Overhead of data-quality screening on large /api/sync batches.
+
+Seeds a database (see benchmarks/routes.py), then posts batches of fresh
+records for the busiest farmer with QUALITY_SCREENING off and on, taking turns
+going first so neither always meets the larger table. A share of each batch is
+corrupted the way devices corrupt it (final weight above initial, moisture over
+100, impossible temperatures, 100x weights) to exercise the quarantine path.
+Also times website.quality.screen() by itself with cold and warm barangay bounds:
+
+    python benchmarks/ingest_quality.py --records 10000 --repeats 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes import build_app, accounts  # noqa: E402
+
+SIZE = 20000
+RECORDS = 10000
+REPEATS = 3
+BAD_SHARE = 0.01
+
+
+def batch(rng, n, farmer_uuid, user_id, barangay_id, bad_share):
+    """n device records with values like the seed's, a `bad_share` of them corrupted."""
+    initial_moisture = np.clip(rng.normal(24, 2.0, n), 17, 34).round(1)
+    final_moisture = np.clip(rng.normal(14, 0.9, n), 11, 19).round(1)
+    initial_weight = np.clip(rng.lognormal(np.log(400), 0.6, n), 20, 5000).round(1)
+    final_weight = (initial_weight * (100 - initial_moisture) / (100 - final_moisture)).round(1)
+    temperature = np.clip(rng.normal(31, 2.5, n), 22, 42).round(1)
+    humidity = np.clip(rng.normal(72, 7, n), 35, 98).round(1)
+
+    bad = rng.random(n) < bad_share
+    kind = rng.integers(0, 4, n)
+    final_weight = np.where(bad & (kind == 0), initial_weight * 1.5, final_weight)
+    initial_moisture = np.where(bad & (kind == 1), 240.0, initial_moisture)
+    temperature = np.where(bad & (kind == 2), 310.0, temperature)
+    initial_weight = np.where(bad & (kind == 3), initial_weight * 100, initial_weight)
+
+    return [{
+        'uuid': str(uuid.uuid4()), 'batch_name': f'Bench {i}',
+        'initial_weight': float(initial_weight[i]), 'final_weight': float(final_weight[i]),
+        'initial_moisture': float(initial_moisture[i]), 'final_moisture': float(final_moisture[i]),
+        'temperature': float(temperature[i]), 'humidity': float(humidity[i]), 'sensor_value': 540,
+        'drying_time': '9.5 hours', 'farmer_uuid': farmer_uuid, 'user_id': user_id,
+        'barangay_id': barangay_id, 'date_dried': '2025-04-20', 'date_planted': '2025-01-05',
+        'date_harvested': '2025-04-18', 'due_date': '2025-04-21',
+    } for i in range(n)], int(bad.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=SIZE, help='records seeded before the test')
+    parser.add_argument('--records', type=int, default=RECORDS, help='records per sync request')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--bad-share', type=float, default=BAD_SHARE)
+    parser.add_argument('--database-url', help='Postgres URL to use instead of throwaway SQLite (tables are dropped)')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    app = build_app(database_url, args.size)
+    _, farmer_uuid, user_id = accounts(app)
+
+    from website import quality
+    from website.models import Farmer
+
+    with app.app_context():
+        barangay_id = Farmer.query.filter_by(uuid=farmer_uuid).one().barangay_id
+    rng = np.random.default_rng(7)
+    client = app.test_client()
+
+    print(f"\nscreen() alone, {args.records} records (median ms over {args.repeats} runs)")
+    with app.test_request_context():
+        records, bad = batch(rng, args.records, farmer_uuid, user_id, barangay_id, args.bad_share)
+        barangay_ids = [barangay_id] * len(records)
+        cold, warm = [], []
+        for _ in range(args.repeats):
+            quality.reset()
+            started = time.perf_counter()
+            flagged = quality.screen(records, barangay_ids)
+            cold.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            quality.screen(records, barangay_ids)
+            warm.append((time.perf_counter() - started) * 1000)
+    print(f"  cold bounds {statistics.median(cold):8.1f}   warm bounds {statistics.median(warm):8.1f}"
+          f"   flagged {len(flagged)} of {bad} corrupted")
+
+    print(f"\nPOST /api/sync, {args.records} new records per request (median ms over {args.repeats} runs)")
+    timings = {False: [], True: []}
+    quarantined = 0
+    for repeat in range(args.repeats):
+        # Alternate which goes first, so neither always meets the larger table
+        for enabled in ((False, True) if repeat % 2 == 0 else (True, False)):
+            app.config['QUALITY_SCREENING'] = enabled
+            records, _ = batch(rng, args.records, farmer_uuid, user_id, barangay_id, args.bad_share)
+            started = time.perf_counter()
+            response = client.post('/api/sync', json={'records': records})
+            timings[enabled].append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(response.get_data(as_text=True))
+            if enabled:
+                quarantined += response.get_json()['quarantined']
+    off, on = statistics.median(timings[False]), statistics.median(timings[True])
+    print(f"  screening off {off:10.1f}")
+    print(f"  screening on  {on:10.1f}   overhead {(on - off) / off * 100:+.1f}%"
+          f"   ({quarantined} quarantined over {args.repeats} requests)")
+    print(f"  screen() share of a request: {statistics.median(warm) / off * 100:.2f}% warm, "
+          f"{statistics.median(cold) / off * 100:.2f}% cold")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Latency of batched drying-time prediction for 1 to 10,000 planned batches.
+
+Runs against a throwaway SQLite database, so it is safe to run anywhere:
+
+    python benchmarks/predict_drying_time.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIZES = (1, 10, 100, 1000, 10000)
+REPEATS = 20
+HISTORY = 2000
+
+
+def timed(fn, repeats=REPEATS):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.percentile(samples, 50), np.percentile(samples, 95)
+
+
+def main():
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from werkzeug.security import generate_password_hash
+    from website import create_app
+    from website.extensions import db
+    from website.models import Municipality, Barangay, User, Farmer, DryingRecord
+    from website import prediction
+
+    app = create_app()
+    rng = np.random.default_rng(0)
+
+    with app.app_context():
+        db.create_all()
+        municipality = Municipality(name='Bench')
+        db.session.add(municipality)
+        db.session.flush()
+        barangay = Barangay(name='Bench', municipality_id=municipality.id)
+        db.session.add(barangay)
+        db.session.flush()
+        user = User(email='bench@example.com', full_name='Bench', role='barangay',
+                    barangay_id=barangay.id, password=generate_password_hash('bench'))
+        db.session.add(user)
+        db.session.flush()
+        farmer = Farmer(first_name='Bench', last_name='Farmer', username='bench',
+                        password=generate_password_hash('bench'),
+                        barangay_id=barangay.id, user_id=user.id)
+        db.session.add(farmer)
+        db.session.flush()
+
+        temperature = rng.uniform(26, 40, HISTORY)
+        humidity = rng.uniform(40, 90, HISTORY)
+        initial = rng.uniform(20, 28, HISTORY)
+        final = rng.uniform(12, 15, HISTORY)
+        minutes = 60 * (2 + 0.8 * (initial - final) - 0.1 * (temperature - 30) + 0.03 * humidity)
+        for i in range(HISTORY):
+            db.session.add(DryingRecord(
+                batch_name=f'bench-{i}', initial_weight=100, final_weight=85,
+                temperature=temperature[i], humidity=humidity[i], sensor_value=0,
+                initial_moisture=initial[i], final_moisture=final[i],
+                drying_time=f'{minutes[i]:.0f} min', drying_minutes=minutes[i],
+                user_id=user.id, farmer_id=farmer.id, barangay_id=barangay.id,
+                municipality_id=municipality.id))
+        db.session.commit()
+
+        start = time.perf_counter()
+        model, _ = prediction.model_for_barangay(barangay.id)
+        print(f'fit from {HISTORY} records: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'bench'})
+
+    print(f"{'batches':>8} {'score p50':>10} {'score p95':>10} {'http p50':>10} {'http p95':>10}")
+    for size in SIZES:
+        batches = [
+            {'temperature': float(t), 'humidity': float(h),
+             'initial_moisture': float(m), 'target_moisture': 14.0}
+            for t, h, m in zip(rng.uniform(26, 40, size), rng.uniform(40, 90, size), rng.uniform(20, 28, size))
+        ]
+        score = timed(lambda: prediction.score_batches(model, batches))
+        http = timed(lambda: client.post('/api/predict/drying-time', json={'batches': batches}))
+        print(f'{size:>8} {score[0]:>9.2f}ms {score[1]:>9.2f}ms {http[0]:>9.2f}ms {http[1]:>9.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
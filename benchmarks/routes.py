@@ -0,0 +1,234 @@
+"""Latency, query count and peak memory of the main routes as data grows.
+
+For each dataset size a fresh database is created and filled with `flask seed`,
+then every route is driven through the Flask test client as a municipal,
+barangay and farmer user. Results go to a JSON report that can be compared
+between commits:
+
+    python benchmarks/routes.py --sizes 1000,10000,100000 --output before.json
+    git checkout my-branch
+    python benchmarks/routes.py --sizes 1000,10000,100000 --output after.json --compare before.json
+
+By default each size gets a throwaway SQLite file. Pass --database-url to run
+against a local Postgres instead; its tables are dropped and recreated, so never
+point it at a database you care about.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = (1000, 10000, 100000)
+REPEATS = 10
+SYNC_BATCH = 100
+PASSWORD = 'password'
+
+ROUTES = {
+    'municipal': ['/', '/records', '/barangay_dashboard', '/analytics'],
+    'barangay': ['/barangay_dashboard', '/records', '/farmers', '/barangay_analytics'],
+    'farmer': ['/', '/records', '/farmer_analytics'],
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_app(database_url, size):
+    os.environ['DATABASE_URL'] = database_url
+    # Measure the handlers, not the rate limiter
+    os.environ['ADMISSION_CONTROL'] = '0'
+
+    from website import create_app, prediction
+    from website.extensions import db
+    from website.seed import seed_command
+
+    app = create_app()
+    prediction.reset()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    farmers = max(size // 500, 1)
+    result = app.test_cli_runner().invoke(seed_command, [
+        '--municipalities', '1', '--barangays', '10', '--farmers', str(farmers),
+        '--records', str(size), '--password', PASSWORD,
+    ])
+    if result.exit_code:
+        raise RuntimeError(result.output) from result.exception
+    return app
+
+
+def accounts(app):
+    """One login per role, picking the busiest barangay and farmer so the numbers are worst case."""
+    from sqlalchemy import func
+    from website.extensions import db
+    from website.models import User, Farmer, DryingRecord
+
+    with app.app_context():
+        barangay_id = db.session.query(DryingRecord.barangay_id).group_by(DryingRecord.barangay_id) \
+            .order_by(func.count().desc()).limit(1).scalar()
+        farmer_id = db.session.query(DryingRecord.farmer_id).filter_by(barangay_id=barangay_id) \
+            .group_by(DryingRecord.farmer_id).order_by(func.count().desc()).limit(1).scalar()
+        municipal = User.query.filter_by(role='municipal').first()
+        barangay = User.query.filter_by(role='barangay', barangay_id=barangay_id).first()
+        farmer = db.session.get(Farmer, farmer_id)
+        return {
+            'municipal': municipal.email,
+            'barangay': barangay.email,
+            'farmer': farmer.username,
+        }, farmer.uuid, barangay.id
+
+
+def login(app, login_name):
+    client = app.test_client()
+    response = client.post('/login', data={'email': login_name, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"login failed for {login_name}: {response.status_code}")
+    return client
+
+
+def measure(app, send, repeats):
+    """Time `send` `repeats` times, then one extra traced run for query count and peak memory.
+
+    Bodies are read in full so streamed pages are timed to their last byte.
+    """
+    from website.profiling import count_queries
+
+    send().get_data()  # warm caches and templates
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = send()
+        response.get_data()
+        status = response.status_code
+        samples.append((time.perf_counter() - start) * 1000)
+
+    with count_queries() as stats:
+        tracemalloc.start()
+        send().get_data()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'status': status,
+        'p50_ms': round(float(np.percentile(samples, 50)), 2),
+        'p90_ms': round(float(np.percentile(samples, 90)), 2),
+        'p99_ms': round(float(np.percentile(samples, 99)), 2),
+        'mean_ms': round(float(np.mean(samples)), 2),
+        'queries': stats.count,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def sync_payload(farmer_uuid, user_id, duplicates=None):
+    records = []
+    for i in range(SYNC_BATCH):
+        records.append({
+            'uuid': str(uuid.uuid4()),
+            'batch_name': f'Bench {i}',
+            'initial_weight': 400.0, 'temperature': 31.0, 'humidity': 70.0, 'sensor_value': 540,
+            'initial_moisture': 24.0, 'final_moisture': 14.0, 'drying_time': '9.5 hours',
+            'final_weight': 353.5, 'farmer_uuid': farmer_uuid, 'user_id': user_id,
+            'date_dried': '2025-04-20', 'date_planted': '2025-01-05', 'date_harvested': '2025-04-18',
+            'due_date': '2025-04-21',
+        })
+    return {'records': (duplicates or []) + records}
+
+
+def bench_size(database_url, size, repeats):
+    app = build_app(database_url, size)
+    logins, farmer_uuid, barangay_user_id = accounts(app)
+    results = []
+
+    for role, paths in ROUTES.items():
+        client = login(app, logins[role])
+        for path in paths:
+            row = measure(app, lambda: client.get(path), repeats)
+            results.append({'size': size, 'role': role, 'route': f'GET {path}', **row})
+            print(f"  {size:>8} {role:<10} GET {path:<24} p50 {row['p50_ms']:>9.2f}ms "
+                  f"p99 {row['p99_ms']:>9.2f}ms {row['queries']:>5}q {row['peak_kb']:>9.1f}KB")
+
+    api = app.test_client()
+    fetch = measure(app, lambda: api.get(f'/api/fetch?farmer_uuid={farmer_uuid}'), repeats)
+    results.append({'size': size, 'role': 'device', 'route': 'GET /api/fetch', **fetch})
+
+    # Each sync posts SYNC_BATCH new records plus the previous batch again as duplicates
+    previous = []
+
+    def send_sync():
+        nonlocal previous
+        payload = sync_payload(farmer_uuid, barangay_user_id, previous)
+        previous = payload['records'][-SYNC_BATCH:]
+        return api.post('/api/sync', json=payload)
+
+    sync = measure(app, send_sync, repeats)
+    results.append({'size': size, 'role': 'device', 'route': 'POST /api/sync', **sync})
+    for row in results[-2:]:
+        print(f"  {size:>8} {'device':<10} {row['route']:<28} p50 {row['p50_ms']:>9.2f}ms "
+              f"p99 {row['p99_ms']:>9.2f}ms {row['queries']:>5}q {row['peak_kb']:>9.1f}KB")
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r['size'], r['role'], r['route']): r for r in json.load(f)['results']}
+    print(f"\nvs {baseline_path}")
+    print(f"{'size':>8} {'role':<10} {'route':<28} {'p50':>8} {'queries':>9} {'peak':>8}")
+    for row in results:
+        old = baseline.get((row['size'], row['role'], row['route']))
+        if not old:
+            continue
+        p50 = row['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('nan')
+        peak = row['peak_kb'] / old['peak_kb'] if old['peak_kb'] else float('nan')
+        print(f"{row['size']:>8} {row['role']:<10} {row['route']:<28} {p50:>7.2f}x "
+              f"{row['queries'] - old['queries']:>+9d} {peak:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma separated record counts')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--database-url', help='Postgres URL to use instead of throwaway SQLite (tables are dropped)')
+    parser.add_argument('--output', default='benchmark_routes.json')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        print(f"\n{size} records")
+        results.extend(bench_size(database_url, size, args.repeats))
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': (args.database_url or 'sqlite').split(':', 1)[0],
+        'repeats': args.repeats,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
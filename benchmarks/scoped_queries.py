@@ -0,0 +1,109 @@
+"""Statement build/compile and row hydration cost of the scoped query layer.
+
+Seeds a database (see benchmarks/routes.py) and, for each role, runs the hot
+queries of the records page and chart/snapshot version checks two ways: as the
+per-request ORM queries the views used to build by hand (full DryingRecord
+entities), and through website.scope (cached lambda statements returning row
+tuples). "build + cache key" is the per-call statement overhead before the
+compiled-SQL cache is hit, "1 row" adds execution and "all rows" hydration:
+
+    python benchmarks/scoped_queries.py --size 20000 --repeats 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes import build_app, accounts, login, measure  # noqa: E402
+
+SIZE = 20000
+REPEATS = 20
+
+
+def legacy_records(user):
+    """The records page query as views.py built it before website.scope."""
+    from sqlalchemy.orm import contains_eager
+    from website.models import DryingRecord, Barangay
+
+    if user.role == 'municipal':
+        return DryingRecord.query.join(Barangay).options(contains_eager(DryingRecord.barangay)) \
+            .filter(Barangay.municipality_id == user.municipality_id).order_by(DryingRecord.timestamp.desc())
+    if user.role == 'barangay':
+        return DryingRecord.query.filter_by(barangay_id=user.barangay_id).order_by(DryingRecord.timestamp.desc())
+    return DryingRecord.query.filter_by(farmer_id=user.id).order_by(DryingRecord.timestamp.desc())
+
+
+def legacy_version(user):
+    from sqlalchemy import func
+    from website.models import DryingRecord
+    from website.snapshot import scoped_records
+
+    changed = func.coalesce(DryingRecord.updated_at, DryingRecord.created_at)
+    return scoped_records(user.role, user.id, user.barangay_id, getattr(user, 'municipality_id', None)) \
+        .with_entities(func.count(DryingRecord.id), func.max(changed)).one()
+
+
+def timed(fn, repeats):
+    fn()  # warm the statement caches
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=SIZE)
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--database-url', help='Postgres URL to use instead of throwaway SQLite (tables are dropped)')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    app = build_app(database_url, args.size)
+    logins, _, _ = accounts(app)
+
+    from website.extensions import db
+    from website.models import User, Farmer
+    from website.scope import record_rows, record_version
+
+    print(f"\n{args.size} records, median ms over {args.repeats} runs")
+    print(f"{'role':<10}{'query':<22}{'ORM':>10}{'scope':>10}{'speedup':>10}")
+    with app.app_context():
+        users = {
+            'municipal': User.query.filter_by(email=logins['municipal']).one(),
+            'barangay': User.query.filter_by(email=logins['barangay']).one(),
+            'farmer': Farmer.query.filter_by(username=logins['farmer']).one(),
+        }
+        for role, user in users.items():
+            cases = {
+                # What every request pays before the compiled-SQL cache can be consulted
+                'build + cache key': (lambda: legacy_records(user)._statement_20()._generate_cache_key(),
+                                      lambda: record_rows(user)._generate_cache_key()),
+                'records, 1 row': (lambda: legacy_records(user).limit(1).all(),
+                                   lambda: db.session.execute(record_rows(user) + (lambda s: s.limit(1))).all()),
+                'records, all rows': (lambda: legacy_records(user).all(),
+                                      lambda: db.session.execute(record_rows(user)).all()),
+                'data version': (lambda: legacy_version(user),
+                                 lambda: db.session.execute(record_version(user)).one()),
+            }
+            for name, (orm, layer) in cases.items():
+                # Entities stay in the identity map otherwise, hiding hydration from later runs
+                orm_ms = timed(lambda: (orm(), db.session.expunge_all()), args.repeats)
+                layer_ms = timed(layer, args.repeats)
+                print(f"{role:<10}{name:<22}{orm_ms:>10.2f}{layer_ms:>10.2f}{orm_ms / layer_ms:>9.1f}x")
+
+    print("\n/records through the test client (p50 ms, peak KB)")
+    for role in ('municipal', 'barangay', 'farmer'):
+        client = login(app, logins[role])
+        result = measure(app, lambda: client.get('/records'), max(args.repeats // 4, 3))
+        print(f"  {role:<10}{result['p50_ms']:>10.1f}{result['peak_kb']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
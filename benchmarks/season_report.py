@@ -0,0 +1,79 @@
+"""Wall time of the season report builder, serial against the process pool.
+
+For each dataset size a fresh database is seeded (see benchmarks/routes.py) and
+the busiest season of its municipality is reported on. Each stage is timed on
+its own so the pool's share is visible next to the extract and rendering:
+
+    python benchmarks/season_report.py --sizes 10000,100000,500000 --workers 4
+
+The pool is started and warmed before timing, as it is in a long-running worker.
+The app itself stays serial for small extracts and single-CPU hosts
+(PARALLEL_MIN_ROWS); the benchmark forces the pool so both paths are measured.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes import build_app  # noqa: E402
+
+SIZES = (10000, 100000)
+REPEATS = 5
+
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def bench_size(database_url, size, repeats, workers):
+    from website import reports
+    from website.models import User
+
+    reports.PARALLEL_MIN_ROWS = 0  # time the pool even where the app would stay serial
+    app = build_app(database_url, size)
+    app.config['REPORT_DIR'] = tempfile.mkdtemp()
+    with app.app_context(), app.test_request_context():
+        municipality_id = User.query.filter_by(role='municipal').first().municipality_id
+        season = max(reports.available_seasons(municipality_id),
+                     key=lambda s: len(reports.extract_columns(municipality_id, s)['barangay_id']))
+
+        extract_ms, columns = timed(lambda: reports.extract_columns(municipality_id, season), repeats)
+        reports.compute_sections(columns, parallel=True, workers=workers)  # start and warm the pool
+        serial_ms, (whole, sections) = timed(lambda: reports.compute_sections(columns, parallel=False), repeats)
+        parallel_ms, _ = timed(lambda: reports.compute_sections(columns, parallel=True, workers=workers), repeats)
+        render_ms, _ = timed(lambda: reports.render_bundle(municipality_id, season, whole, sections), repeats)
+        build_ms, _ = timed(lambda: os.remove(reports.season_report(app, municipality_id, season)), repeats)
+
+    rows = int(columns['barangay_id'].size)
+    print(f"{size:>8} records  season {season}: {rows} rows in {len(sections)} barangays")
+    print(f"  extract {extract_ms:8.1f} ms")
+    print(f"  compute {serial_ms:8.1f} ms serial  {parallel_ms:8.1f} ms pool ({workers or os.cpu_count()} workers)"
+          f"  x{serial_ms / parallel_ms:.2f}")
+    print(f"  render  {render_ms:8.1f} ms")
+    print(f"  cold build (extract + pool + render + write) {build_ms:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma separated record counts')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--workers', type=int, help='pool size (default: one per CPU)')
+    parser.add_argument('--database-url', help='Postgres URL to use instead of throwaway SQLite (tables are dropped)')
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        bench_size(database_url, size, args.repeats, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""Load test: many devices syncing at once while officers load dashboards.
+
+Starts the app under gunicorn against a seeded database, then releases N
+device threads together (the moment connectivity comes back). Each device
+loops login -> /api/sync -> /api/fetch, re-sending part of what it already
+synced the way devices do after a timeout, while reader threads keep loading
+dashboards. Reports throughput, error rates, tail latency, server-side SQL time
+and DB lock waits:
+
+    python benchmarks/sync_load.py --devices 200 --readers 10 --cycles 5 --workers 4
+
+With no --database-url a throwaway SQLite file is used. A Postgres URL is
+migrated and seeded in place (rows are added, not dropped), and its lock waits
+are sampled from pg_stat_activity while the test runs.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'password'
+READER_PATHS = ('/', '/barangay_dashboard', '/records')
+SERVER_DB_TIME = re.compile(r'db;dur=([\d.]+)')
+MAX_RETRIES = 5  # times a device retries a 429'd sync, sleeping Retry-After first
+LOCK_ERRORS = ('database is locked', 'deadlock', 'could not serialize', 'lock timeout')
+
+
+class Stats:
+    """Thread-safe latency and error samples per operation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.db_time = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = 0
+        self.throttled = defaultdict(int)
+        self.records_sent = 0
+
+    def add(self, op, started, response=None, error=None):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.latency[op].append(elapsed)
+            if response is not None:
+                match = SERVER_DB_TIME.search(response.headers.get('Server-Timing', ''))
+                if match:
+                    self.db_time[op].append(float(match.group(1)))
+                if response.status_code == 429:
+                    self.throttled[op] += 1
+                elif response.status_code >= 400:
+                    self.errors[op] += 1
+                    if any(text in response.text.lower() for text in LOCK_ERRORS):
+                        self.lock_errors += 1
+            else:
+                self.errors[op] += 1
+                if error and any(text in str(error).lower() for text in LOCK_ERRORS):
+                    self.lock_errors += 1
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def flask(env, *args):
+    subprocess.run([sys.executable, '-m', 'flask', *args], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def prepare_database(env, args):
+    flask(env, 'db', 'upgrade')
+    flask(env, 'seed', '--municipalities', '1', '--barangays', str(args.barangays),
+          '--farmers', str(args.farmers), '--records', str(args.records),
+          '--seed', str(args.seed), '--password', PASSWORD)
+
+
+def load_accounts(database_url):
+    """Barangay officers with their farmers' uuids, plus one municipal officer."""
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        farmers = defaultdict(list)
+        for user_email, user_id, barangay_id, farmer_uuid in conn.execute(text(
+                "SELECT u.email, u.id, u.barangay_id, f.uuid FROM users u "
+                "JOIN farmers f ON f.barangay_id = u.barangay_id WHERE u.role = 'barangay'")):
+            farmers[(user_email, user_id, barangay_id)].append(farmer_uuid)
+        municipal = conn.execute(text("SELECT email FROM users WHERE role = 'municipal' LIMIT 1")).scalar()
+    engine.dispose()
+    return [(key, uuids) for key, uuids in farmers.items()], municipal
+
+
+def start_server(env, args, port):
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '-c', 'gunicorn.conf.py',
+               '--workers', str(args.workers), '--threads', str(args.threads),
+               '--bind', f'127.0.0.1:{port}', '--timeout', '120']
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/login', timeout=5)
+            return server
+        except requests.RequestException:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    stop_server(server)
+    raise RuntimeError('gunicorn did not start')
+
+
+def stop_server(server):
+    if server.poll() is None:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def make_record(rng, farmer_uuid, user_id, barangay_id):
+    initial_moisture = round(rng.uniform(20, 28), 1)
+    final_moisture = round(rng.uniform(12.5, 15), 1)
+    initial_weight = round(rng.uniform(100, 1200), 1)
+    return {
+        'uuid': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        'batch_name': f'Batch {rng.randint(1, 40)}',
+        'initial_weight': initial_weight,
+        'temperature': round(rng.uniform(26, 38), 1),
+        'humidity': round(rng.uniform(50, 90), 1),
+        'sensor_value': rng.randint(400, 700),
+        'initial_moisture': initial_moisture,
+        'final_moisture': final_moisture,
+        'drying_time': f'{rng.uniform(4, 14):.1f} hours',
+        'final_weight': round(initial_weight * (100 - initial_moisture) / (100 - final_moisture), 1),
+        'farmer_uuid': farmer_uuid,
+        'user_id': user_id,
+        'barangay_id': barangay_id,
+        'date_dried': '2025-04-20',
+        'date_planted': '2025-01-05',
+        'date_harvested': '2025-04-18',
+        'due_date': '2025-04-21',
+    }
+
+
+def device(base, account, farmer_uuids, args, stats, barrier, seed):
+    (email, user_id, barangay_id) = account
+    rng = random.Random(seed)
+    device_id = f'bench-{seed}'
+    sent = []
+    barrier.wait()
+    for _ in range(args.cycles):
+        session = requests.Session()
+        try:
+            started = time.perf_counter()
+            response = session.post(f'{base}/login', data={'email': email, 'password': PASSWORD},
+                                     headers={'Accept': 'application/json'}, timeout=args.timeout)
+            stats.add('login', started, response)
+
+            size = max(1, int(rng.gauss(args.batch, args.batch / 4)))
+            n_dupes = min(len(sent), int(size * args.duplicate_rate))
+            batch = rng.sample(sent, n_dupes) + [
+                make_record(rng, rng.choice(farmer_uuids), user_id, barangay_id) for _ in range(size - n_dupes)]
+            for _ in range(MAX_RETRIES + 1):
+                started = time.perf_counter()
+                response = session.post(f'{base}/api/sync', json={'records': batch}, timeout=args.timeout,
+                                        headers={'X-Device-ID': device_id})
+                stats.add('sync', started, response)
+                if response.status_code != 429:
+                    break
+                time.sleep(min(float(response.headers.get('Retry-After', 1)), 30))
+            if response.ok:
+                sent.extend(batch[n_dupes:])
+                with stats.lock:
+                    stats.records_sent += len(batch)
+
+            started = time.perf_counter()
+            response = session.get(f'{base}/api/fetch', params={'farmer_uuid': rng.choice(farmer_uuids)},
+                                   timeout=args.timeout)
+            stats.add('fetch', started, response)
+        except requests.RequestException as e:
+            stats.add('device_error', started, error=e)
+        finally:
+            session.close()
+
+
+def reader(base, email, args, stats, barrier, stop):
+    session = requests.Session()
+    session.post(f'{base}/login', data={'email': email, 'password': PASSWORD}, timeout=args.timeout)
+    barrier.wait()
+    while not stop.is_set():
+        path = random.choice(READER_PATHS)
+        started = time.perf_counter()
+        try:
+            stats.add(f'GET {path}', started, session.get(f'{base}{path}', timeout=args.timeout))
+        except requests.RequestException as e:
+            stats.add(f'GET {path}', started, error=e)
+
+
+def sample_pg_locks(database_url, stop, samples, interval=0.25):
+    """Poll how many backends are waiting on a lock."""
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(database_url)
+    query = text("SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock' AND datname = current_database()")
+    with engine.connect() as conn:
+        while not stop.is_set():
+            samples.append(conn.execute(query).scalar())
+            stop.wait(interval)
+    engine.dispose()
+
+
+def summarize(stats, elapsed, lock_samples, interval=0.25):
+    def pct(values):
+        if not values:
+            return None
+        return {f'p{p}': round(float(np.percentile(values, p)), 1) for p in (50, 95, 99)} | \
+            {'max': round(max(values), 1)}
+
+    ops = {}
+    for op, values in sorted(stats.latency.items()):
+        ops[op] = {
+            'requests': len(values),
+            'errors': stats.errors[op],
+            'error_rate': round(stats.errors[op] / len(values), 4),
+            'per_second': round(len(values) / elapsed, 1),
+            'latency_ms': pct(values),
+            'server_db_ms': pct(stats.db_time[op]),
+        }
+    report = {
+        'elapsed_s': round(elapsed, 2),
+        'records_synced_per_second': round(stats.records_sent / elapsed, 1),
+        'lock_errors': stats.lock_errors,
+        'throttled': dict(stats.throttled),
+        'operations': ops,
+    }
+    if lock_samples is not None:
+        report['pg_lock_waiters'] = {
+            'max': max(lock_samples, default=0),
+            'mean': round(float(np.mean(lock_samples)), 2) if lock_samples else 0,
+            'waiting_backend_seconds': round(sum(lock_samples) * interval, 2),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['elapsed_s']}s, {report['records_synced_per_second']} records/s synced, "
+          f"{report['lock_errors']} lock errors, {sum(report['throttled'].values())} answered 429")
+    if 'pg_lock_waiters' in report:
+        waits = report['pg_lock_waiters']
+        print(f"pg lock waiters: max {waits['max']}, mean {waits['mean']}, "
+              f"{waits['waiting_backend_seconds']} backend-seconds waiting")
+    print(f"{'operation':<24} {'reqs':>6} {'err%':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'db p99':>8}")
+    for op, row in report['operations'].items():
+        lat = row['latency_ms']
+        db_p99 = row['server_db_ms']['p99'] if row['server_db_ms'] else '-'
+        print(f"{op:<24} {row['requests']:>6} {row['error_rate'] * 100:>5.1f}% {row['per_second']:>7} "
+              f"{lat['p50']:>8} {lat['p95']:>8} {lat['p99']:>8} {lat['max']:>8} {db_p99:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--readers', type=int, default=5, help='officers reloading dashboards throughout')
+    parser.add_argument('--cycles', type=int, default=3, help='login/sync/fetch rounds per device')
+    parser.add_argument('--batch', type=int, default=150, help='mean records per sync')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help='share of each batch that was sent before')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker')
+    parser.add_argument('--barangays', type=int, default=20)
+    parser.add_argument('--farmers', type=int, default=30, help='farmers per barangay')
+    parser.add_argument('--records', type=int, default=20000, help='records seeded before the test')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--database-url', help='Postgres URL to test against instead of throwaway SQLite')
+    parser.add_argument('--output', help='also write the report as JSON')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, FLASK_APP='app.py', SQL_PROFILING='1',
+               ADMISSION_DIR=tempfile.mkdtemp())
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+    print('preparing database...')
+    prepare_database(env, args)
+    accounts, municipal = load_accounts(database_url)
+
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    server = start_server(env, args, port)
+    print(f'gunicorn on {base} with {args.workers} workers; {args.devices} devices, {args.readers} readers')
+
+    stats = Stats()
+    stop = threading.Event()
+    barrier = threading.Barrier(args.devices + args.readers + 1)
+    lock_samples = None
+    threads = []
+    try:
+        for i in range(args.devices):
+            account, farmer_uuids = accounts[i % len(accounts)]
+            threads.append(threading.Thread(target=device, daemon=True,
+                                            args=(base, account, farmer_uuids, args, stats, barrier, args.seed * 100003 + i)))
+        readers = []
+        for i in range(args.readers):
+            email = municipal if i % 2 == 0 else accounts[i % len(accounts)][0][0]
+            readers.append(threading.Thread(target=reader, daemon=True, args=(base, email, args, stats, barrier, stop)))
+        for thread in threads + readers:
+            thread.start()
+
+        if database_url.startswith('postgres'):
+            lock_samples = []
+            threading.Thread(target=sample_pg_locks, args=(database_url, stop, lock_samples), daemon=True).start()
+
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for thread in readers:
+            thread.join(timeout=args.timeout)
+    finally:
+        stop.set()
+        stop_server(server)
+
+    report = summarize(stats, elapsed, lock_samples)
+    report['config'] = {k: v for k, v in vars(args).items() if k != 'database_url'}
+    report['database'] = database_url.split(':', 1)[0]
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import time
+
+# Prometheus multiprocess mode: every worker writes its metrics here and
+# /metrics aggregates them. Start clean so stale files from a previous run
+# don't get summed in, and drop a worker's live gauges when it exits.
+multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if multiproc_dir:
+    # Must exist before the app is imported, which preload_app does ahead of on_starting
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+# Threads per worker. Each open live-dashboard stream (/api/events) parks one,
+# so SSE_MAX_CONNECTIONS has to stay below this to leave room for requests.
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Import and initialise the app once in the master; workers fork with it ready
+# instead of each importing it. Code changes then need a restart, not a HUP.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Prime templates, connections and caches before a worker accepts requests
+warmup_enabled = os.getenv("WARMUP", "1") == "1"
+
+
+def _warmup(app, who):
+    from website.warmup import warmup
+
+    started = time.perf_counter()
+    steps = warmup(app)
+    total = (time.perf_counter() - started) * 1000
+    print(f"Warmup ({who}) {total:.0f} ms: " + ", ".join(f"{k} {v:.0f}" for k, v in steps.items()))
+
+
+def _dispose_engine(app, close):
+    from website.extensions import db
+
+    with app.app_context():
+        db.engine.dispose(close=close)
+
+
+def on_starting(server):
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def when_ready(server):
+    if preload_app and warmup_enabled:
+        app = server.app.wsgi()
+        _warmup(app, "master")
+        # Connections must not be shared across the fork; workers open their own
+        _dispose_engine(app, close=True)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # Drop any pooled connections inherited from the master without closing
+        # the master's sockets
+        _dispose_engine(server.app.wsgi(), close=False)
+
+
+def post_worker_init(worker):
+    if warmup_enabled:
+        _warmup(worker.wsgi, f"worker {worker.pid}")
+
+
+def child_exit(server, worker):
+    if multiproc_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
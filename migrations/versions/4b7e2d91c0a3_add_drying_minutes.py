@@ -0,0 +1,50 @@
+"""add numeric drying_minutes to drying_records
+
+Revision ID: 4b7e2d91c0a3
+Revises: 10c5befcd6a6
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from website.utils import parse_drying_minutes
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2d91c0a3'
+down_revision = '10c5befcd6a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('drying_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('drying_minutes', sa.Float(), nullable=True))
+
+    # Backfill from the free-form drying_time strings
+    bind = op.get_bind()
+    records = sa.table('drying_records',
+                       sa.column('id', sa.Integer),
+                       sa.column('drying_time', sa.String),
+                       sa.column('drying_minutes', sa.Float))
+
+    rows = bind.execute(sa.select(records.c.id, records.c.drying_time)).fetchall()
+    updates = []
+    for row in rows:
+        minutes = parse_drying_minutes(row.drying_time)
+        if minutes is not None:
+            updates.append({'record_id': row.id, 'minutes': minutes})
+
+    if updates:
+        bind.execute(
+            records.update()
+            .where(records.c.id == sa.bindparam('record_id'))
+            .values(drying_minutes=sa.bindparam('minutes')),
+            updates
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('drying_records', schema=None) as batch_op:
+        batch_op.drop_column('drying_minutes')
@@ -0,0 +1,68 @@
+"""trigram / FTS5 search indexes for farmers and drying records
+
+Revision ID: 8d3f61a2e5b7
+Revises: 4b7e2d91c0a3
+Create Date: 2026-10-19 11:03:52.402117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3f61a2e5b7'
+down_revision = '4b7e2d91c0a3'
+branch_labels = None
+depends_on = None
+
+# Keep these expressions identical to website/search.py so Postgres uses the indexes
+FARMER_SEARCH_TEXT = "lower(first_name || ' ' || coalesce(middle_name, '') || ' ' || last_name || ' ' || username)"
+RECORD_SEARCH_TEXT = "lower(batch_name || ' ' || coalesce(farmer_name, ''))"
+
+# SQLite shadow table: rowid = id * 2 for farmers, id * 2 + 1 for records
+SQLITE_FARMER_ROW = ("new.id * 2, new.first_name || ' ' || coalesce(new.middle_name, '') || ' ' || "
+                     "new.last_name || ' ' || new.username, 'farmer', new.id, new.barangay_id, new.id")
+SQLITE_RECORD_ROW = ("new.id * 2 + 1, new.batch_name || ' ' || coalesce(new.farmer_name, ''), "
+                     "'record', new.id, new.barangay_id, new.farmer_id")
+SQLITE_COLUMNS = "rowid, text, kind, ref_id, barangay_id, farmer_id"
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(f"CREATE INDEX ix_farmers_search_trgm ON farmers USING gin (({FARMER_SEARCH_TEXT}) gin_trgm_ops)")
+        op.execute(f"CREATE INDEX ix_drying_records_search_trgm ON drying_records USING gin (({RECORD_SEARCH_TEXT}) gin_trgm_ops)")
+
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE search_index USING fts5("
+                   "text, kind UNINDEXED, ref_id UNINDEXED, barangay_id UNINDEXED, farmer_id UNINDEXED, "
+                   "tokenize='trigram')")
+
+        op.execute(f"INSERT INTO search_index ({SQLITE_COLUMNS}) SELECT "
+                   + SQLITE_FARMER_ROW.replace('new.', '') + " FROM farmers")
+        op.execute(f"INSERT INTO search_index ({SQLITE_COLUMNS}) SELECT "
+                   + SQLITE_RECORD_ROW.replace('new.', '') + " FROM drying_records")
+
+        for table, row, offset in (('farmers', SQLITE_FARMER_ROW, ''), ('drying_records', SQLITE_RECORD_ROW, ' + 1')):
+            op.execute(f"CREATE TRIGGER {table}_search_ai AFTER INSERT ON {table} BEGIN "
+                       f"INSERT INTO search_index ({SQLITE_COLUMNS}) VALUES ({row}); END")
+            op.execute(f"CREATE TRIGGER {table}_search_ad AFTER DELETE ON {table} BEGIN "
+                       f"DELETE FROM search_index WHERE rowid = old.id * 2{offset}; END")
+            op.execute(f"CREATE TRIGGER {table}_search_au AFTER UPDATE ON {table} BEGIN "
+                       f"DELETE FROM search_index WHERE rowid = old.id * 2{offset}; "
+                       f"INSERT INTO search_index ({SQLITE_COLUMNS}) VALUES ({row}); END")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_drying_records_search_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_farmers_search_trgm")
+
+    elif dialect == 'sqlite':
+        for table in ('farmers', 'drying_records'):
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_search_{suffix}")
+        op.execute("DROP TABLE IF EXISTS search_index")
@@ -0,0 +1,28 @@
+"""reference_changes table versioning the bootstrap bundle across workers
+
+Revision ID: a9c4e2f7b318
+Revises: f3b8c51d7a26
+Create Date: 2026-10-19 19:42:08.613054
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e2f7b318'
+down_revision = 'f3b8c51d7a26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reference_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('reference_changes')
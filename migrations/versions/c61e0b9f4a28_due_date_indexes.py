@@ -0,0 +1,30 @@
+"""indexes on drying_records (barangay_id, due_date) for the schedule
+
+Revision ID: c61e0b9f4a28
+Revises: 8d3f61a2e5b7
+Create Date: 2026-10-19 13:40:07.551392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c61e0b9f4a28'
+down_revision = '8d3f61a2e5b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('drying_records', schema=None) as batch_op:
+        batch_op.create_index('ix_drying_records_barangay_due_date', ['barangay_id', 'due_date'], unique=False)
+        batch_op.create_index('ix_drying_records_pending_due_date', ['barangay_id', 'due_date'], unique=False,
+                              postgresql_where=sa.text('date_dried IS NULL'),
+                              sqlite_where=sa.text('date_dried IS NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('drying_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_drying_records_pending_due_date')
+        batch_op.drop_index('ix_drying_records_barangay_due_date')
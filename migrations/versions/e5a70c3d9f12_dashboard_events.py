@@ -0,0 +1,36 @@
+"""dashboard_events table feeding the live dashboard stream
+
+Revision ID: e5a70c3d9f12
+Revises: c61e0b9f4a28
+Create Date: 2026-10-19 15:12:44.208731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a70c3d9f12'
+down_revision = 'c61e0b9f4a28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dashboard_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('barangay_id', sa.Integer(), nullable=True),
+    sa.Column('municipality_id', sa.Integer(), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('dashboard_events', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_dashboard_events_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('dashboard_events', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dashboard_events_created_at'))
+
+    op.drop_table('dashboard_events')
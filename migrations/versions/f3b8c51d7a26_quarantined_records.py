@@ -0,0 +1,41 @@
+"""quarantined_records table for synced records that fail data-quality screening
+
+Revision ID: f3b8c51d7a26
+Revises: e5a70c3d9f12
+Create Date: 2026-10-19 17:05:31.482917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8c51d7a26'
+down_revision = 'e5a70c3d9f12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('quarantined_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('uuid', sa.String(length=36), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('reasons', sa.Text(), nullable=False),
+    sa.Column('farmer_id', sa.Integer(), nullable=True),
+    sa.Column('barangay_id', sa.Integer(), nullable=True),
+    sa.Column('municipality_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['farmer_id'], ['farmers.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('uuid')
+    )
+    with op.batch_alter_table('quarantined_records', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quarantined_records_barangay_id'), ['barangay_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('quarantined_records', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quarantined_records_barangay_id'))
+
+    op.drop_table('quarantined_records')
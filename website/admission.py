@@ -0,0 +1,200 @@
+import fcntl
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from flask import g, request, jsonify, current_app
+from flask_login import current_user
+
+from .metrics import record_rejection
+
+# Token buckets per client: sustained requests/second and burst size
+API_RATE, API_BURST = 5.0, 30
+SYNC_RATE, SYNC_BURST = 0.2, 5       # one sync every 5 s sustained, 5 back to back after an outage
+
+# An account's devices together get this many times one device's rate and burst
+DEVICES_PER_ACCOUNT = 20
+
+INGEST_ENDPOINTS = ('api.sync', 'api.bulk_records')
+EXEMPT_ENDPOINTS = ('api.events',)    # long-lived; capped by SSE_MAX_CONNECTIONS instead
+# Fetched by pages as officers use them: not rate limited, and they mark the interactive window
+INTERACTIVE_ENDPOINTS = ('api.yield_chart_data', 'api.output_chart_data', 'api.search')
+
+# Officers loaded a page within this many seconds: ingest gets half its slots
+INTERACTIVE_WINDOW = 2.0
+PRUNE_AFTER = 3600                   # seconds an idle bucket is kept
+
+_local = threading.local()
+_last_touch = 0.0
+
+
+class AdmissionStore:
+    """Buckets and ingest slots kept in files so every gunicorn worker on the host shares them.
+
+    Buckets live in a small SQLite database updated under BEGIN IMMEDIATE; ingest
+    slots are flock()ed lock files, so a worker that dies releases its slot.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, 'buckets.db')
+        self.interactive_path = os.path.join(directory, 'interactive')
+        # Closed again right away: under preload_app this runs in the gunicorn master
+        conn = self._connect()
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=1.0, isolation_level=None)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = OFF')
+        return conn
+
+    def _conn(self):
+        conns = getattr(_local, 'conns', None)
+        if conns is None:
+            conns = _local.conns = {}
+        if self.db_path not in conns:
+            conns[self.db_path] = self._connect()
+        return conns[self.db_path]
+
+    def take(self, *buckets):
+        """Spend one token from each (key, rate, burst) bucket, or none if any is empty.
+
+        Returns seconds until every bucket has a token again if one was empty, else 0.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = []
+            for key, rate, burst in buckets:
+                row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+                levels.append(burst if row is None else min(burst, row[0] + (now - row[1]) * rate))
+            wait = max((1 - tokens) / rate for tokens, (_, rate, _) in zip(levels, buckets))
+            spend = 1 if wait <= 0 else 0
+            conn.executemany('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                             [(key, tokens - spend, now) for tokens, (key, _, _) in zip(levels, buckets)])
+            if random.random() < 0.001:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - PRUNE_AFTER,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return max(wait, 0.0)
+
+    def acquire_slot(self, limit):
+        """Hold one of `limit` ingest slots; returns the open lock file or None if all are taken."""
+        for i in random.sample(range(limit), limit):
+            handle = open(os.path.join(self.directory, f'ingest-{i}.lock'), 'w')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except OSError:
+                handle.close()
+        return None
+
+    def touch_interactive(self):
+        with open(self.interactive_path, 'a'):
+            os.utime(self.interactive_path)
+
+    def interactive_recently(self):
+        try:
+            return time.time() - os.path.getmtime(self.interactive_path) < INTERACTIVE_WINDOW
+        except OSError:
+            return False
+
+
+def client_keys():
+    """(bucket key, shared key or None) for this request.
+
+    Logged-in requests are keyed on the account; an X-Device-ID gives each device
+    its own bucket under it, and the account's devices together also draw from
+    the shared account bucket, so a new id per request gains little. Anonymous
+    requests are keyed on the address (X-Forwarded-For is only trusted through
+    ProxyFix, see PROXY_HOPS).
+    """
+    if current_user.is_authenticated:
+        account = f'user:{current_user.get_id()}'
+        device = request.headers.get('X-Device-ID')
+        if device:
+            return f'{account}:device:{device[:64]}', account
+        return account, None
+    return f'ip:{request.remote_addr}', None
+
+
+def _buckets(kind, rate, burst):
+    key, shared = client_keys()
+    buckets = [(f'{kind}:{key}', rate, burst)]
+    if shared:
+        buckets.append((f'{kind}:{shared}', rate * DEVICES_PER_ACCOUNT, burst * DEVICES_PER_ACCOUNT))
+    return buckets
+
+
+def too_many(reason, wait):
+    """429 with a jittered Retry-After so rejected devices don't all come back together."""
+    record_rejection(reason)
+    retry_after = wait * random.uniform(1.0, 1.5) + random.uniform(0, 2)
+    response = jsonify({"status": "error",
+                        "message": "Too many requests, retry later.",
+                        "retry_after": round(retry_after, 2)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_admission(app):
+    """Rate-limit /api per client and cap concurrent ingest, keeping room for interactive pages."""
+    if not app.config.get('ADMISSION_CONTROL'):
+        return
+    store = AdmissionStore(app.config.get('ADMISSION_DIR') or os.path.join(app.instance_path, 'admission'))
+
+    @app.before_request
+    def admit():
+        global _last_touch
+        try:
+            if request.blueprint == 'views' or request.endpoint in INTERACTIVE_ENDPOINTS:
+                # At most one mtime update per worker per second
+                now = time.time()
+                if now - _last_touch > 1:
+                    _last_touch = now
+                    store.touch_interactive()
+                return None
+            if request.blueprint != 'api' or request.endpoint in EXEMPT_ENDPOINTS:
+                return None
+
+            if request.endpoint not in INGEST_ENDPOINTS:
+                wait = store.take(*_buckets('api', app.config.get('API_RATE', API_RATE),
+                                            app.config.get('API_BURST', API_BURST)))
+                return too_many('rate', wait) if wait else None
+
+            # Slot first, so a request turned away for want of one keeps its sync token
+            limit = app.config['INGEST_CONCURRENCY']
+            if store.interactive_recently():
+                limit = max(1, limit // 2)
+            slot = store.acquire_slot(limit)
+            if slot is None:
+                return too_many('ingest', 2.0)
+            g.ingest_slot = slot
+            wait = store.take(*_buckets('sync', app.config.get('SYNC_RATE', SYNC_RATE),
+                                        app.config.get('SYNC_BURST', SYNC_BURST)))
+            if wait:
+                g.pop('ingest_slot').close()
+                return too_many('rate', wait)
+        except (OSError, sqlite3.Error) as e:
+            # The limiter must never be the outage: admit and log
+            current_app.logger.warning("Admission control unavailable: %s", e)
+        return None
+
+    @app.teardown_request
+    def release_slot(exc=None):
+        slot = g.pop('ingest_slot', None)
+        if slot is not None:
+            slot.close()
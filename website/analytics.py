@@ -0,0 +1,213 @@
+import numpy as np
+from sqlalchemy import func
+from .models import DryingRecord, Barangay, Farmer
+from .extensions import db
+
+
+def drying_rates_by_barangay(municipality_id):
+    """Per-barangay drying efficiency for a municipality, aggregated in the database.
+
+    Only records with a positive drying_minutes are counted. Rates are weighted
+    by drying time (total moisture points or kg over total hours) rather than
+    averaged per batch, so one short batch does not skew a barangay's figure.
+    """
+    hours = func.sum(DryingRecord.drying_minutes) / 60.0
+
+    query = db.session.query(
+        Barangay.id,
+        Barangay.name,
+        func.count(DryingRecord.id).label('batches'),
+        (func.avg(DryingRecord.drying_minutes) / 60.0).label('avg_drying_hours'),
+        (func.sum(DryingRecord.initial_moisture - DryingRecord.final_moisture)
+         / func.nullif(hours, 0)).label('moisture_loss_rate'),
+        (func.sum(DryingRecord.final_weight) / func.nullif(hours, 0)).label('kg_dried_per_hour'),
+    ).join(DryingRecord, DryingRecord.barangay_id == Barangay.id) \
+     .filter(Barangay.municipality_id == municipality_id,
+             DryingRecord.drying_minutes > 0) \
+     .group_by(Barangay.id, Barangay.name) \
+     .order_by(Barangay.name)
+
+    return [
+        {
+            'barangay_id': row.id,
+            'barangay_name': row.name,
+            'batches': row.batches,
+            'avg_drying_hours': round(row.avg_drying_hours or 0, 2),
+            'moisture_loss_rate': round(row.moisture_loss_rate or 0, 3),
+            'kg_dried_per_hour': round(row.kg_dried_per_hour or 0, 2),
+        }
+        for row in query.all()
+    ]
+
+
+# ==========================
+# Distribution statistics
+# ==========================
+PERCENTILES = (10, 25, 50, 75, 90)
+SAFE_STORAGE_MOISTURE = 14.0  # % moisture above which paddy is considered under-dried
+MOISTURE_BINS = np.arange(0, 32, 2, dtype=float)  # 2-point bins from 0% to 30%
+
+DISTRIBUTION_COLUMNS = ('initial_moisture', 'final_moisture', 'initial_weight',
+                        'final_weight', 'temperature', 'humidity')
+
+
+def load_columns(municipality_id=None, barangay_id=None, farmer_id=None):
+    """Fetch the numeric columns needed for distribution stats as NumPy arrays, in one query."""
+    query = db.session.query(
+        DryingRecord.id,
+        DryingRecord.barangay_id,
+        DryingRecord.farmer_id,
+        *(getattr(DryingRecord, name) for name in DISTRIBUTION_COLUMNS)
+    )
+    if municipality_id is not None:
+        query = query.join(Barangay, DryingRecord.barangay_id == Barangay.id) \
+                     .filter(Barangay.municipality_id == municipality_id)
+    if barangay_id is not None:
+        query = query.filter(DryingRecord.barangay_id == barangay_id)
+    if farmer_id is not None:
+        query = query.filter(DryingRecord.farmer_id == farmer_id)
+
+    rows = query.all()
+    matrix = np.array(rows, dtype=float).reshape(len(rows), 3 + len(DISTRIBUTION_COLUMNS))
+
+    columns = {
+        'id': matrix[:, 0].astype(np.int64),
+        'barangay_id': matrix[:, 1],
+        'farmer_id': matrix[:, 2],
+    }
+    for i, name in enumerate(DISTRIBUTION_COLUMNS):
+        columns[name] = matrix[:, 3 + i]
+    return columns
+
+
+def _group_percentiles(values, group_idx, n_groups):
+    """Linear-interpolated percentiles per group without a Python loop over groups.
+
+    Returns an (n_groups, len(PERCENTILES)) array; groups with no valid values are NaN.
+    """
+    valid = ~np.isnan(values)
+    values, group_idx = values[valid], group_idx[valid]
+
+    order = np.lexsort((values, group_idx))
+    values, group_idx = values[order], group_idx[order]
+
+    counts = np.bincount(group_idx, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    q = np.asarray(PERCENTILES, dtype=float)[None, :] / 100.0
+    pos = starts[:, None] + q * np.maximum(counts - 1, 0)[:, None]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+
+    result = np.full((n_groups, len(PERCENTILES)), np.nan)
+    has = counts > 0
+    if values.size:
+        lo_v = values[np.minimum(lo, values.size - 1)]
+        hi_v = values[np.minimum(hi, values.size - 1)]
+        interp = lo_v + (hi_v - lo_v) * (pos - lo)
+        result[has] = interp[has]
+    return result
+
+
+def distribution_stats(columns, group_by='barangay_id'):
+    """Percentiles, moisture histograms, weight-loss ratios and outlier flags per group.
+
+    `columns` comes from load_columns(); `group_by` is 'barangay_id' or 'farmer_id'.
+    Everything is computed over whole arrays: groups are mapped to dense indexes once
+    and every statistic is a bincount, sort or broadcast over those indexes.
+    """
+    keys = columns[group_by]
+    if keys.size == 0:
+        return {}
+
+    keys = np.where(np.isnan(keys), -1, keys).astype(np.int64)
+    group_ids, group_idx = np.unique(keys, return_inverse=True)
+    n_groups = group_ids.size
+    counts = np.bincount(group_idx, minlength=n_groups)
+
+    initial_weight = columns['initial_weight']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight_loss = np.where(initial_weight > 0,
+                               (initial_weight - columns['final_weight']) / initial_weight,
+                               np.nan)
+
+    metrics = {
+        'final_moisture': columns['final_moisture'],
+        'initial_moisture': columns['initial_moisture'],
+        'weight_loss_ratio': weight_loss,
+        'temperature': columns['temperature'],
+        'humidity': columns['humidity'],
+    }
+    percentiles = {name: _group_percentiles(values, group_idx, n_groups)
+                   for name, values in metrics.items()}
+
+    # Final moisture histogram, one row per group
+    n_bins = MOISTURE_BINS.size - 1
+    moisture = columns['final_moisture']
+    bin_idx = np.clip(np.digitize(moisture, MOISTURE_BINS) - 1, 0, n_bins - 1)
+    in_range = ~np.isnan(moisture)
+    histogram = np.bincount(group_idx[in_range] * n_bins + bin_idx[in_range],
+                            minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+    under_dried = np.bincount(group_idx, weights=(moisture > SAFE_STORAGE_MOISTURE),
+                              minlength=n_groups)
+
+    # Tukey fences on the weight-loss ratio, per group
+    q1 = percentiles['weight_loss_ratio'][:, PERCENTILES.index(25)][group_idx]
+    q3 = percentiles['weight_loss_ratio'][:, PERCENTILES.index(75)][group_idx]
+    iqr = q3 - q1
+    with np.errstate(invalid='ignore'):
+        outlier = (weight_loss < q1 - 1.5 * iqr) | (weight_loss > q3 + 1.5 * iqr)
+        outlier |= (columns['final_weight'] > initial_weight)
+    outlier_ids = columns['id'][outlier]
+    outlier_groups = group_idx[outlier]
+
+    def as_dict(row):
+        return {f"p{p}": (None if np.isnan(v) else round(float(v), 4)) for p, v in zip(PERCENTILES, row)}
+
+    stats = {}
+    for i, group_id in enumerate(group_ids.tolist()):
+        stats[None if group_id == -1 else group_id] = {
+            'count': int(counts[i]),
+            'percentiles': {name: as_dict(values[i]) for name, values in percentiles.items()},
+            'final_moisture_histogram': histogram[i].tolist(),
+            'under_dried_share': round(float(under_dried[i] / counts[i]), 4),
+            'outlier_record_ids': outlier_ids[outlier_groups == i].tolist(),
+        }
+    return stats
+
+
+def distribution_for_user(user, group_by=None):
+    """Scope the distribution stats to what the given user may see, with group labels attached."""
+    if user.role == 'municipal':
+        columns = load_columns(municipality_id=user.municipality_id)
+        group_by = group_by or 'barangay'
+    elif user.role == 'barangay':
+        columns = load_columns(barangay_id=user.barangay_id)
+        group_by = group_by or 'farmer'
+    elif user.role == 'farmer':
+        columns = load_columns(farmer_id=user.id)
+        group_by = 'farmer'
+    else:
+        return []
+
+    if group_by not in ('barangay', 'farmer'):
+        group_by = 'barangay'
+
+    stats = distribution_stats(columns, group_by=f"{group_by}_id")
+    ids = [group_id for group_id in stats if group_id is not None]
+    if group_by == 'barangay':
+        labels = {b.id: b.name for b in Barangay.query.filter(Barangay.id.in_(ids)).all()}
+    else:
+        labels = {f.id: f.full_name for f in Farmer.query.filter(Farmer.id.in_(ids)).all()}
+
+    groups = []
+    for group_id, group_stats in stats.items():
+        groups.append({
+            'group_by': group_by,
+            'id': group_id,
+            'label': labels.get(group_id, 'Unassigned'),
+            **group_stats
+        })
+    groups.sort(key=lambda g: g['label'])
+    return groups
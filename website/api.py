@@ -1,25 +1,75 @@
-from flask import Blueprint, request, jsonify
-from .models import DryingRecord, Farmer, User, Barangay, Municipality
+from flask import Blueprint, request, jsonify, Response, send_file, current_app, stream_with_context
+from .models import DryingRecord, Farmer, User, Barangay, Municipality, QuarantinedRecord
 from .extensions import db
+from .utils import parse_drying_minutes, IN_CHUNK
+from .analytics import distribution_for_user, MOISTURE_BINS, SAFE_STORAGE_MOISTURE
+from . import prediction
+from .bootstrap import get_bundle, bundle_etag
+from .snapshot import current_snapshot
+from .compression import compress_response, records_response, request_json
+from .search import search as run_search, SEARCH_KINDS
+from .schedule import due_schedule, DEFAULT_WINDOW_DAYS, OVERDUE_LIMIT
+from .metrics import record_sync
+from .bulk import apply_bulk, BulkError
+from .charts import chart_response, yield_chart, output_trend, YIELD_VIEWS, PERIODS
+from .quality import screen
+from . import live
 from flask_login import login_required, current_user
-from werkzeug.security import check_password_hash
+from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.exceptions import HTTPException
+from sqlalchemy.orm import joinedload
 from flask_login import login_user
-from datetime import datetime
+from datetime import datetime, timedelta
+import json
+import secrets
 
 api = Blueprint('api', __name__)
 auth = Blueprint('auth', __name__)
 
+api.after_request(compress_response)
+
 from datetime import datetime
 
+# created_at/updated_at are the writing transaction's start time on Postgres, so a sync
+# that commits after a watermark was taken can carry older timestamps; re-send that long
+SINCE_MARGIN = timedelta(minutes=10)
+
+
+def _by_uuid(model, uuids, *options):
+    """{uuid: row} for the given uuids, looked up in chunks instead of one query per record."""
+    uuids = [u for u in uuids if isinstance(u, str)]
+    found = {}
+    for start in range(0, len(uuids), IN_CHUNK):
+        for row in model.query.options(*options).filter(model.uuid.in_(uuids[start:start + IN_CHUNK])):
+            found[row.uuid] = row
+    return found
+
+
 @api.route('/sync', methods=['POST'])
 def sync():
+    data = None
     try:
-        data = request.get_json()
+        data = request_json()
 
         if not data or 'records' not in data:
+            record_sync('invalid')
             return jsonify({"status": "error", "message": "Invalid data format."}), 400
 
-        for record in data['records']:
+        # Farmers (and so barangays) come from the server, never from the payload
+        farmers = _by_uuid(Farmer, {r.get('farmer_uuid') for r in data['records'] if isinstance(r, dict)},
+                           joinedload(Farmer.barangay))
+        fallback_barangay_id = getattr(current_user, 'barangay_id', None)
+        barangay_ids = [farmers[r.get('farmer_uuid')].barangay_id if r.get('farmer_uuid') in farmers
+                        else fallback_barangay_id for r in data['records']]
+
+        # Flagged records go to quarantined_records for review instead of drying_records
+        flagged = screen(data['records'], barangay_ids)
+        held = _by_uuid(QuarantinedRecord, {r.get('uuid') for r in data['records'] if isinstance(r, dict)})
+
+        new_records = []
+        unknown_farmer_uuids = set()
+        duplicates = unknown_farmers = quarantined = 0
+        for i, record in enumerate(data['records']):
             # Validate required fields
             required_fields = [
                 'uuid', 'batch_name', 'initial_weight', 'temperature', 'humidity',
@@ -27,19 +77,43 @@ def sync():
                 'drying_time', 'final_weight', 'farmer_uuid', 'user_id','date_dried'
             ]
             if not all(field in record for field in required_fields):
+                record_sync('invalid', len(data['records']))
                 return jsonify({"status": "error", "message": "Missing fields in record."}), 400
 
             # Check if the record already exists (by UUID)
             existing = DryingRecord.query.filter_by(uuid=record['uuid']).first()
             if existing:
+                duplicates += 1
                 continue  # Skip duplicate
 
             # Look up farmer by farmer_uuid
-            farmer = Farmer.query.filter_by(uuid=record.get('farmer_uuid')).first()
+            farmer = farmers.get(record.get('farmer_uuid'))
             if not farmer:
                 print(f"Skipping record {record['uuid']}: farmer_uuid {record.get('farmer_uuid')} not found.")
+                unknown_farmers += 1
+                if isinstance(record.get('farmer_uuid'), str):
+                    unknown_farmer_uuids.add(record['farmer_uuid'])
                 continue
 
+            barangay_id = barangay_ids[i]
+            municipality_id = farmer.barangay.municipality_id if farmer.barangay else None
+            if i in flagged:
+                # A resend that still fails replaces what was held; it stays out of drying_records
+                row = held.get(record['uuid'])
+                if row is None:
+                    row = held[record['uuid']] = QuarantinedRecord(uuid=record['uuid'])
+                    db.session.add(row)
+                row.payload = json.dumps(record)
+                row.reasons = json.dumps(flagged[i])
+                row.farmer_id = farmer.id
+                row.barangay_id = barangay_id
+                row.municipality_id = municipality_id
+                quarantined += 1
+                continue
+            if record['uuid'] in held:
+                # A corrected resend is admitted and no longer waits for review
+                db.session.delete(held.pop(record['uuid']))
+
             # Parse optional dates
             def parse_date(d):
                 return datetime.strptime(d, '%Y-%m-%d').date() if d else None
@@ -63,6 +137,7 @@ def sync():
                 initial_moisture=record['initial_moisture'],
                 final_moisture=record['final_moisture'],
                 drying_time=record['drying_time'],
+                drying_minutes=parse_drying_minutes(record['drying_time']),
                 final_weight=record['final_weight'],
                 date_planted=parse_date(record['date_planted']),
                 date_harvested=parse_date(record['date_harvested']),
@@ -73,17 +148,46 @@ def sync():
 
                 farmer_id=farmer.id,
                 farmer_name=record.get('farmer_name'),
-                barangay_id=record.get('barangay_id'),
-                municipality_id=record.get('municipality_id'),
+                barangay_id=barangay_id,
+                municipality_id=municipality_id,
             )
             db.session.add(new_record)
+            new_records.append(new_record)
 
+        observed = prediction.observed(new_records)
         db.session.commit()
-        return jsonify({"status": "success", "message": "Records synced."}), 200
+        record_sync('inserted', len(new_records))
+        record_sync('duplicate', duplicates)
+        record_sync('unknown_farmer', unknown_farmers)
+        record_sync('quarantined', quarantined)
+
+        try:
+            prediction.observe(observed)
+        except Exception as e:
+            print(f"Could not update drying-time models: {e}")
+
+        return jsonify({
+            "status": "success",
+            "message": "Records synced.",
+            "inserted": len(new_records),
+            "duplicates": duplicates,
+            "unknown_farmers": unknown_farmers,
+            "unknown_farmer_uuids": sorted(unknown_farmer_uuids),
+            "quarantined": quarantined
+        }), 200
+
+    except HTTPException as e:
+        # Undecodable or oversized bodies (request_json) are the client's fault: 400/413, not 500
+        db.session.rollback()
+        record_sync('invalid')
+        return jsonify({"status": "error", "message": e.description}), e.code
 
     except Exception as e:
         import traceback
         traceback.print_exc()
+        db.session.rollback()
+        records = data.get('records') if isinstance(data, dict) else None
+        record_sync('failed', len(records) if isinstance(records, list) else 1)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
@@ -98,7 +202,18 @@ def fetch():
     if not farmer:
         return jsonify({"status": "error", "message": "Farmer not found"}), 404
 
-    records = DryingRecord.query.filter_by(farmer_id=farmer.id).all()
+    query = DryingRecord.query.filter_by(farmer_id=farmer.id)
+
+    # Delta sync: records created or changed since the watermark, minus SINCE_MARGIN (devices dedupe by uuid)
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since) - SINCE_MARGIN
+        except ValueError:
+            return jsonify({"status": "error", "message": "Invalid since timestamp"}), 400
+        query = query.filter(db.or_(DryingRecord.created_at >= since, DryingRecord.updated_at >= since))
+
+    records = query.all()
 
     data = []
     for record in records:
@@ -112,6 +227,7 @@ def fetch():
             "initial_moisture": record.initial_moisture,
             "final_moisture": record.final_moisture,
             "drying_time": record.drying_time,
+            "drying_minutes": record.drying_minutes,
             "final_weight": record.final_weight,
             "date_planted": record.date_planted.isoformat() if record.date_planted else None,
             "date_harvested": record.date_harvested.isoformat() if record.date_harvested else None,
@@ -127,7 +243,7 @@ def fetch():
             "municipality_name": record.municipality.name if record.municipality else None
         })
 
-    return jsonify(data), 200
+    return records_response(data), 200
 
 
 
@@ -151,6 +267,51 @@ def get_farmer(username):
         return jsonify({"message": "Farmer not found"}), 404
     
 
+@api.route('/farmers', methods=['POST'])
+@login_required
+def register_farmers():
+    """Register farmers created on an edge node under the caller's barangay, keeping their uuids.
+
+    They get an unusable password here (they log in on the edge node). Farmers
+    already registered are left alone; a taken username is reported as a conflict.
+    """
+    if current_user.role != 'barangay':
+        return jsonify({"status": "error", "message": "Only barangay staff can register farmers."}), 403
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('farmers'), list):
+        return jsonify({"status": "error", "message": "Expected a list of farmers."}), 400
+    farmers = [f for f in data['farmers'] if isinstance(f, dict)]
+    if not all(isinstance(f.get(field), str) and f[field] for f in farmers
+               for field in ('uuid', 'username', 'first_name', 'last_name')):
+        return jsonify({"status": "error", "message": "Missing fields in farmer."}), 400
+
+    existing = _by_uuid(Farmer, [f['uuid'] for f in farmers])
+    taken = {username for username, in db.session.query(Farmer.username)
+             .filter(Farmer.username.in_([f['username'] for f in farmers]))}
+    registered, conflicts = 0, []
+    for f in farmers:
+        if f['uuid'] in existing:
+            continue
+        if f['username'] in taken:
+            conflicts.append(f['uuid'])
+            continue
+        taken.add(f['username'])
+        db.session.add(Farmer(
+            uuid=f['uuid'],
+            username=f['username'],
+            password=generate_password_hash(secrets.token_hex(16)),
+            first_name=f['first_name'],
+            middle_name=f.get('middle_name'),
+            last_name=f['last_name'],
+            barangay_id=current_user.barangay_id,
+            user_id=current_user.id
+        ))
+        registered += 1
+    db.session.commit()
+    return jsonify({"status": "success", "registered": registered, "existing": len(existing),
+                    "conflicts": conflicts}), 200
+
+
 @api.route('/users', methods=['GET'])
 def get_all_users():
     users = User.query.all()
@@ -188,3 +349,200 @@ def get_all_municipalities():
             "name": m.name
         })
     return jsonify(municipality_list), 200
+
+
+@api.route('/analytics/distribution', methods=['GET'])
+@login_required
+def distribution():
+    group_by = request.args.get('group')
+    groups = distribution_for_user(current_user, group_by=group_by)
+    return jsonify({
+        "moisture_bins": MOISTURE_BINS.tolist(),
+        "safe_storage_moisture": SAFE_STORAGE_MOISTURE,
+        "groups": groups
+    }), 200
+
+
+@api.route('/charts/yield/<view>', methods=['GET'])
+@login_required
+def yield_chart_data(view):
+    if YIELD_VIEWS.get(view) != current_user.role:
+        return jsonify({"status": "error", "message": "Chart not available for your role."}), 404
+    response = chart_response(current_user, f'yield/{view}', yield_chart, view=view)
+    # Read after the chart: the dashboard drops live deltas up to this id as already counted
+    response.headers['X-Last-Event-ID'] = str(live.latest_event_id())
+    return response
+
+
+@api.route('/charts/output', methods=['GET'])
+@login_required
+def output_chart_data():
+    period = request.args.get('period', 'month')
+    if period not in PERIODS:
+        return jsonify({"status": "error", "message": f"period must be one of: {', '.join(PERIODS)}."}), 400
+    return chart_response(current_user, 'output', output_trend, period=period)
+
+
+@api.route('/predict/drying-time', methods=['POST'])
+@login_required
+def predict_drying_time():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('batches'), list):
+        return jsonify({"status": "error", "message": "Expected a list of batches."}), 400
+
+    barangay_id = data.get('barangay_id', current_user.barangay_id)
+    try:
+        barangay_id = int(barangay_id) if barangay_id is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "barangay_id must be an integer."}), 400
+    if current_user.role == 'municipal':
+        barangay = Barangay.query.get(barangay_id) if barangay_id else None
+        if not barangay or barangay.municipality_id != current_user.municipality_id:
+            return jsonify({"status": "error", "message": "Barangay not in your municipality."}), 403
+    elif barangay_id != current_user.barangay_id:
+        return jsonify({"status": "error", "message": "Barangay not in your scope."}), 403
+
+    model, model_barangay_id = prediction.model_for_barangay(barangay_id)
+    if not model.ready:
+        return jsonify({"status": "error", "message": "Not enough drying history to predict yet."}), 409
+
+    minutes = prediction.score_batches(model, data['batches'])
+    return jsonify({
+        "status": "success",
+        "model": {"barangay_id": model_barangay_id, "samples": model.n},
+        "predictions": [
+            {"drying_minutes": m, "drying_hours": round(m / 60, 2) if m is not None else None}
+            for m in minutes
+        ]
+    }), 200
+
+
+@api.route('/bootstrap', methods=['GET'])
+@login_required
+def bootstrap():
+    etag = bundle_etag(current_user)
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(get_bundle(current_user, etag), mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api.route('/snapshot', methods=['GET'])
+@login_required
+def snapshot():
+    path, watermark = current_snapshot(current_app._get_current_object(), current_user)
+    if path is None:
+        response = jsonify({"status": "building", "message": "Snapshot is being prepared, retry shortly."})
+        response.status_code = 202
+        response.headers['Retry-After'] = '5'
+        return response
+
+    response = send_file(path,
+                         mimetype='application/vnd.sqlite3',
+                         as_attachment=True,
+                         download_name='paddy_tracker.sqlite',
+                         conditional=True)
+    response.headers['X-Snapshot-Watermark'] = watermark.isoformat() if watermark else ''
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api.route('/search', methods=['GET'])
+@login_required
+def search():
+    query = request.args.get('q', '')
+    kind = request.args.get('type')
+    kinds = (kind,) if kind in SEARCH_KINDS else SEARCH_KINDS
+    limit = min(request.args.get('limit', 20, type=int), 100)
+
+    return jsonify({"query": query, "results": run_search(current_user, query, kinds, limit)}), 200
+
+
+@api.route('/schedule', methods=['GET'])
+@login_required
+def schedule():
+    start = request.args.get('start')
+    try:
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid start date"}), 400
+    days = request.args.get('days', DEFAULT_WINDOW_DAYS, type=int)
+    overdue_limit = request.args.get('overdue_limit', OVERDUE_LIMIT, type=int)
+
+    return jsonify(due_schedule(current_user, start, days, overdue_limit)), 200
+
+
+@api.route('/quarantine', methods=['GET'])
+@login_required
+def quarantine():
+    query = QuarantinedRecord.query
+    if current_user.role == 'farmer':
+        query = query.filter(QuarantinedRecord.farmer_id == current_user.id)
+    elif current_user.role == 'barangay':
+        query = query.filter(QuarantinedRecord.barangay_id == current_user.barangay_id)
+    else:
+        query = query.join(Barangay, QuarantinedRecord.barangay_id == Barangay.id) \
+            .filter(Barangay.municipality_id == current_user.municipality_id)
+    limit = min(request.args.get('limit', 100, type=int), 500)
+
+    return jsonify({"records": [
+        {
+            "uuid": q.uuid,
+            "farmer_id": q.farmer_id,
+            "barangay_id": q.barangay_id,
+            "reasons": json.loads(q.reasons),
+            "record": json.loads(q.payload),
+            "created_at": q.created_at.isoformat() if q.created_at else None,
+        }
+        for q in query.order_by(QuarantinedRecord.id.desc()).limit(limit)
+    ]}), 200
+
+
+@api.route('/records/bulk', methods=['POST'])
+@login_required
+def bulk_records():
+    if current_user.role == 'municipal':
+        return jsonify({"status": "error", "message": "Municipal accounts cannot modify records."}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Invalid data format."}), 400
+
+    try:
+        affected = apply_bulk(current_user, data)
+    except BulkError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if affected:
+        live.publish_reset(current_user.barangay_id)
+
+    response = {"status": "success", "action": data['action'], "affected": affected}
+    if data.get('uuids') is not None:
+        response["requested"] = len(data['uuids'])
+    return jsonify(response), 200
+
+
+@api.route('/events', methods=['GET'])
+@login_required
+def events():
+    subscriber = live.Subscriber(current_user)
+    if not live.broker.subscribe(current_app._get_current_object(), subscriber,
+                                 current_app.config['SSE_MAX_CONNECTIONS']):
+        response = jsonify({"status": "error", "message": "Too many live connections, retry later."})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    # EventSource sends Last-Event-ID when it reconnects; `after` is where the
+    # dashboard's first connection resumes from (the event id of its chart data)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get('after', type=int)
+    response = Response(stream_with_context(live.stream(subscriber, last_event_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
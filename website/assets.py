@@ -0,0 +1,221 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import current_app, request, send_file, url_for, abort
+from flask.cli import with_appcontext
+from markupsafe import Markup
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional: builds without it ship gzip variants only
+    brotli = None
+
+# Third-party assets served from website/static/vendor instead of a CDN, so pages
+# load on a LAN-only edge node. `flask assets fetch` downloads these pinned
+# versions; each URL is also the fallback while a file has not been fetched yet.
+CDN = 'https://cdn.jsdelivr.net/npm'
+VENDOR = {
+    'vendor/bootstrap/bootstrap.min.css': f'{CDN}/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': f'{CDN}/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+    'vendor/bootstrap-icons/bootstrap-icons.css': f'{CDN}/bootstrap-icons@1.10.5/font/bootstrap-icons.css',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2': f'{CDN}/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff': f'{CDN}/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff',
+    'vendor/chart.js/chart.umd.js': f'{CDN}/chart.js@4.4.1/dist/chart.umd.js',
+}
+
+DIST_DIR = 'dist'                 # build output under the static folder, see `flask assets build`
+MANIFEST = 'manifest.json'        # logical path -> fingerprinted path
+MAX_AGE = 365 * 24 * 3600         # fingerprinted URLs never change content
+# Text formats worth precompressing; fonts and images are compressed already
+PRECOMPRESS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))   # preference order when a client accepts both
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+SOURCE_MAP = re.compile(r'^\s*(?:/\*# sourceMappingURL=.*?\*/|//# sourceMappingURL=\S*)\s*$', re.M)
+
+
+def _dist(app):
+    return os.path.join(app.static_folder, DIST_DIR)
+
+
+def _load_manifest(app):
+    try:
+        with open(os.path.join(_dist(app), MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(name):
+    """URL for a file under the static folder: fingerprinted once built, else the plain or CDN one."""
+    app = current_app
+    hashed = app.extensions['assets']['manifest'].get(name)
+    if hashed:
+        return url_for('assets', filename=hashed)
+    if name in VENDOR and not os.path.exists(os.path.join(app.static_folder, name)):
+        return VENDOR[name]
+    return url_for('static', filename=name)
+
+
+def asset_inline(name):
+    """Contents of a fetched text asset for self-contained documents (season report files), or None."""
+    try:
+        with open(os.path.join(current_app.static_folder, name), encoding='utf-8') as f:
+            return Markup(SOURCE_MAP.sub('', f.read()))
+    except OSError:
+        return None
+
+
+def serve_asset(filename):
+    """A fingerprinted file, as the precompressed variant the client accepts when there is one."""
+    app = current_app
+    if filename not in app.extensions['assets']['files']:
+        abort(404)
+    path = safe_join(_dist(app), filename)
+
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.exists(path + suffix):
+            encoding, path = name, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         conditional=True, max_age=MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    manifest = _load_manifest(app)
+    app.extensions['assets'] = {'manifest': manifest, 'files': set(manifest.values())}
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.jinja_env.globals.update(asset_url=asset_url, asset_inline=asset_inline)
+
+
+# ==========================
+# Build
+# ==========================
+def _fingerprint(name, data):
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _rewrite_css(name, data, manifest):
+    """Point relative url()s (fonts) at their fingerprinted files and drop unbuilt source maps."""
+    base = posixpath.dirname(name)   # fingerprinting keeps the directory, so relative paths still work
+
+    def replace(match):
+        quote, target = match.groups()
+        if target.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        path = posixpath.normpath(posixpath.join(base, re.split(r'[?#]', target, 1)[0]))
+        if path not in manifest:
+            return match.group(0)
+        return f"url({quote}{posixpath.relpath(manifest[path], base)}{quote})"
+
+    text = CSS_URL.sub(replace, data.decode('utf-8'))
+    return SOURCE_MAP.sub('', text).encode('utf-8')
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build(app, clean=False):
+    """Fingerprint every static file into static/dist with .gz/.br variants; returns (manifest, sizes).
+
+    CSS goes last so the font and image URLs inside it can point at their
+    fingerprinted names (and its own hash changes when theirs do).
+    """
+    static, dist = app.static_folder, _dist(app)
+    names = []
+    for root, dirs, files in os.walk(static):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and os.path.join(root, d) != dist]
+        names += [posixpath.join(*os.path.relpath(os.path.join(root, f), static).split(os.sep))
+                  for f in files if not f.startswith('.') and not f.endswith('.map')]
+    names.sort(key=lambda name: (name.endswith('.css'), name))
+
+    manifest, sizes = {}, {}
+    for name in names:
+        with open(os.path.join(static, name), 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            data = _rewrite_css(name, data, manifest)
+        elif name.endswith('.js'):
+            data = SOURCE_MAP.sub('', data.decode('utf-8')).encode('utf-8')
+        hashed = _fingerprint(name, data)
+        manifest[name] = hashed
+
+        target = os.path.join(dist, *hashed.split('/'))
+        _write(target, data)
+        sizes[name] = [len(data)]
+        if name.endswith(PRECOMPRESS):
+            # mtime=0 keeps rebuilds byte-identical
+            variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, body in variants:
+                if len(body) < len(data):
+                    _write(target + suffix, body)
+                    sizes[name].append(len(body))
+
+    if clean:
+        keep = {os.path.join(dist, *hashed.split('/')) for hashed in manifest.values()}
+        for root, _, files in os.walk(dist):
+            for f in files:
+                path = os.path.join(root, f)
+                if f != MANIFEST and path not in keep and path.rsplit('.', 1)[0] not in keep:
+                    os.remove(path)
+
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    return manifest, sizes
+
+
+@click.group('assets')
+def assets_command():
+    """Vendor, fingerprint and precompress static assets."""
+
+
+@assets_command.command('fetch')
+@click.option('--force', is_flag=True, help='Download again even if the file exists.')
+@with_appcontext
+def fetch_command(force):
+    """Download the pinned third-party assets into static/vendor."""
+    import requests
+
+    for name, url in VENDOR.items():
+        path = os.path.join(current_app.static_folder, *name.split('/'))
+        if os.path.exists(path) and not force:
+            continue
+        response = requests.get(url, timeout=60)
+        response.raise_for_status()
+        _write(path, response.content)
+        click.echo(f"{name:<56} {len(response.content):>9} bytes  {url}")
+
+
+@assets_command.command('build')
+@click.option('--clean', is_flag=True, help='Remove files of earlier builds from static/dist.')
+@with_appcontext
+def build_command(clean):
+    """Write fingerprinted, precompressed copies of static files to static/dist."""
+    missing = [name for name in VENDOR if not os.path.exists(os.path.join(current_app.static_folder, name))]
+    if missing:
+        click.echo(f"Not fetched (pages keep using the CDN for these): {', '.join(missing)}. "
+                   f"Run `flask assets fetch` first.")
+    manifest, sizes = build(current_app, clean)
+    for name, hashed in manifest.items():
+        click.echo(f"{hashed:<64} " + ' / '.join(str(size) for size in sizes[name]))
+    click.echo(f"{len(manifest)} files; restart the app to pick up the new manifest.")
@@ -1,6 +1,5 @@
-from flask import Blueprint, redirect, url_for, flash, render_template, request, jsonify, session
+from flask import Blueprint, redirect, url_for, flash, render_template, request, jsonify, session, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from flask_dance.contrib.google import make_google_blueprint, google
 from werkzeug.security import generate_password_hash, check_password_hash
 from .models import db, User, Farmer, Municipality, Barangay, User
 import os
@@ -8,16 +7,32 @@ import os
 auth = Blueprint('auth', __name__)
 
 
-google_bp = make_google_blueprint(
-    client_id=os.getenv("GOOGLE_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-    scope=["profile", "email"],
-    redirect_to="auth.google_login"
-)
+def init_google(app):
+    """Register the Flask-Dance Google blueprint at /login, if a client id is configured.
+
+    Flask-Dance brings in requests-oauthlib and the OAuth session machinery, which
+    device API traffic never uses, so it is only imported when Google sign-in is on.
+    """
+    if not app.config.get('GOOGLE_CLIENT_ID'):
+        return
+    from flask_dance.contrib.google import make_google_blueprint
+
+    google_bp = make_google_blueprint(
+        client_id=app.config['GOOGLE_CLIENT_ID'],
+        client_secret=app.config.get('GOOGLE_CLIENT_SECRET'),
+        scope=["profile", "email"],
+        redirect_to="auth.google_login"
+    )
+    app.register_blueprint(google_bp, url_prefix="/login")
 
 
 @auth.route("/login/google")
 def google_login():
+    if 'google' not in current_app.blueprints:
+        flash("Google sign-in is not available.", "error")
+        return redirect(url_for("auth.login"))
+    from flask_dance.contrib.google import google
+
     if not google.authorized:
         return redirect(url_for("google.login"))
 
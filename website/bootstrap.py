@@ -0,0 +1,116 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+from .models import User, Farmer, Barangay, Municipality, ReferenceChange
+from .extensions import db
+from .metrics import record_cache
+
+BUNDLE_SCHEMA_VERSION = 1
+CACHE_SIZE = 256          # bundle bodies kept per worker, keyed by ETag
+REFERENCE_MODELS = (User, Farmer, Barangay, Municipality)
+
+_bundles = OrderedDict()
+_lock = threading.Lock()
+
+
+def scope_key(user):
+    """Cache key for the reference data a user is allowed to see."""
+    if user.role == 'farmer':
+        return ('farmer', user.id)
+    if user.role == 'barangay':
+        return ('barangay', user.barangay_id)
+    return ('municipal', user.municipality_id)
+
+
+def _user_dict(user):
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": user.role,
+        "barangay_id": user.barangay_id,
+        "municipality_id": user.municipality_id
+    }
+
+
+def _farmer_dict(farmer):
+    return {
+        "uuid": farmer.uuid,
+        "username": farmer.username,
+        "first_name": farmer.first_name,
+        "middle_name": farmer.middle_name,
+        "last_name": farmer.last_name,
+        "barangay_id": farmer.barangay_id
+    }
+
+
+def build_bundle(user):
+    """Reference data scoped to the user's barangay or municipality."""
+    if user.role in ('farmer', 'barangay'):
+        barangay = Barangay.query.get(user.barangay_id)
+        barangays = [barangay] if barangay else []
+        municipality = barangay.municipality if barangay else None
+        users = User.query.filter_by(barangay_id=user.barangay_id).all()
+        if user.role == 'farmer':
+            farmers = [user]
+        else:
+            farmers = Farmer.query.filter_by(barangay_id=user.barangay_id).all()
+    else:
+        municipality = Municipality.query.get(user.municipality_id)
+        barangays = Barangay.query.filter_by(municipality_id=user.municipality_id).all()
+        barangay_ids = [b.id for b in barangays]
+        users = User.query.filter(
+            (User.municipality_id == user.municipality_id) | User.barangay_id.in_(barangay_ids)
+        ).all()
+        farmers = Farmer.query.filter(Farmer.barangay_id.in_(barangay_ids)).all()
+
+    return {
+        "municipality": {"id": municipality.id, "name": municipality.name} if municipality else None,
+        "barangays": [{"id": b.id, "name": b.name, "municipality_id": b.municipality_id}
+                      for b in sorted(barangays, key=lambda b: b.id)],
+        "users": [_user_dict(u) for u in sorted(users, key=lambda u: u.id)],
+        "farmers": [_farmer_dict(f) for f in sorted(farmers, key=lambda f: f.id)]
+    }
+
+
+def reference_version():
+    """Id of the newest reference_changes row; every worker sees it move when any of them commits a change."""
+    return db.session.query(func.max(ReferenceChange.id)).scalar() or 0
+
+
+def bundle_etag(user):
+    """ETag of the user's bundle, from the scope and the reference data version (one indexed query)."""
+    return hashlib.sha1(
+        f"{BUNDLE_SCHEMA_VERSION}|{scope_key(user)}|{reference_version()}".encode()
+    ).hexdigest()[:32]
+
+
+def get_bundle(user, etag):
+    """Body of the user's bundle for `etag`, served from this worker's cache when it has it."""
+    with _lock:
+        body = _bundles.get(etag)
+        if body is not None:
+            _bundles.move_to_end(etag)
+    record_cache('bootstrap', body is not None)
+    if body is None:
+        body = json.dumps(build_bundle(user), sort_keys=True, separators=(',', ':')).encode('utf-8')
+        with _lock:
+            _bundles[etag] = body
+            while len(_bundles) > CACHE_SIZE:
+                _bundles.popitem(last=False)
+    return body
+
+
+def _record_change(session, flush_context):
+    """Bump the reference version in the same transaction as the change, so it commits or rolls back with it."""
+    changed = any(isinstance(obj, REFERENCE_MODELS) for obj in session.new) \
+        or any(isinstance(obj, REFERENCE_MODELS) for obj in session.deleted) \
+        or any(isinstance(obj, REFERENCE_MODELS) and session.is_modified(obj) for obj in session.dirty)
+    if changed:
+        session.connection().execute(insert(ReferenceChange))
+
+
+event.listen(Session, 'after_flush', _record_change)
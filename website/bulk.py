@@ -0,0 +1,127 @@
+from datetime import datetime
+
+from sqlalchemy import delete, select, update
+
+from .extensions import db
+from .models import DryingRecord, Farmer, Barangay
+from .utils import parse_drying_minutes, IN_CHUNK
+
+BULK_ACTIONS = ('update', 'delete')
+MAX_UUIDS = 10000
+
+
+class BulkError(ValueError):
+    """A bulk request that cannot be applied; the message is safe to return to the client."""
+
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def _text(value):
+    value = str(value).strip() if value is not None else ''
+    if not value:
+        raise ValueError('must not be empty')
+    return value
+
+
+# Fields a bulk update may set, with the parser applied to each incoming value
+EDITABLE_FIELDS = {
+    'batch_name': _text,
+    'initial_weight': float,
+    'final_weight': float,
+    'drying_time': _text,
+    'due_date': _date,
+    'date_planted': _date,
+    'date_harvested': _date,
+    'date_dried': _date,
+}
+
+# Filter keys and the condition each one adds
+FILTERS = {
+    'barangay_id': lambda v: DryingRecord.barangay_id == int(v),
+    'farmer_uuid': lambda v: DryingRecord.farmer_id == select(Farmer.id).where(Farmer.uuid == v).scalar_subquery(),
+    'batch_name': lambda v: DryingRecord.batch_name == v,
+    'date_dried_from': lambda v: DryingRecord.date_dried >= _date(v),
+    'date_dried_to': lambda v: DryingRecord.date_dried <= _date(v),
+    'date_harvested_from': lambda v: DryingRecord.date_harvested >= _date(v),
+    'date_harvested_to': lambda v: DryingRecord.date_harvested <= _date(v),
+    'due_from': lambda v: DryingRecord.due_date >= _date(v),
+    'due_to': lambda v: DryingRecord.due_date <= _date(v),
+}
+
+
+def record_scope(user):
+    """SQL condition limiting drying records to the ones `user` may change."""
+    if user.role == 'farmer':
+        return DryingRecord.farmer_id == user.id
+    if user.role == 'barangay':
+        return DryingRecord.barangay_id == user.barangay_id
+    return DryingRecord.barangay_id.in_(
+        select(Barangay.id).where(Barangay.municipality_id == user.municipality_id))
+
+
+def _targets(data):
+    """Condition lists selecting the records named by `uuids` or `filter`, one per statement.
+
+    uuids are split into IN_CHUNK-sized lists, so a long list stays under the
+    database's bound-parameter limit.
+    """
+    uuids, filters = data.get('uuids'), data.get('filter')
+    if uuids is not None:
+        if not isinstance(uuids, list) or not uuids or not all(isinstance(u, str) for u in uuids):
+            raise BulkError('uuids must be a non-empty list of strings.')
+        if len(uuids) > MAX_UUIDS:
+            raise BulkError(f'At most {MAX_UUIDS} uuids per request.')
+        return [[DryingRecord.uuid.in_(uuids[start:start + IN_CHUNK])]
+                for start in range(0, len(uuids), IN_CHUNK)]
+
+    # An empty filter would hit every record in scope, so at least one key is required
+    if not isinstance(filters, dict) or not filters:
+        raise BulkError('Provide uuids or a non-empty filter.')
+    unknown = set(filters) - set(FILTERS)
+    if unknown:
+        raise BulkError(f"Unknown filter: {', '.join(sorted(unknown))}.")
+    try:
+        return [[FILTERS[key](value) for key, value in filters.items()]]
+    except (TypeError, ValueError):
+        raise BulkError('Invalid filter value.')
+
+
+def _values(data):
+    values = data.get('values')
+    if not isinstance(values, dict) or not values:
+        raise BulkError('values must name at least one field to set.')
+    unknown = set(values) - set(EDITABLE_FIELDS)
+    if unknown:
+        raise BulkError(f"Fields cannot be bulk edited: {', '.join(sorted(unknown))}.")
+
+    parsed = {}
+    for field, value in values.items():
+        try:
+            parsed[field] = EDITABLE_FIELDS[field](value)
+        except (TypeError, ValueError):
+            raise BulkError(f'Invalid value for {field}.')
+    if 'drying_time' in parsed:
+        parsed['drying_minutes'] = parse_drying_minutes(parsed['drying_time'])
+    return parsed
+
+
+def apply_bulk(user, data):
+    """Run a scoped UPDATE or DELETE (one per uuid chunk) in one transaction; returns how many records it touched."""
+    action = data.get('action')
+    if action not in BULK_ACTIONS:
+        raise BulkError(f"action must be one of: {', '.join(BULK_ACTIONS)}.")
+
+    targets = _targets(data)
+    values = _values(data) if action == 'update' else None
+    touched = 0
+    for target in targets:
+        conditions = [record_scope(user), *target]
+        if action == 'update':
+            stmt = update(DryingRecord).where(*conditions).values(**values)
+        else:
+            stmt = delete(DryingRecord).where(*conditions)
+        touched += db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return touched
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, timezone
+
+from flask import request, Response
+from sqlalchemy import func, extract
+
+from .models import DryingRecord, Barangay
+from .extensions import db
+from .bootstrap import scope_key, reference_version
+from .snapshot import scoped_records, data_version
+from .metrics import record_cache
+
+CHART_SCHEMA_VERSION = 1
+CACHE_SIZE = 256          # chart bodies kept per worker, keyed by ETag
+
+# Dashboard bar charts and the role each one is drawn for
+YIELD_VIEWS = {
+    'barangay_bar': 'municipal',   # per barangay name, every barangay of the municipality
+    'total': 'municipal',          # per barangay id, barangays with records only
+    'farmer_bar': 'barangay',
+    'batch_bar': 'farmer',
+}
+PERIODS = ('month', 'year')
+# Charts whose labels come from reference data (barangay names), not from the records
+REFERENCE_CHARTS = ('yield/barangay_bar',)
+
+_bodies = OrderedDict()
+_lock = threading.Lock()
+
+
+def _scope(user):
+    return user.role, user.id, user.barangay_id, getattr(user, 'municipality_id', None)
+
+
+def _weights(rows):
+    return {label: {'initial_weight': float(initial or 0), 'final_weight': float(final or 0)}
+            for label, initial, final in rows}
+
+
+def yield_chart(user, view):
+    """Pre- and post-drying kg per bar of a dashboard chart: {label: {initial_weight, final_weight}}."""
+    initial, final = func.sum(DryingRecord.initial_weight), func.sum(DryingRecord.final_weight)
+    records = scoped_records(*_scope(user))
+
+    if view == 'barangay_bar':
+        rows = db.session.query(Barangay.name, initial, final) \
+            .outerjoin(DryingRecord, DryingRecord.barangay_id == Barangay.id) \
+            .filter(Barangay.municipality_id == user.municipality_id) \
+            .group_by(Barangay.id, Barangay.name).all()
+        return _weights(rows)
+    if view == 'total':
+        rows = records.filter(DryingRecord.barangay_id.isnot(None)) \
+            .with_entities(DryingRecord.barangay_id, initial, final) \
+            .group_by(DryingRecord.barangay_id).all()
+        return _weights(rows)
+    if view == 'farmer_bar':
+        rows = records.filter(DryingRecord.farmer_name.isnot(None), DryingRecord.farmer_name != '') \
+            .with_entities(DryingRecord.farmer_name, initial, final) \
+            .group_by(DryingRecord.farmer_name).all()
+        return _weights(rows)
+
+    data = {}
+    for batch, batch_initial, batch_final in records.with_entities(DryingRecord.batch_name, initial, final) \
+            .group_by(DryingRecord.batch_name).all():
+        totals = data.setdefault(batch or '(Unnamed Batch)', {'initial_weight': 0.0, 'final_weight': 0.0})
+        totals['initial_weight'] += float(batch_initial or 0)
+        totals['final_weight'] += float(batch_final or 0)
+    return data
+
+
+def output_trend(user, period):
+    """Post-drying kg by month or year of drying, oldest first: {labels, values}."""
+    year = extract('year', DryingRecord.date_dried)
+    columns = [year, extract('month', DryingRecord.date_dried)] if period == 'month' else [year]
+    rows = scoped_records(*_scope(user)) \
+        .filter(DryingRecord.date_dried.isnot(None)) \
+        .with_entities(*columns, func.sum(DryingRecord.final_weight)) \
+        .group_by(*columns).order_by(*columns).all()
+
+    if period == 'month':
+        labels = [date(int(y), int(m), 1).strftime('%b %Y') for y, m, _ in rows]
+    else:
+        labels = [str(int(row[0])) for row in rows]
+    return {'labels': labels, 'values': [float(row[-1] or 0) for row in rows]}
+
+
+def chart_response(user, name, build, **params):
+    """JSON for one chart, answered with 304 while the user's scope has no new or changed records.
+
+    The ETag is derived from the scope's data version (record count and latest
+    created/updated time), plus the reference data version for REFERENCE_CHARTS,
+    so checking it costs one or two aggregate queries and the chart itself is only
+    computed when it can have changed. It is weak: compress_response may re-encode
+    the body.
+    """
+    count, watermark = data_version(user)
+    scope = scope_key(user)
+    reference = reference_version() if name in REFERENCE_CHARTS else None
+    etag = hashlib.sha1(
+        f"{CHART_SCHEMA_VERSION}|{name}|{sorted(params.items())}|{scope}|{count}|{watermark}|{reference}".encode()
+    ).hexdigest()[:32]
+    last_modified = watermark.replace(microsecond=0, tzinfo=timezone.utc) if watermark else None
+
+    # If-None-Match wins; If-Modified-Since alone can't see deletions (or renamed
+    # barangays), so it is only trusted from clients that sent no ETag
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = bool(since and last_modified and last_modified <= since and reference is None)
+
+    if not_modified:
+        response = Response(status=304)
+    else:
+        with _lock:
+            body = _bodies.get(etag)
+            if body is not None:
+                _bodies.move_to_end(etag)
+        record_cache('charts', body is not None)
+        if body is None:
+            body = json.dumps(build(user, **params), sort_keys=True, separators=(',', ':')).encode('utf-8')
+            with _lock:
+                _bodies[etag] = body
+                while len(_bodies) > CACHE_SIZE:
+                    _bodies.popitem(last=False)
+        response = Response(body, mimetype='application/json')
+
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # Per-user data: browsers may keep it but must revalidate, shared caches must not
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,165 @@
+import gzip
+import json
+import zlib
+from flask import request, current_app, Response, jsonify
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+try:
+    import brotli
+except ImportError:  # optional: fall back to gzip only
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # optional: columnar JSON is always available
+    msgpack = None
+
+COMPRESS_MIN_SIZE = 1024  # bytes; smaller bodies are not worth the CPU
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-msgpack', 'application/vnd.paddy.columnar+json')
+
+MAX_INFLATED_SIZE = 64 * 1024 * 1024  # bytes a compressed request body may expand to
+
+COLUMNAR_MIMETYPE = 'application/vnd.paddy.columnar+json'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+# Columns that repeat the same few strings on every row; sent once in a dictionary
+DICTIONARY_COLUMNS = ('farmer_uuid', 'farmer_name', 'barangay_name', 'municipality_name')
+
+
+def choose_encoding(accept_encoding):
+    """Best content coding the client accepts: br if available, else gzip, else None."""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+def _inflate_brotli(raw, limit):
+    """Decode a br body, stopping as soon as the output passes `limit` bytes."""
+    decompressor = brotli.Decompressor()
+    chunks, size = [], 0
+    data = raw
+    while True:
+        # Only the first call takes input; the rest drain what is buffered
+        chunk = decompressor.process(data, output_buffer_limit=limit + 1 - size)
+        data = b''
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            raise RequestEntityTooLarge()
+        if decompressor.can_accept_more_data():
+            break
+    if not decompressor.is_finished():
+        raise BadRequest("Truncated br request body.")
+    return b''.join(chunks)
+
+
+def request_json():
+    """Request JSON body, accepting gzip/br Content-Encoding from batching clients.
+
+    Compressed bodies may inflate to MAX_CONTENT_LENGTH (MAX_INFLATED_SIZE if
+    unset) and are cut off there, so a small body cannot expand without bound.
+    Raises BadRequest or RequestEntityTooLarge for bodies it cannot use.
+    """
+    encoding = request.content_encoding
+    if not encoding or encoding == 'identity':
+        return request.get_json()
+
+    limit = current_app.config.get('MAX_CONTENT_LENGTH') or MAX_INFLATED_SIZE
+    raw = request.get_data()
+    try:
+        if encoding == 'gzip':
+            inflater = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+            body = inflater.decompress(raw, limit + 1)
+        elif encoding == 'br' and brotli is not None:
+            body = _inflate_brotli(raw, limit)
+        else:
+            raise BadRequest(f"Unsupported Content-Encoding: {encoding}")
+    except (zlib.error, getattr(brotli, 'error', zlib.error)) as e:
+        raise BadRequest(f"Could not decode {encoding} request body: {e}")
+    if len(body) > limit:
+        raise RequestEntityTooLarge()
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise BadRequest("Request body is not valid JSON.")
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def compress_response(response):
+    """after_request hook: compress sizeable API bodies with the best accepted encoding."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    min_size = current_app.config.get('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE)
+    if response.content_length is not None and response.content_length < min_size:
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def to_columnar(rows):
+    """Column-oriented layout of a list of dicts, with repeated strings dictionary-encoded.
+
+    {"count": n, "columns": {name: [values...]}, "dictionaries": {name: [distinct values]}}
+    where a dictionary column holds indexes into its dictionary instead of the strings.
+    """
+    names = list(rows[0].keys()) if rows else []
+    columns = {name: [row[name] for row in rows] for name in names}
+    dictionaries = {}
+    for name in DICTIONARY_COLUMNS:
+        if name not in columns:
+            continue
+        index = {}
+        columns[name] = [index.setdefault(value, len(index)) for value in columns[name]]
+        dictionaries[name] = list(index)
+    return {"count": len(rows), "columns": columns, "dictionaries": dictionaries}
+
+
+def from_columnar(payload):
+    """Inverse of to_columnar(); handy for clients and for checking round trips."""
+    columns = dict(payload['columns'])
+    for name, values in payload['dictionaries'].items():
+        columns[name] = [values[i] for i in columns[name]]
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(columns[n] for n in names))]
+
+
+def records_response(rows):
+    """Encode a list of record dicts in the layout the client asked for.
+
+    Clients opt in with `Accept: application/x-msgpack` (MessagePack of the columnar
+    layout), `Accept: application/vnd.paddy.columnar+json` or `?format=columnar`;
+    everyone else gets the original list of objects.
+    """
+    fmt = request.args.get('format')
+    accept = request.accept_mimetypes
+
+    if msgpack is not None and (fmt == 'msgpack' or accept.best == MSGPACK_MIMETYPE):
+        body = msgpack.packb(to_columnar(rows), use_bin_type=True)
+        return Response(body, mimetype=MSGPACK_MIMETYPE)
+    if fmt == 'columnar' or accept.best == COLUMNAR_MIMETYPE:
+        body = json.dumps(to_columnar(rows), separators=(',', ':'))
+        return Response(body, mimetype=COLUMNAR_MIMETYPE)
+    return jsonify(rows)
@@ -0,0 +1,355 @@
+import fcntl
+import gzip
+import json
+import os
+import random
+import secrets
+import socket
+import threading
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, select
+from werkzeug.security import generate_password_hash
+
+from .extensions import db
+from .models import DryingRecord, Farmer, User, Barangay, Municipality
+
+# Applied to SQLite connections on edge nodes (SQLITE_TUNING): WAL lets LAN
+# devices sync while pages are read, NORMAL fsyncs only at checkpoints (a power
+# cut can lose the last commits, not corrupt the file), and the busy timeout
+# queues writers instead of failing them with "database is locked".
+SQLITE_PRAGMAS = (
+    'journal_mode = WAL',
+    'synchronous = NORMAL',
+    'busy_timeout = 5000',
+    'cache_size = -32000',
+    'temp_store = MEMORY',
+    'mmap_size = 134217728',
+)
+
+PUSH_BATCH = 500            # records per upstream /api/sync request
+REQUEST_TIMEOUT = 60        # seconds
+MAX_BACKOFF = 30 * 60       # seconds between attempts while upstream is unreachable
+THROTTLE_RETRIES = 50       # 429s in a row on one batch before giving up until the next cycle
+STATE_FILE = 'edge_state.json'
+LOCK_FILE = 'edge_replicator.lock'
+
+SYNC_FIELDS = (
+    'uuid', 'batch_name', 'initial_weight', 'temperature', 'humidity', 'sensor_value',
+    'initial_moisture', 'final_moisture', 'drying_time', 'final_weight', 'farmer_name',
+    'user_id', 'barangay_id', 'municipality_id',
+)
+DATE_FIELDS = ('date_planted', 'date_harvested', 'due_date', 'date_dried')
+FARMER_FIELDS = ('uuid', 'username', 'first_name', 'middle_name', 'last_name')
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
+class Replicator:
+    """Pushes locally synced records to the central server and pulls reference data down.
+
+    Progress is kept in a small state file (last pushed record id, bootstrap ETag,
+    local to central user ids, records upstream could not take yet) that is only
+    advanced after upstream answers a batch, so an interrupted run resumes where
+    it stopped. Re-sent records are dropped upstream by uuid.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Only edge nodes replicate, so only they pay for importing requests
+        import requests
+
+        self.upstream = app.config['EDGE_UPSTREAM_URL'].rstrip('/')
+        self.state_path = os.path.join(app.instance_path, STATE_FILE)
+        self.http = requests.Session()
+        # Its own rate-limit bucket upstream, not the one of the staff account it logs in as
+        self.http.headers['X-Device-ID'] = f'edge:{socket.gethostname()}'
+        self.logged_in = False
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'pushed_id': 0, 'bootstrap_etag': None}
+
+    def save_state(self, state):
+        tmp = f'{self.state_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def login(self):
+        response = self.http.post(f'{self.upstream}/login', timeout=REQUEST_TIMEOUT,
+                                  headers={'Accept': 'application/json'},
+                                  data={'email': self.app.config['EDGE_EMAIL'],
+                                        'password': self.app.config['EDGE_PASSWORD']})
+        if response.status_code != 200:
+            raise RuntimeError(f'upstream login failed ({response.status_code})')
+        self.logged_in = True
+
+    def pull(self, state):
+        """Apply the barangay's reference data from /api/bootstrap if it changed."""
+        if not self.logged_in:
+            self.login()
+        # Without the user id map from a full bundle, ask for one
+        headers = {'If-None-Match': state['bootstrap_etag']} \
+            if state.get('bootstrap_etag') and 'user_ids' in state else {}
+        response = self.http.get(f'{self.upstream}/api/bootstrap', headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 401:
+            self.login()
+            response = self.http.get(f'{self.upstream}/api/bootstrap', timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+
+        state['user_ids'] = apply_bundle(response.json(), self.app.config['EDGE_EMAIL'],
+                                         self.app.config['EDGE_PASSWORD'])
+        state['bootstrap_etag'] = response.headers.get('ETag')
+        self.save_state(state)
+        return True
+
+    def _rows(self, condition):
+        return db.session.execute(
+            select(DryingRecord, Farmer.uuid)
+            .outerjoin(Farmer, DryingRecord.farmer_id == Farmer.id)
+            .where(condition)
+            .order_by(DryingRecord.id).limit(PUSH_BATCH)
+        ).all()
+
+    def push(self, state):
+        """Send records newer than the watermark in gzip batches; returns totals from upstream.
+
+        Records upstream skips for an unknown farmer are retried after registering
+        the farmer there (farmers added on this node). Those it still refuses stay
+        in the state file's `skipped` list and go again every cycle.
+        """
+        totals = {'sent': 0, 'inserted': 0, 'duplicates': 0, 'unknown_farmers': 0, 'quarantined': 0}
+        skipped = set(state.get('skipped', []))
+
+        retry = sorted(skipped)
+        for start in range(0, len(retry), PUSH_BATCH):
+            chunk = retry[start:start + PUSH_BATCH]
+            rows = self._rows(DryingRecord.uuid.in_(chunk))
+            skipped.difference_update(chunk)
+            if rows:
+                skipped |= self.send(rows, state, totals)
+            state['skipped'] = sorted(skipped)
+            self.save_state(state)
+            db.session.expunge_all()
+
+        while True:
+            rows = self._rows(DryingRecord.id > state['pushed_id'])
+            if not rows:
+                break
+            skipped |= self.send(rows, state, totals)
+            state['pushed_id'] = rows[-1][0].id
+            state['skipped'] = sorted(skipped)
+            self.save_state(state)
+            db.session.expunge_all()
+
+        totals['skipped'] = len(skipped)
+        if skipped:
+            print(f"Edge push: {len(skipped)} records not accepted upstream (farmer could not be "
+                  f"registered there); kept in {self.state_path} and retried every cycle")
+        return totals
+
+    def send(self, rows, state, totals):
+        """Push one batch of (record, farmer uuid) rows; returns uuids of records upstream still skipped."""
+        user_ids = state.get('user_ids', {})
+        payloads = [_sync_payload(record, farmer_uuid, user_ids) for record, farmer_uuid in rows]
+        result = self.post_records(payloads)
+        unknown = {u for u in result.get('unknown_farmer_uuids', []) if u}
+        if unknown:
+            # Farmers registered on this node: register them upstream, then send their records again
+            self.push_farmers(unknown)
+            first, result = result, self.post_records([p for p in payloads if p['farmer_uuid'] in unknown])
+            for key in ('inserted', 'duplicates', 'quarantined'):
+                result[key] = result.get(key, 0) + first.get(key, 0)
+            unknown = set(result.get('unknown_farmer_uuids', []))
+
+        totals['sent'] += len(rows)
+        for key in ('inserted', 'duplicates', 'unknown_farmers', 'quarantined'):
+            totals[key] += result.get(key, 0)
+        return {p['uuid'] for p in payloads if p['farmer_uuid'] is None or p['farmer_uuid'] in unknown}
+
+    def post_records(self, payloads):
+        body = gzip.compress(json.dumps({'records': payloads}).encode('utf-8'))
+        return self.post('/api/sync', data=body,
+                         headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+
+    def push_farmers(self, uuids):
+        """Register farmers created on this node with upstream (/api/farmers), keeping their uuids."""
+        farmers = Farmer.query.filter(Farmer.uuid.in_(sorted(uuids))).all()
+        if not farmers:
+            return
+        result = self.post('/api/farmers', json={'farmers': [
+            {field: getattr(farmer, field) for field in FARMER_FIELDS} for farmer in farmers
+        ]})
+        if result.get('conflicts'):
+            print(f"Edge push: farmers not registered upstream (username taken there): "
+                  f"{', '.join(result['conflicts'])}")
+
+    def post(self, path, **kwargs):
+        """POST to upstream, waiting out 429s as long as upstream's Retry-After says; returns the JSON body."""
+        for _ in range(THROTTLE_RETRIES):
+            response = self.http.post(f'{self.upstream}{path}', timeout=REQUEST_TIMEOUT, **kwargs)
+            if response.status_code != 429:
+                break
+            try:
+                wait = min(float(response.headers.get('Retry-After', 5)), MAX_BACKOFF)
+            except ValueError:  # HTTP-date form
+                wait = 5
+            time.sleep(wait)
+        response.raise_for_status()
+        return response.json()
+
+    def run_once(self):
+        state = self.load_state()
+        pulled = self.pull(state)
+        pushed = self.push(state)
+        return pulled, pushed
+
+    def run_forever(self, interval):
+        import requests
+
+        lock = open(os.path.join(self.app.instance_path, LOCK_FILE), 'w')
+        try:
+            # One replicator per edge node, however many workers serve the LAN
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return
+
+        delay = interval
+        with self.app.app_context():
+            while True:
+                try:
+                    self.run_once()
+                    delay = interval
+                except (requests.RequestException, RuntimeError) as e:
+                    self.logged_in = False
+                    delay = min(delay * 2, MAX_BACKOFF)
+                    print(f"Edge replication failed, retrying in {delay}s: {e}")
+                except Exception as e:
+                    db.session.rollback()
+                    delay = min(delay * 2, MAX_BACKOFF)
+                    print(f"Edge replication error: {e}")
+                finally:
+                    db.session.remove()
+                time.sleep(delay * random.uniform(0.8, 1.2))
+
+
+def _sync_payload(record, farmer_uuid, user_ids):
+    payload = {field: getattr(record, field) for field in SYNC_FIELDS}
+    for field in DATE_FIELDS:
+        value = getattr(record, field)
+        payload[field] = value.isoformat() if value else None
+    payload['farmer_uuid'] = farmer_uuid
+    # Local accounts map to their central ids; ones only this node knows record as the edge account
+    payload['user_id'] = user_ids.get(str(record.user_id), user_ids.get('edge'))
+    if record.updated_at:
+        payload['updated_at'] = record.updated_at.isoformat()
+    return payload
+
+
+def apply_bundle(bundle, edge_email, edge_password):
+    """Upsert a bootstrap bundle into the local database; returns {local user id: central user id}.
+
+    Municipalities and barangays keep their central ids. Users are matched by
+    email, since local sign-ups share the table and its ids; the map (plus
+    'edge', the edge account's central id) translates record authors on push.
+    Accounts pulled from upstream get an unusable local password, except the edge
+    account itself, which can log in locally with the credentials it replicates with.
+    """
+    locked_password = generate_password_hash(secrets.token_hex(16))
+
+    municipality = bundle.get('municipality')
+    if municipality:
+        row = db.session.get(Municipality, municipality['id']) or Municipality(id=municipality['id'])
+        row.name = municipality['name']
+        db.session.add(row)
+
+    for b in bundle.get('barangays', []):
+        row = db.session.get(Barangay, b['id']) or Barangay(id=b['id'])
+        row.name, row.municipality_id = b['name'], b['municipality_id']
+        db.session.add(row)
+
+    users = bundle.get('users', [])
+    local = {row.email: row for row in User.query.filter(User.email.in_([u['email'] for u in users]))}
+    for u in users:
+        row = local.get(u['email'])
+        if row is None:
+            row = local[u['email']] = User(password=locked_password)
+        for field in ('email', 'full_name', 'role', 'barangay_id', 'municipality_id'):
+            setattr(row, field, u[field])
+        if u['email'] == edge_email:
+            row.password = generate_password_hash(edge_password)
+        db.session.add(row)
+    db.session.flush()
+
+    user_ids = {str(local[u['email']].id): u['id'] for u in users}
+    user_ids['edge'] = next((u['id'] for u in users if u['email'] == edge_email), None)
+    staff_by_barangay = {}
+    for u in users:
+        if u['role'] == 'barangay':
+            staff_by_barangay.setdefault(u['barangay_id'], local[u['email']].id)
+
+    for f in bundle.get('farmers', []):
+        row = Farmer.query.filter_by(uuid=f['uuid']).first()
+        if row is None:
+            row = Farmer(uuid=f['uuid'], password=locked_password,
+                         user_id=staff_by_barangay.get(f['barangay_id']))
+        for field in ('username', 'first_name', 'middle_name', 'last_name', 'barangay_id'):
+            setattr(row, field, f[field])
+        db.session.add(row)
+    db.session.commit()
+    return user_ids
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def init_edge(app):
+    """Tune SQLite connections if SQLITE_TUNING is set and, on an edge node, start the replicator."""
+    with app.app_context():
+        if app.config.get('SQLITE_TUNING') and db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _set_pragmas)
+
+    if not (app.config.get('EDGE_MODE') and app.config.get('EDGE_UPSTREAM_URL')):
+        return
+
+    @app.before_request
+    def start_replicator():
+        global _started
+        if _started:
+            return
+        with _start_lock:
+            if not _started:
+                _started = True
+                threading.Thread(target=Replicator(app).run_forever,
+                                 args=(app.config['EDGE_SYNC_INTERVAL'],), daemon=True).start()
+
+
+@click.command('edge-sync')
+@with_appcontext
+def edge_sync_command():
+    """Run one replication cycle against EDGE_UPSTREAM_URL (pull reference data, push records)."""
+    from flask import current_app
+
+    if not current_app.config.get('EDGE_UPSTREAM_URL'):
+        raise click.ClickException('EDGE_UPSTREAM_URL is not set.')
+    pulled, pushed = Replicator(current_app._get_current_object()).run_once()
+    click.echo(f"reference data {'updated' if pulled else 'unchanged'}; "
+               f"pushed {pushed['sent']} records ({pushed['inserted']} new upstream, "
+               f"{pushed['duplicates']} already there, {pushed['unknown_farmers']} unknown farmer, "
+               f"{pushed['quarantined']} held for review); "
+               f"{pushed['skipped']} waiting for their farmer upstream")
@@ -0,0 +1,261 @@
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, inspect, insert, select, delete, bindparam, func
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import DryingRecord, Barangay, DashboardEvent
+
+POLL_INTERVAL = 1.0       # seconds between each worker's read of new events
+KEEPALIVE = 15            # seconds of silence before a comment line keeps proxies from closing the stream
+MAX_STREAM_AGE = 300      # streams end after this long; EventSource reconnects with Last-Event-ID
+EVENT_RETENTION = timedelta(hours=1)
+REPLAY_LIMIT = 200        # events replayed to a reconnecting client
+# Event ids are taken when a transaction inserts, not when it commits, so on Postgres a
+# lower id can become visible after a higher one. Polls and replays look this many ids
+# back and skip what was already sent; the dashboard drops ids it has applied.
+TRAILING_IDS = 100
+
+# Record fields the dashboard charts are keyed or summed on
+CHART_FIELDS = ('barangay_id', 'farmer_id', 'farmer_name', 'batch_name', 'initial_weight', 'final_weight')
+
+
+# ---------------------------------------------------------------------------
+# Publishing: turn flushed record changes into per-barangay deltas, written
+# once the transaction commits so a rolled back sync never shows up.
+# ---------------------------------------------------------------------------
+
+def _weight(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _old_value(record, field):
+    history = inspect(record).attrs[field].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(record, field)
+
+
+def _add(deltas, values, sign):
+    key = (values['barangay_id'], values['farmer_id'], values['farmer_name'], values['batch_name'])
+    totals = deltas[key]
+    totals[0] += sign * _weight(values['initial_weight'])
+    totals[1] += sign * _weight(values['final_weight'])
+
+
+def _collect(session, flush_context):
+    deltas = session.info.setdefault('dashboard_deltas', defaultdict(lambda: [0.0, 0.0]))
+    for record in session.new:
+        if isinstance(record, DryingRecord):
+            _add(deltas, {f: getattr(record, f) for f in CHART_FIELDS}, 1)
+    for record in session.deleted:
+        if isinstance(record, DryingRecord):
+            _add(deltas, {f: _old_value(record, f) for f in CHART_FIELDS}, -1)
+    for record in session.dirty:
+        if isinstance(record, DryingRecord) and any(
+                inspect(record).attrs[f].history.has_changes() for f in CHART_FIELDS):
+            _add(deltas, {f: _old_value(record, f) for f in CHART_FIELDS}, -1)
+            _add(deltas, {f: getattr(record, f) for f in CHART_FIELDS}, 1)
+
+
+def _discard(session, previous_transaction=None):
+    session.info.pop('dashboard_deltas', None)
+
+
+def _write_events(rows):
+    municipality_of = select(Barangay.municipality_id).where(Barangay.id == bindparam('b_id')).scalar_subquery()
+    with db.engine.begin() as conn:
+        conn.execute(insert(DashboardEvent).values(
+            barangay_id=bindparam('b_id'),
+            municipality_id=municipality_of,
+            payload=bindparam('payload'),
+            created_at=datetime.utcnow(),
+        ), rows)
+
+
+def _publish(session):
+    deltas = session.info.pop('dashboard_deltas', None)
+    if not deltas:
+        return
+    by_barangay = defaultdict(list)
+    for (barangay_id, farmer_id, farmer_name, batch_name), (initial, final) in deltas.items():
+        if initial or final:
+            by_barangay[barangay_id].append({
+                "b": barangay_id, "f": farmer_id, "fn": farmer_name, "bn": batch_name,
+                "i": round(initial, 3), "w": round(final, 3),
+            })
+    if not by_barangay:
+        return
+    try:
+        _write_events([{'b_id': b, 'payload': json.dumps({"deltas": d})} for b, d in by_barangay.items()])
+    except Exception as e:
+        # The change itself is committed; dashboards catch up on their next reload
+        print(f"Could not publish dashboard event: {e}")
+
+
+def publish_reset(barangay_id):
+    """Tell a barangay's dashboards to reload, for changes made without the ORM (bulk edits)."""
+    try:
+        _write_events([{'b_id': barangay_id, 'payload': json.dumps({"reset": True})}])
+    except Exception as e:
+        print(f"Could not publish dashboard event: {e}")
+
+
+event.listen(Session, 'after_flush', _collect)
+event.listen(Session, 'after_commit', _publish)
+event.listen(Session, 'after_soft_rollback', _discard)
+
+
+# ---------------------------------------------------------------------------
+# Subscribing: one poller thread per worker reads new events and hands them to
+# the queues of that worker's open streams.
+# ---------------------------------------------------------------------------
+
+class Subscriber:
+    def __init__(self, user):
+        self.role = user.role
+        self.barangay_id = user.barangay_id
+        self.municipality_id = getattr(user, 'municipality_id', None)
+        self.farmer_id = user.id if user.role == 'farmer' else None
+        self.queue = queue.Queue(maxsize=100)
+
+    def wants(self, barangay_id, municipality_id):
+        if self.role == 'municipal':
+            return municipality_id is not None and municipality_id == self.municipality_id
+        return barangay_id == self.barangay_id
+
+    def message(self, event_id, payload):
+        """SSE frame for this subscriber, or None if nothing in it is visible to them."""
+        data = json.loads(payload)
+        if self.farmer_id is not None and 'deltas' in data:
+            data['deltas'] = [d for d in data['deltas'] if d['f'] == self.farmer_id]
+            if not data['deltas']:
+                return None
+        kind = 'reset' if data.get('reset') else 'delta'
+        return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+
+    def offer(self, event_id, barangay_id, municipality_id, payload):
+        if not self.wants(barangay_id, municipality_id):
+            return
+        frame = self.message(event_id, payload)
+        if frame is None:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            # A stalled client gets one reload instead of an unbounded backlog
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            self.queue.put_nowait(f"id: {event_id}\nevent: reset\ndata: {{}}\n\n")
+
+
+class Broker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+        self.last_id = 0
+        self.delivered = set()    # ids within TRAILING_IDS of last_id already handed out
+
+    def subscribe(self, app, subscriber, limit):
+        """Register a stream unless this worker already holds `limit` of them."""
+        with self.lock:
+            if len(self.subscribers) >= limit:
+                return False
+            self.subscribers.add(subscriber)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._poll, args=(app,), daemon=True)
+                self.thread.start()
+        return True
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def _poll(self, app):
+        with app.app_context():
+            # Streams replay what they missed themselves (Last-Event-ID), so start from now
+            self.last_id = db.session.query(func.max(DashboardEvent.id)).scalar() or 0
+            self.delivered = set(db.session.scalars(
+                select(DashboardEvent.id).where(DashboardEvent.id > self.last_id - TRAILING_IDS)))
+            last_prune = 0
+            while True:
+                with self.lock:
+                    if not self.subscribers:
+                        self.thread = None
+                        break
+                    subscribers = list(self.subscribers)
+                floor = self.last_id - TRAILING_IDS
+                self.delivered = {i for i in self.delivered if i > floor}
+                query = select(DashboardEvent.id, DashboardEvent.barangay_id,
+                               DashboardEvent.municipality_id, DashboardEvent.payload) \
+                    .where(DashboardEvent.id > floor)
+                if self.delivered:
+                    query = query.where(DashboardEvent.id.notin_(self.delivered))
+                try:
+                    rows = db.session.execute(query.order_by(DashboardEvent.id).limit(500)).all()
+                    if time.time() - last_prune > EVENT_RETENTION.total_seconds() / 12:
+                        db.session.execute(delete(DashboardEvent).where(
+                            DashboardEvent.created_at < datetime.utcnow() - EVENT_RETENTION))
+                        last_prune = time.time()
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Dashboard event poll failed: {e}")
+                    rows = []
+                for row in rows:
+                    self.last_id = max(self.last_id, row.id)
+                    self.delivered.add(row.id)
+                    for subscriber in subscribers:
+                        subscriber.offer(row.id, row.barangay_id, row.municipality_id, row.payload)
+                time.sleep(POLL_INTERVAL)
+
+
+broker = Broker()
+
+
+def latest_event_id():
+    """Id of the newest dashboard event; data read before this includes the changes of every event up to it."""
+    return db.session.query(func.max(DashboardEvent.id)).scalar() or 0
+
+
+def replay(subscriber, last_event_id):
+    """Events a reconnecting client may have missed, oldest first (from TRAILING_IDS before its last id)."""
+    rows = db.session.execute(
+        select(DashboardEvent.id, DashboardEvent.barangay_id, DashboardEvent.municipality_id, DashboardEvent.payload)
+        .where(DashboardEvent.id > last_event_id - TRAILING_IDS).order_by(DashboardEvent.id).limit(REPLAY_LIMIT)
+    ).all()
+    frames = []
+    for row in rows:
+        if subscriber.wants(row.barangay_id, row.municipality_id):
+            frame = subscriber.message(row.id, row.payload)
+            if frame:
+                frames.append(frame)
+    return frames
+
+
+def stream(subscriber, last_event_id=None):
+    """Generator of SSE frames for one connection; always releases its broker slot."""
+    started = time.time()
+    try:
+        yield "retry: 5000\n\n"
+        if last_event_id is not None:
+            for frame in replay(subscriber, last_event_id):
+                yield frame
+        # Hand the DB connection back before idling; the broker does the reading from here
+        db.session.remove()
+        while time.time() - started < MAX_STREAM_AGE:
+            try:
+                yield subscriber.queue.get(timeout=KEEPALIVE)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,94 @@
+import os
+import time
+from flask import g, request, Response, abort
+from prometheus_client import (Counter, Gauge, Histogram, CollectorRegistry, REGISTRY,
+                               generate_latest, CONTENT_TYPE_LATEST, multiprocess)
+
+# Gunicorn workers each write to PROMETHEUS_MULTIPROC_DIR; /metrics merges them on scrape
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+REQUEST_LATENCY = Histogram(
+    'paddy_http_request_duration_seconds', 'Request latency by endpoint',
+    ['endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+REQUEST_SIZE = Histogram(
+    'paddy_http_request_size_bytes', 'Request body size by endpoint', ['endpoint'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216))
+RESPONSE_SIZE = Histogram(
+    'paddy_http_response_size_bytes', 'Response body size by endpoint', ['endpoint'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216))
+
+SYNC_RECORDS = Counter(
+    'paddy_sync_records_total', 'Records received by /api/sync by outcome', ['outcome'])
+
+ADMISSION_REJECTIONS = Counter(
+    'paddy_admission_rejections_total', 'API requests answered 429 by admission control', ['reason'])
+
+CACHE_REQUESTS = Counter(
+    'paddy_cache_requests_total', 'In-process cache lookups', ['cache', 'result'])
+
+DB_POOL_SIZE = Gauge('paddy_db_pool_size', 'Configured connection pool size',
+                     multiprocess_mode='livesum')
+DB_POOL_CHECKED_OUT = Gauge('paddy_db_pool_checked_out', 'Connections currently in use',
+                            multiprocess_mode='livesum')
+DB_POOL_OVERFLOW = Gauge('paddy_db_pool_overflow', 'Connections open beyond the pool size',
+                         multiprocess_mode='livesum')
+
+
+def record_sync(outcome, count=1):
+    """outcome: inserted, duplicate, unknown_farmer, quarantined, invalid or failed."""
+    if count:
+        SYNC_RECORDS.labels(outcome).inc(count)
+
+
+def record_rejection(reason):
+    """reason: rate (token bucket empty) or ingest (concurrency limit reached)."""
+    ADMISSION_REJECTIONS.labels(reason).inc()
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def _update_pool_gauges(engine):
+    pool = engine.pool
+    if hasattr(pool, 'checkedout'):
+        DB_POOL_SIZE.set(pool.size())
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def init_metrics(app):
+    from .extensions import db
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.labels(endpoint, request.method, response.status_code) \
+            .observe(time.perf_counter() - started)
+        if request.content_length:
+            REQUEST_SIZE.labels(endpoint).observe(request.content_length)
+        if response.content_length is not None:
+            RESPONSE_SIZE.labels(endpoint).observe(response.content_length)
+        _update_pool_gauges(db.engine)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f"Bearer {token}":
+            abort(403)
+
+        if MULTIPROCESS:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
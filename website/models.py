@@ -81,6 +81,7 @@ class DryingRecord(db.Model):
     initial_moisture = db.Column(db.Float, nullable=False)
     final_moisture = db.Column(db.Float, nullable=False)
     drying_time = db.Column(db.String(50), nullable=False)
+    drying_minutes = db.Column(db.Float, nullable=True)  # drying_time normalized to minutes
     final_weight = db.Column(db.Float, nullable=False)
 
     date_dried = db.Column(db.Date)
@@ -100,6 +101,14 @@ class DryingRecord(db.Model):
     barangay = db.relationship('Barangay', backref=db.backref('drying_records', lazy=True))
     municipality = db.relationship('Municipality', backref=db.backref('drying_records', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_drying_records_barangay_due_date', 'barangay_id', 'due_date'),
+        # Only batches not yet dried, so overdue lookups never touch finished history
+        db.Index('ix_drying_records_pending_due_date', 'barangay_id', 'due_date',
+                 postgresql_where=db.text('date_dried IS NULL'),
+                 sqlite_where=db.text('date_dried IS NULL')),
+    )
+
 # =====================
 # Municipality Model
 # =====================
@@ -119,3 +128,39 @@ class Barangay(db.Model):
     municipality_id = db.Column(db.Integer, db.ForeignKey('municipalities.id'), nullable=False)
 
     __table_args__ = (db.UniqueConstraint('name', 'municipality_id', name='uq_barangay_name_per_municipality'),)
+
+# =====================
+# Dashboard Event Model
+# =====================
+class DashboardEvent(db.Model):
+    """Aggregate deltas from a committed change, read by every worker's live feed."""
+    __tablename__ = 'dashboard_events'
+    id = db.Column(db.Integer, primary_key=True)
+    barangay_id = db.Column(db.Integer, nullable=True)
+    municipality_id = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=func.now(), index=True)
+
+# ==========================
+# Reference Data Changes
+# ==========================
+class ReferenceChange(db.Model):
+    """One row per flush that touched users, farmers, barangays or municipalities; the newest id versions /api/bootstrap."""
+    __tablename__ = 'reference_changes'
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=func.now())
+
+# ==========================
+# Quarantined Records
+# ==========================
+class QuarantinedRecord(db.Model):
+    """A synced record held back from drying_records because it failed data-quality screening."""
+    __tablename__ = 'quarantined_records'
+    id = db.Column(db.Integer, primary_key=True)
+    uuid = db.Column(db.String(36), unique=True, nullable=False)
+    payload = db.Column(db.Text, nullable=False)   # the record as the device sent it, JSON
+    reasons = db.Column(db.Text, nullable=False)   # JSON list of failed checks
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id'), nullable=True)
+    barangay_id = db.Column(db.Integer, nullable=True, index=True)
+    municipality_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=func.now())
@@ -0,0 +1,201 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import func
+from .models import DryingRecord
+from .extensions import db
+from .metrics import record_cache
+
+# Inputs a planned batch must provide, in feature order
+BATCH_FIELDS = ('temperature', 'humidity', 'initial_moisture', 'target_moisture')
+# Record fields observe() needs, captured before the commit that expires them
+OBSERVE_FIELDS = ('barangay_id', 'temperature', 'humidity', 'initial_moisture', 'final_moisture',
+                  'drying_minutes')
+MIN_SAMPLES = 10  # fewer than this and a barangay falls back to the all-barangay model
+RIDGE = 1e-6      # tiny diagonal term so near-singular histories still solve
+
+
+def build_features(temperature, humidity, initial_moisture, target_moisture):
+    """Design matrix [1, temperature, humidity, initial moisture, moisture to remove]."""
+    return np.column_stack((
+        np.ones_like(temperature),
+        temperature,
+        humidity,
+        initial_moisture,
+        initial_moisture - target_moisture,
+    ))
+
+
+class DryingTimeModel:
+    """Least-squares drying-time regression that can absorb new records without a full refit.
+
+    Only the normal-equation sums (X'X, X'y) are kept, so adding a synced batch
+    is two small matrix additions and one 5x5 solve.
+    """
+
+    def __init__(self, n_features=5):
+        self.xtx = np.zeros((n_features, n_features))
+        self.xty = np.zeros(n_features)
+        self.n = 0
+        self.coef = None
+
+    def update(self, X, y):
+        valid = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+        X, y = X[valid], y[valid]
+        if not len(y):
+            return
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.n += len(y)
+        if self.n >= MIN_SAMPLES:
+            ridge = RIDGE * np.eye(len(self.xty))
+            self.coef = np.linalg.lstsq(self.xtx + ridge, self.xty, rcond=None)[0]
+
+    @property
+    def ready(self):
+        return self.coef is not None
+
+    def predict(self, X):
+        return np.maximum(X @ self.coef, 0.0)
+
+
+MAX_MODELS = 256  # cached models per worker, least recently used dropped first
+
+_models = OrderedDict()   # barangay_id (None = every barangay) -> (data version, model)
+_lock = threading.Lock()
+
+
+def _history(barangay_id=None):
+    query = db.session.query(
+        DryingRecord.temperature,
+        DryingRecord.humidity,
+        DryingRecord.initial_moisture,
+        DryingRecord.final_moisture,
+        DryingRecord.drying_minutes,
+    ).filter(DryingRecord.drying_minutes > 0)
+    if barangay_id is not None:
+        query = query.filter(DryingRecord.barangay_id == barangay_id)
+
+    rows = np.array(query.all(), dtype=float).reshape(-1, 5)
+    X = build_features(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3])
+    return X, rows[:, 4]
+
+
+def _version(barangay_id=None):
+    """(record count, latest created/updated time) of a model's records, as charts and snapshots use.
+
+    Any insert, edit, delete or bulk update in the scope changes it, on whichever
+    worker it happened.
+    """
+    query = db.session.query(
+        func.count(DryingRecord.id),
+        func.max(func.coalesce(DryingRecord.updated_at, DryingRecord.created_at)))
+    if barangay_id is not None:
+        query = query.filter(DryingRecord.barangay_id == barangay_id)
+    return tuple(query.one())
+
+
+def get_model(barangay_id=None):
+    """Model for a barangay (None = every barangay), refitted from history whenever its data changed."""
+    version = _version(barangay_id)
+    with _lock:
+        entry = _models.get(barangay_id)
+        if entry is not None:
+            _models.move_to_end(barangay_id)
+    hit = entry is not None and entry[0] == version
+    record_cache('prediction_model', hit)
+    if hit:
+        return entry[1]
+
+    model = DryingTimeModel()
+    model.update(*_history(barangay_id))
+    with _lock:
+        _models[barangay_id] = (version, model)
+        while len(_models) > MAX_MODELS:
+            _models.popitem(last=False)
+    return model
+
+
+def model_for_barangay(barangay_id):
+    """The barangay's own model if it has enough history, else the all-barangay model."""
+    model = get_model(barangay_id)
+    if model.ready:
+        return model, barangay_id
+    return get_model(None), None
+
+
+def observed(records):
+    """OBSERVE_FIELDS of records about to be committed, as plain tuples for observe().
+
+    Read them before the commit: afterwards every record is expired and each
+    attribute access would be a query of its own.
+    """
+    return [tuple(getattr(record, field) for field in OBSERVE_FIELDS) for record in records]
+
+
+def observe(rows):
+    """Fold newly committed records into this worker's cached models instead of refitting them.
+
+    `rows` come from observed(). A model only absorbs the batch if its scope's
+    record count grew by exactly the batch, i.e. nothing else changed since it
+    was fitted; its version then moves forward. Otherwise it is dropped and
+    refits on next use. Other workers see the new version and refit on their own.
+    """
+    if not rows or not _models:
+        return
+    values = np.array(rows, dtype=float).reshape(-1, len(OBSERVE_FIELDS))   # None becomes NaN
+    barangay_ids = values[:, 0]
+    with _lock:
+        cached = {key: entry for key, entry in _models.items()
+                  if key is None or (barangay_ids == key).any()}
+    if not cached:
+        return
+    versions = {key: _version(key) for key in cached}
+
+    with np.errstate(invalid='ignore'):
+        usable = values[:, 5] > 0
+    X = build_features(values[:, 1], values[:, 2], values[:, 3], values[:, 4])
+    y = values[:, 5]
+
+    with _lock:
+        for key, (old_version, model) in cached.items():
+            if _models.get(key, (None, None))[1] is not model:
+                continue  # refitted or evicted meanwhile
+            in_scope = np.ones(len(rows), dtype=bool) if key is None else barangay_ids == key
+            if versions[key][0] != old_version[0] + int(in_scope.sum()):
+                del _models[key]
+                continue
+            mask = in_scope & usable
+            model.update(X[mask], y[mask])
+            _models[key] = (versions[key], model)
+
+
+def score_batches(model, batches):
+    """Predict drying minutes for a list of planned batches in one matrix product.
+
+    Batches missing a field or holding a non-numeric value get None.
+    """
+    try:
+        # Fast path: every value is a number or missing (None becomes NaN)
+        values = np.array([[batch.get(field) for field in BATCH_FIELDS] for batch in batches],
+                          dtype=float).reshape(-1, len(BATCH_FIELDS))
+    except (AttributeError, TypeError, ValueError):
+        values = np.full((len(batches), len(BATCH_FIELDS)), np.nan)
+        for i, batch in enumerate(batches):
+            for j, field in enumerate(BATCH_FIELDS):
+                try:
+                    values[i, j] = float(batch[field])
+                except (KeyError, TypeError, ValueError):
+                    pass
+
+    X = build_features(values[:, 0], values[:, 1], values[:, 2], values[:, 3])
+    minutes = model.predict(np.nan_to_num(X))
+    minutes[np.isnan(X).any(axis=1)] = np.nan
+    return [None if m != m else m for m in np.round(minutes, 1).tolist()]  # NaN -> None
+
+
+def reset():
+    """Drop every cached model (they refit lazily on next use)."""
+    with _lock:
+        _models.clear()
@@ -0,0 +1,128 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+N_PLUS_ONE_THRESHOLD = 5  # same statement this many times in one request looks like a lazy-load loop
+
+_test_collectors = []
+_listening = False
+
+
+class QueryStats:
+    """Query count, total SQL time and statement fingerprints for one request or block."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+        self.statements = []
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.fingerprints[fingerprint(statement)] += 1
+        self.statements.append(statement)
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+
+def fingerprint(statement):
+    """Statement text with literals and IN-lists collapsed, so each lazy load of a loop looks alike."""
+    fp = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    fp = re.sub(r'\b\d+(\.\d+)?\b', '?', fp)
+    fp = re.sub(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)', '(?)', fp)
+    return re.sub(r'\s+', ' ', fp).strip()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_start_time')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    for stats in _test_collectors:
+        stats.record(statement, elapsed)
+    if has_app_context():
+        stats = g.get('sql_profile')
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+
+def _listen():
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+
+def init_profiling(app):
+    """Opt-in per-request SQL profiling (SQL_PROFILING=1).
+
+    Adds a Server-Timing header with query count and SQL time to every response
+    and logs statements repeated often enough to be an N+1 lazy-load pattern.
+    """
+    if not app.config.get('SQL_PROFILING'):
+        return
+    _listen()
+    threshold = app.config.get('N_PLUS_ONE_THRESHOLD', N_PLUS_ONE_THRESHOLD)
+
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile = QueryStats()
+        g.sql_profile_started = time.perf_counter()
+
+    @app.after_request
+    def report_sql_profile(response):
+        stats = g.pop('sql_profile', None)
+        if stats is None:
+            return response
+        total = (time.perf_counter() - g.pop('sql_profile_started')) * 1000
+
+        response.headers.add('Server-Timing', f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries"')
+        response.headers.add('Server-Timing', f'app;dur={total:.1f}')
+
+        for fp, n in stats.repeated(threshold):
+            app.logger.warning("Possible N+1 on %s %s (%s): %d x %s",
+                               request.method, request.path, request.endpoint, n, fp)
+        return response
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement executed inside the block, request or not.
+
+        with count_queries() as stats:
+            client.get('/records')
+        print(stats.count, stats.repeated())
+    """
+    _listen()
+    stats = QueryStats()
+    _test_collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _test_collectors.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail if the block runs more than `limit` queries; the message lists what ran.
+
+        with assert_max_queries(4):
+            client.get('/records')
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        listing = '\n'.join(f"  {n} x {fp}" for fp, n in stats.fingerprints.most_common())
+        raise AssertionError(f"Expected at most {limit} queries, got {stats.count}:\n{listing}")
@@ -0,0 +1,189 @@
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from .models import DryingRecord
+from .extensions import db
+from .metrics import record_cache
+
+# Numeric payload fields screened at ingest, in matrix column order
+SCREEN_COLUMNS = ('initial_weight', 'final_weight', 'initial_moisture', 'final_moisture',
+                  'temperature', 'humidity', 'sensor_value')
+
+# Physically possible values, (low, high) inclusive; None leaves that side open.
+# Override per column with QUALITY_RULES, e.g. '{"temperature": [0, 60]}'
+RULES = {
+    'initial_weight': (0.1, 50000.0),    # kg per batch
+    'final_weight': (0.1, 50000.0),
+    'initial_moisture': (0.0, 100.0),    # %
+    'final_moisture': (0.0, 100.0),
+    'temperature': (-10.0, 80.0),        # °C, ambient up to heated dryer air
+    'humidity': (0.0, 100.0),            # % RH
+    'sensor_value': (0.0, 4095.0),       # raw 10- or 12-bit ADC reading
+}
+# Drying only removes water: (column, column it may not exceed)
+RELATIONS = (('final_weight', 'initial_weight'), ('final_moisture', 'initial_moisture'))
+
+# Per-barangay bounds are the median ± OUTLIER_LIMIT robust standard deviations
+# (1.4826 × MAD) of the barangay's recent accepted records. The values here are
+# the smallest deviation allowed, so a tight distribution does not flag ordinary
+# readings. Weights are compared on a log scale since batch sizes are skewed.
+STAT_COLUMNS = {
+    'initial_weight': 0.25, 'final_weight': 0.25,
+    'initial_moisture': 1.5, 'final_moisture': 1.5,
+    'temperature': 2.0, 'humidity': 5.0,
+}
+LOG_COLUMNS = ('initial_weight', 'final_weight')
+OUTLIER_LIMIT = 6.0
+MIN_SAMPLES = 50        # accepted records a barangay needs before its bounds apply
+STATS_SAMPLE = 2000     # most recent records the bounds are computed from
+STATS_TTL = 300         # seconds a worker reuses a barangay's bounds
+
+_STAT_INDEX = [SCREEN_COLUMNS.index(name) for name in STAT_COLUMNS]
+_LOG = np.array([name in LOG_COLUMNS for name in STAT_COLUMNS])
+_MIN_SPREAD = np.array(list(STAT_COLUMNS.values()))
+
+_stats = {}             # barangay_id -> (expires, (center, spread) or None)
+_lock = threading.Lock()
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _matrix(records):
+    """SCREEN_COLUMNS as one float matrix; anything non-numeric becomes NaN."""
+    rows = [tuple(record.get(name) for name in SCREEN_COLUMNS) for record in records]
+    try:
+        matrix = np.array(rows, dtype=float)
+    except (TypeError, ValueError):
+        # Some device sent a string or an object: convert cell by cell
+        matrix = np.array([[_number(value) for value in row] for row in rows], dtype=float)
+    return matrix.reshape(len(rows), len(SCREEN_COLUMNS))
+
+
+def _log_scale(values):
+    values = values.copy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values[:, _LOG] = np.log(values[:, _LOG])
+    return values
+
+
+def barangay_stats(barangay_id):
+    """(center, spread) over STAT_COLUMNS for a barangay, or None below MIN_SAMPLES records.
+
+    Computed from its STATS_SAMPLE most recent records and kept per worker for
+    STATS_TTL seconds; quarantined records never reach drying_records, so they
+    cannot widen the bounds they failed.
+    """
+    now = time.monotonic()
+    with _lock:
+        cached = _stats.get(barangay_id)
+    record_cache('quality_stats', bool(cached and cached[0] > now))
+    if cached and cached[0] > now:
+        return cached[1]
+
+    columns = [getattr(DryingRecord, name) for name in STAT_COLUMNS]
+    rows = db.session.execute(
+        select(*columns).where(DryingRecord.barangay_id == barangay_id)
+        .order_by(DryingRecord.id.desc()).limit(STATS_SAMPLE)
+    ).all()
+    stats = None
+    if len(rows) >= current_app.config.get('QUALITY_MIN_SAMPLES', MIN_SAMPLES):
+        values = _log_scale(np.array(rows, dtype=float))
+        center = np.nanmedian(values, axis=0)
+        spread = np.maximum(1.4826 * np.nanmedian(np.abs(values - center), axis=0), _MIN_SPREAD)
+        stats = (center, spread)
+
+    with _lock:
+        _stats[barangay_id] = (now + STATS_TTL, stats)
+    return stats
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def _bounds(rules):
+    low = np.array([-np.inf if rules[name][0] is None else rules[name][0] for name in SCREEN_COLUMNS])
+    high = np.array([np.inf if rules[name][1] is None else rules[name][1] for name in SCREEN_COLUMNS])
+    return low, high
+
+
+def screen(records, barangay_ids):
+    """Check a sync batch in one vectorized pass; returns {index: [reasons]} for flagged records.
+
+    `barangay_ids` lines up with `records` (None where unknown) and picks the
+    statistical bounds; callers resolve it server-side, not from the payload.
+
+    A record is flagged when a numeric field is missing or not a number, falls
+    outside RULES, breaks a drying relation (final above initial) or lies beyond
+    its barangay's statistical bounds. Records that pass are not in the result.
+    """
+    config = current_app.config
+    if not records or not config.get('QUALITY_SCREENING', True):
+        return {}
+
+    rules = dict(RULES)
+    rules.update({name: tuple(bounds) for name, bounds in config.get('QUALITY_RULES', {}).items()
+                  if name in RULES})
+    limit = config.get('QUALITY_OUTLIER_LIMIT', OUTLIER_LIMIT)
+
+    values = _matrix(records)
+    barangay_ids = np.array(barangay_ids, dtype=float).reshape(len(records))
+    low, high = _bounds(rules)
+
+    not_number = ~np.isfinite(values)
+    too_low = values < low
+    too_high = values > high
+    broken = np.column_stack([values[:, SCREEN_COLUMNS.index(a)] > values[:, SCREEN_COLUMNS.index(b)]
+                              for a, b in RELATIONS])
+
+    # Each record's barangay bounds, NaN (never flagged) where there are none yet
+    center = np.full((len(records), len(STAT_COLUMNS)), np.nan)
+    spread = center.copy()
+    known = np.isfinite(barangay_ids)
+    ids, inverse = np.unique(barangay_ids[known], return_inverse=True)
+    table = np.full((len(ids), 2, len(STAT_COLUMNS)), np.nan)
+    for j, barangay_id in enumerate(ids):
+        stats = barangay_stats(int(barangay_id))
+        if stats is not None:
+            table[j] = stats
+    center[known], spread[known] = table[inverse, 0], table[inverse, 1]
+
+    scaled = _log_scale(values[:, _STAT_INDEX])
+    with np.errstate(invalid='ignore'):
+        outlier = np.abs(scaled - center) > limit * spread
+    # Values already outside RULES are reported once, by the rule
+    outlier &= ~(not_number | too_low | too_high)[:, _STAT_INDEX]
+
+    flagged = not_number.any(axis=1) | too_low.any(axis=1) | too_high.any(axis=1) \
+        | broken.any(axis=1) | outlier.any(axis=1)
+
+    results = {}
+    for i in np.flatnonzero(flagged):
+        reasons = []
+        for c, name in enumerate(SCREEN_COLUMNS):
+            if not_number[i, c]:
+                reasons.append(f"{name} is not a number")
+            elif too_low[i, c] or too_high[i, c]:
+                reasons.append(f"{name} {values[i, c]:g} outside {low[c]:g} to {high[c]:g}")
+        for r, (a, b) in enumerate(RELATIONS):
+            if broken[i, r]:
+                reasons.append(f"{a} greater than {b}")
+        for s, name in enumerate(STAT_COLUMNS):
+            if outlier[i, s]:
+                bounds = center[i, s] - limit * spread[i, s], center[i, s] + limit * spread[i, s]
+                if _LOG[s]:
+                    bounds = np.exp(bounds)
+                reasons.append(f"{name} {values[i, _STAT_INDEX[s]]:g} outside barangay range "
+                               f"{bounds[0]:.4g} to {bounds[1]:.4g}")
+        results[int(i)] = reasons
+    return results
@@ -0,0 +1,285 @@
+import csv
+import io
+import os
+import threading
+import zipfile
+from datetime import date
+
+import numpy as np
+from flask import render_template
+from sqlalchemy import func, extract
+
+from .extensions import db
+from .models import DryingRecord, Barangay, Farmer, Municipality
+from .analytics import PERCENTILES, SAFE_STORAGE_MOISTURE, MOISTURE_BINS
+
+# Harvest seasons: dry-season crops come in January-June, wet-season crops July-December
+SEASONS = {'dry': (1, 6), 'wet': (7, 12)}
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+EXTRACT_COLUMNS = ('barangay_id', 'farmer_id', 'initial_weight', 'final_weight',
+                   'initial_moisture', 'final_moisture', 'drying_minutes', 'month')
+
+# Below this many rows shipping arrays to the pool costs more than the NumPy work
+PARALLEL_MIN_ROWS = 50000
+
+_pool = None
+_pool_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def current_season(today=None):
+    today = today or date.today()
+    return f"{today.year}-{'dry' if today.month <= 6 else 'wet'}"
+
+
+def parse_season(season):
+    """'2025-wet' -> (date(2025, 7, 1), date(2025, 12, 31)); ValueError if malformed."""
+    year, _, half = (season or '').partition('-')
+    if half not in SEASONS or not year.isdigit():
+        raise ValueError(f"Unknown season {season!r}; expected e.g. 2025-dry or 2025-wet")
+    first, last = SEASONS[half]
+    return date(int(year), first, 1), date(int(year), last, 31 if last == 12 else 30)
+
+
+def _season_filter(query, municipality_id, season):
+    start, end = parse_season(season)
+    harvested = func.coalesce(DryingRecord.date_harvested, DryingRecord.date_dried)
+    return query.join(Barangay, DryingRecord.barangay_id == Barangay.id) \
+        .filter(Barangay.municipality_id == municipality_id,
+                harvested >= start, harvested <= end)
+
+
+def season_version(municipality_id, season):
+    """Changes whenever a record in the season is added, edited or removed."""
+    changed = func.coalesce(DryingRecord.updated_at, DryingRecord.created_at)
+    count, watermark = _season_filter(
+        db.session.query(func.count(DryingRecord.id), func.max(changed)), municipality_id, season).one()
+    stamp = watermark.strftime('%Y%m%d%H%M%S') if watermark else '0'
+    return f"{count}-{stamp}"
+
+
+def extract_columns(municipality_id, season):
+    """The season's records for a municipality as float columns, in one query."""
+    harvested = func.coalesce(DryingRecord.date_harvested, DryingRecord.date_dried)
+    query = db.session.query(
+        DryingRecord.barangay_id, DryingRecord.farmer_id,
+        DryingRecord.initial_weight, DryingRecord.final_weight,
+        DryingRecord.initial_moisture, DryingRecord.final_moisture,
+        DryingRecord.drying_minutes, extract('month', harvested),
+    )
+    rows = _season_filter(query, municipality_id, season).all()
+    matrix = np.array(rows, dtype=float).reshape(len(rows), len(EXTRACT_COLUMNS))
+    return {name: matrix[:, i] for i, name in enumerate(EXTRACT_COLUMNS)}
+
+
+def partition(columns):
+    """Split the extract into one contiguous block of columns per barangay."""
+    order = np.argsort(columns['barangay_id'], kind='stable')
+    ids = columns['barangay_id'][order]
+    bounds = np.flatnonzero(np.diff(ids)) + 1
+    parts = []
+    for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [ids.size]))):
+        if end > start:
+            parts.append({name: values[order[start:end]] for name, values in columns.items()})
+    return parts
+
+
+def _percentiles(values):
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return [None] * len(PERCENTILES)
+    return [round(float(v), 2) for v in np.percentile(values, PERCENTILES)]
+
+
+def _round(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def compute_section(part):
+    """Totals, per-farmer breakdown, moisture stats and monthly curve for one block of records.
+
+    Pure NumPy on plain arrays so it can run in a pool worker.
+    """
+    initial, final = np.nan_to_num(part['initial_weight']), np.nan_to_num(part['final_weight'])
+    final_moisture = part['final_moisture']
+    hours = part['drying_minutes'] / 60.0
+    batches = int(initial.size)
+
+    farmer_ids, farmer_idx = np.unique(np.nan_to_num(part['farmer_id'], nan=-1), return_inverse=True)
+    farmer_batches = np.bincount(farmer_idx, minlength=farmer_ids.size)
+    farmer_initial = np.bincount(farmer_idx, initial, minlength=farmer_ids.size)
+    farmer_final = np.bincount(farmer_idx, final, minlength=farmer_ids.size)
+    has_moisture = ~np.isnan(final_moisture)
+    moisture_sum = np.bincount(farmer_idx[has_moisture], final_moisture[has_moisture], minlength=farmer_ids.size)
+    moisture_n = np.bincount(farmer_idx[has_moisture], minlength=farmer_ids.size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        farmer_moisture = moisture_sum / moisture_n
+
+    months = np.nan_to_num(part['month']).astype(np.int64)
+    monthly_batches = np.bincount(months, minlength=13)[1:13]
+    monthly_final = np.bincount(months, final, minlength=13)[1:13]
+
+    histogram, _ = np.histogram(final_moisture[has_moisture], bins=MOISTURE_BINS)
+
+    total_initial, total_final = float(initial.sum()), float(final.sum())
+    return {
+        'barangay_id': int(part['barangay_id'][0]) if batches else None,
+        'totals': {
+            'batches': batches,
+            'farmers': int((farmer_ids >= 0).sum()),
+            'initial_kg': round(total_initial, 1),
+            'final_kg': round(total_final, 1),
+            'weight_loss_pct': round((1 - total_final / total_initial) * 100, 2) if total_initial else None,
+            'avg_drying_hours': _round(np.nanmean(hours)) if np.any(~np.isnan(hours)) else None,
+            'under_dried_pct': round(float((final_moisture[has_moisture] > SAFE_STORAGE_MOISTURE).mean() * 100), 1)
+            if has_moisture.any() else None,
+        },
+        'farmers': [
+            {'farmer_id': int(fid) if fid >= 0 else None, 'batches': int(n),
+             'initial_kg': round(float(a), 1), 'final_kg': round(float(b), 1),
+             'avg_final_moisture': _round(m)}
+            for fid, n, a, b, m in zip(farmer_ids, farmer_batches, farmer_initial, farmer_final, farmer_moisture)
+        ],
+        'moisture': {
+            'initial_percentiles': _percentiles(part['initial_moisture']),
+            'final_percentiles': _percentiles(final_moisture),
+            'final_histogram': histogram.tolist(),
+        },
+        'monthly': {'batches': monthly_batches.tolist(), 'final_kg': [round(float(v), 1) for v in monthly_final]},
+    }
+
+
+def _get_pool(workers):
+    global _pool
+    # Imported here: multiprocessing is slow to import and most workers never build a report
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: pool processes never inherit a gunicorn worker's threads or DB connections
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else None)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _pool
+
+
+def compute_sections(columns, parallel=True, workers=None):
+    """(municipality-wide section, per-barangay sections) from one extract."""
+    parts = partition(columns)
+    workers = workers or os.cpu_count() or 1
+    if parallel and len(parts) > 1 and workers > 1 and columns['barangay_id'].size >= PARALLEL_MIN_ROWS:
+        pool = _get_pool(workers)
+        whole = pool.submit(compute_section, columns)
+        sections = list(pool.map(compute_section, parts))
+        return whole.result(), sections
+    return compute_section(columns), [compute_section(p) for p in parts]
+
+
+def _sparkline(values, width=120, height=24):
+    peak = max(values) or 1
+    step = width / max(len(values) - 1, 1)
+    return ' '.join(f"{i * step:.1f},{height - v / peak * height:.1f}" for i, v in enumerate(values))
+
+
+def _csv(header, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+def render_bundle(municipality_id, season, whole, sections):
+    """Zip of report.html plus barangays.csv, farmers.csv and monthly.csv."""
+    start, end = parse_season(season)
+    month_range = list(range(start.month, end.month + 1))
+    municipality = db.session.get(Municipality, municipality_id)
+    barangay_names = dict(db.session.query(Barangay.id, Barangay.name)
+                          .filter(Barangay.municipality_id == municipality_id).all())
+    farmer_ids = {f['farmer_id'] for s in sections for f in s['farmers'] if f['farmer_id'] is not None}
+    farmer_names = {f.id: f.full_name for f in Farmer.query.filter(Farmer.id.in_(farmer_ids)).all()} \
+        if farmer_ids else {}
+
+    for section in sections:
+        section['name'] = barangay_names.get(section['barangay_id'], f"Barangay {section['barangay_id']}")
+        section['season_monthly'] = [section['monthly']['final_kg'][m - 1] for m in month_range]
+        section['sparkline'] = _sparkline(section['season_monthly'])
+        for farmer in section['farmers']:
+            farmer['name'] = farmer_names.get(farmer['farmer_id'], 'Unknown farmer')
+    sections.sort(key=lambda s: s['name'])
+
+    html = render_template('season_report.html',
+                           municipality=municipality, season=season, start=start, end=end,
+                           whole=whole, sections=sections, percentiles=PERCENTILES,
+                           months=[MONTH_NAMES[m - 1] for m in month_range],
+                           whole_monthly=[whole['monthly']['final_kg'][m - 1] for m in month_range],
+                           safe_moisture=SAFE_STORAGE_MOISTURE)
+
+    totals_keys = ('batches', 'farmers', 'initial_kg', 'final_kg', 'weight_loss_pct',
+                   'avg_drying_hours', 'under_dried_pct')
+    barangays_csv = _csv(('barangay',) + totals_keys,
+                         [(s['name'],) + tuple(s['totals'][k] for k in totals_keys) for s in sections])
+    farmers_csv = _csv(('barangay', 'farmer', 'batches', 'initial_kg', 'final_kg', 'avg_final_moisture'),
+                       [(s['name'], f['name'], f['batches'], f['initial_kg'], f['final_kg'], f['avg_final_moisture'])
+                        for s in sections for f in s['farmers']])
+    monthly_csv = _csv(('barangay', 'month', 'batches', 'final_kg'),
+                       [(s['name'], MONTH_NAMES[m - 1], s['monthly']['batches'][m - 1], s['monthly']['final_kg'][m - 1])
+                        for s in sections for m in month_range])
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr('report.html', html)
+        bundle.writestr('barangays.csv', barangays_csv)
+        bundle.writestr('farmers.csv', farmers_csv)
+        bundle.writestr('monthly.csv', monthly_csv)
+    return buf.getvalue()
+
+
+def report_dir(app):
+    path = app.config.get('REPORT_DIR') or os.path.join(app.instance_path, 'reports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def season_report(app, municipality_id, season):
+    """Path of the season's report bundle, building it first if its records changed."""
+    directory = report_dir(app)
+    prefix = f"season-{municipality_id}-{season}-"
+    path = os.path.join(directory, f"{prefix}{season_version(municipality_id, season)}.zip")
+    if os.path.exists(path):
+        return path
+
+    # One build at a time per worker; a second officer asking for it waits for the first
+    with _build_lock:
+        if os.path.exists(path):
+            return path
+        columns = extract_columns(municipality_id, season)
+        whole, sections = compute_sections(columns, workers=app.config.get('REPORT_WORKERS'))
+        body = render_bundle(municipality_id, season, whole, sections)
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith('.zip') and os.path.join(directory, name) != path:
+                os.remove(os.path.join(directory, name))
+    return path
+
+
+def read_report_html(path):
+    with zipfile.ZipFile(path) as bundle:
+        return bundle.read('report.html').decode('utf-8')
+
+
+def available_seasons(municipality_id):
+    """Seasons with at least one harvest in the municipality, newest first."""
+    harvested = func.coalesce(DryingRecord.date_harvested, DryingRecord.date_dried)
+    rows = db.session.query(extract('year', harvested), extract('month', harvested)) \
+        .join(Barangay, DryingRecord.barangay_id == Barangay.id) \
+        .filter(Barangay.municipality_id == municipality_id, harvested.isnot(None)) \
+        .distinct().all()
+    seasons = {f"{int(y)}-{'dry' if m <= 6 else 'wet'}" for y, m in rows}
+    return sorted(seasons, key=lambda s: (s[:4], s.endswith('wet')), reverse=True)
@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+from sqlalchemy import func
+from .models import DryingRecord, Barangay
+from .extensions import db
+
+DEFAULT_WINDOW_DAYS = 14
+MAX_WINDOW_DAYS = 92
+OVERDUE_LIMIT = 100       # most recently due undried batches listed; overdue_total counts them all
+MAX_OVERDUE_LIMIT = 500
+
+
+def scope_barangay_ids(user):
+    """Barangays whose schedule the user may see; farmers are narrowed further by farmer_id."""
+    if user.role in ('barangay', 'farmer'):
+        return [user.barangay_id]
+    return [b.id for b in Barangay.query.with_entities(Barangay.id)
+            .filter_by(municipality_id=user.municipality_id).all()]
+
+
+def _scoped(query, user, barangay_ids):
+    # IN over a handful of barangay ids lets each lookup seek (barangay_id, due_date)
+    query = query.filter(DryingRecord.barangay_id.in_(barangay_ids))
+    if user.role == 'farmer':
+        query = query.filter(DryingRecord.farmer_id == user.id)
+    return query
+
+
+def _batch_dict(row, today):
+    return {
+        "id": row.id,
+        "uuid": row.uuid,
+        "batch_name": row.batch_name,
+        "farmer_name": row.farmer_name,
+        "barangay_id": row.barangay_id,
+        "barangay_name": row.barangay_name,
+        "due_date": row.due_date.isoformat(),
+        "date_dried": row.date_dried.isoformat() if row.date_dried else None,
+        "overdue": row.date_dried is None and row.due_date < today
+    }
+
+
+def due_schedule(user, start=None, days=DEFAULT_WINDOW_DAYS, overdue_limit=OVERDUE_LIMIT):
+    """Batches due in [start, start + days), per-day load counts, and overdue undried batches.
+
+    Undried batches pile up over the seasons, so only the `overdue_limit` most
+    recently due are listed, with `overdue_total` counting all of them.
+    """
+    today = date.today()
+    start = start or today
+    days = max(1, min(days, MAX_WINDOW_DAYS))
+    overdue_limit = max(1, min(overdue_limit, MAX_OVERDUE_LIMIT))
+    end = start + timedelta(days=days)
+
+    barangay_ids = scope_barangay_ids(user)
+    if not barangay_ids:
+        return {"start": start.isoformat(), "end": end.isoformat(), "days": [], "batches": [], "overdue": [],
+                "overdue_total": 0}
+
+    columns = (DryingRecord.id, DryingRecord.uuid, DryingRecord.batch_name, DryingRecord.farmer_name,
+               DryingRecord.barangay_id, DryingRecord.due_date, DryingRecord.date_dried,
+               Barangay.name.label('barangay_name'))
+
+    in_window = _scoped(db.session.query(*columns)
+                        .join(Barangay, DryingRecord.barangay_id == Barangay.id), user, barangay_ids) \
+        .filter(DryingRecord.due_date >= start, DryingRecord.due_date < end) \
+        .order_by(DryingRecord.due_date, DryingRecord.batch_name) \
+        .all()
+
+    daily = dict(_scoped(db.session.query(DryingRecord.due_date, func.count(DryingRecord.id)), user, barangay_ids)
+                 .filter(DryingRecord.due_date >= start, DryingRecord.due_date < end)
+                 .group_by(DryingRecord.due_date)
+                 .all())
+
+    # Both match the partial pending index: undried batches only
+    overdue = _scoped(db.session.query(*columns)
+                      .join(Barangay, DryingRecord.barangay_id == Barangay.id), user, barangay_ids) \
+        .filter(DryingRecord.date_dried.is_(None), DryingRecord.due_date < today) \
+        .order_by(DryingRecord.due_date.desc(), DryingRecord.id.desc()) \
+        .limit(overdue_limit) \
+        .all()
+
+    overdue_total = _scoped(db.session.query(func.count(DryingRecord.id)), user, barangay_ids) \
+        .filter(DryingRecord.date_dried.is_(None), DryingRecord.due_date < today) \
+        .scalar()
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": [
+            {"date": (start + timedelta(days=i)).isoformat(),
+             "count": daily.get(start + timedelta(days=i), 0)}
+            for i in range(days)
+        ],
+        "batches": [_batch_dict(row, today) for row in in_window],
+        "overdue": [_batch_dict(row, today) for row in overdue],
+        "overdue_total": overdue_total
+    }
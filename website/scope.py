@@ -0,0 +1,70 @@
+from sqlalchemy import lambda_stmt, select, func
+
+from .models import DryingRecord, Farmer, Barangay
+
+# Columns the records page shows. Rows come back as named tuples instead of
+# DryingRecord objects, so there is no identity map or attribute state to build.
+RECORD_LIST_COLUMNS = (
+    DryingRecord.id, DryingRecord.batch_name, DryingRecord.farmer_name, DryingRecord.due_date,
+    DryingRecord.date_planted, DryingRecord.date_harvested, DryingRecord.date_dried,
+    DryingRecord.initial_weight, DryingRecord.final_weight,
+)
+FARMER_LIST_COLUMNS = (Farmer.id, Farmer.username, Farmer.first_name, Farmer.middle_name, Farmer.last_name)
+
+
+def scoped(stmt, user):
+    """Limit a lambda statement over drying_records to what `user` may see.
+
+    Each role is its own lambda, so SQLAlchemy caches one compiled statement per
+    role and the user's id only changes a bound parameter; nothing is rebuilt
+    or recompiled per request.
+    """
+    if user.role == 'farmer':
+        farmer_id = user.id
+        stmt += lambda s: s.where(DryingRecord.farmer_id == farmer_id)
+    elif user.role == 'barangay':
+        barangay_id = user.barangay_id
+        stmt += lambda s: s.where(DryingRecord.barangay_id == barangay_id)
+    else:
+        municipality_id = user.municipality_id
+        stmt += lambda s: s.join(Barangay, DryingRecord.barangay_id == Barangay.id) \
+            .where(Barangay.municipality_id == municipality_id)
+    return stmt
+
+
+def record_rows(user):
+    """Records page rows, newest first; municipal rows also carry barangay_name."""
+    stmt = scoped(lambda_stmt(lambda: select(*RECORD_LIST_COLUMNS)), user)
+    if user.role == 'municipal':
+        stmt += lambda s: s.add_columns(Barangay.name.label('barangay_name'))
+    stmt += lambda s: s.order_by(DryingRecord.timestamp.desc())
+    return stmt
+
+
+def any_record(user):
+    """One record id in scope, if there is any (execute and check .first())."""
+    stmt = scoped(lambda_stmt(lambda: select(DryingRecord.id)), user)
+    stmt += lambda s: s.limit(1)
+    return stmt
+
+
+def record_version(user):
+    """(record count, latest created/updated time) in scope; changes whenever those records do."""
+    stmt = lambda_stmt(lambda: select(
+        func.count(DryingRecord.id),
+        func.max(func.coalesce(DryingRecord.updated_at, DryingRecord.created_at))))
+    return scoped(stmt, user)
+
+
+def farmer_rows(barangay_id):
+    """A barangay's farmers as (id, username, first_name, middle_name, last_name) rows."""
+    return lambda_stmt(lambda: select(*FARMER_LIST_COLUMNS).where(Farmer.barangay_id == barangay_id))
+
+
+def any_farmer(barangay_id):
+    return lambda_stmt(lambda: select(Farmer.id).where(Farmer.barangay_id == barangay_id).limit(1))
+
+
+def barangay_names(municipality_id):
+    """(id, name) rows for a municipality's barangays."""
+    return lambda_stmt(lambda: select(Barangay.id, Barangay.name).where(Barangay.municipality_id == municipality_id))
@@ -0,0 +1,230 @@
+import re
+from difflib import SequenceMatcher
+from sqlalchemy import text, bindparam, inspect, or_
+from .models import Farmer, DryingRecord, Barangay
+from .extensions import db
+
+# Must match the index expressions in migrations/versions/8d3f61a2e5b7_search_indexes.py
+FARMER_SEARCH_TEXT = "lower(first_name || ' ' || coalesce(middle_name, '') || ' ' || last_name || ' ' || username)"
+RECORD_SEARCH_TEXT = "lower(batch_name || ' ' || coalesce(farmer_name, ''))"
+
+SEARCH_KINDS = ('farmer', 'record')
+CANDIDATES = 200  # FTS hits re-ranked in Python on SQLite
+TYPO_CANDIDATES = 50  # best bm25 hits of the one-typo trigram query worth re-ranking
+MIN_SCORE = 0.6   # re-ranked SQLite hits below this are dropped as noise
+MAX_QUERY_WORDS = 4
+MAX_WORD_LENGTH = 24
+
+_has_fts = {}
+
+
+def typo_variants(word):
+    """The word plus every single deletion and adjacent transposition of it."""
+    variants = {word}
+    for i in range(len(word)):
+        variants.add(word[:i] + word[i + 1:])
+        if i + 1 < len(word):
+            variants.add(word[:i] + word[i + 1] + word[i] + word[i + 2:])
+    return variants
+
+
+def fts_terms(query):
+    """Trigrams to OR together in an FTS5 MATCH so one-typo spellings still find candidates."""
+    terms = set()
+    for word in re.findall(r'\w+', query.lower())[:MAX_QUERY_WORDS]:
+        for variant in typo_variants(word[:MAX_WORD_LENGTH]):
+            terms.update(variant[i:i + 3] for i in range(len(variant) - 2))
+    return sorted(terms)
+
+
+def word_score(query, candidate):
+    """0..1 match quality; each query word is compared to the start of its best candidate word.
+
+    Comparing against the word's prefix makes partially typed names (autocomplete)
+    score as high as complete ones, while SequenceMatcher absorbs typos.
+    """
+    query_words = re.findall(r'\w+', query.lower())
+    candidate_words = re.findall(r'\w+', candidate.lower())
+    if not query_words or not candidate_words:
+        return 0.0
+
+    def best(qw):
+        if any(cw.startswith(qw) for cw in candidate_words):
+            return 1.0
+        # Also try one extra character so a missed letter mid-word still lines up
+        return max(max(SequenceMatcher(None, qw, cw[:len(qw)]).ratio(),
+                       SequenceMatcher(None, qw, cw[:len(qw) + 1]).ratio())
+                   for cw in candidate_words)
+
+    return sum(best(qw) for qw in query_words) / len(query_words)
+
+
+def search_scope(user):
+    """Which rows the user may search: {'barangay_ids': [...] or None, 'farmer_id': id or None}."""
+    if user.role == 'farmer':
+        return {'barangay_ids': [user.barangay_id], 'farmer_id': user.id}
+    if user.role == 'barangay':
+        return {'barangay_ids': [user.barangay_id], 'farmer_id': None}
+    ids = [b.id for b in Barangay.query.with_entities(Barangay.id)
+           .filter_by(municipality_id=user.municipality_id).all()]
+    return {'barangay_ids': ids, 'farmer_id': None}
+
+
+def _sqlite_has_fts():
+    url = str(db.engine.url)
+    if url not in _has_fts:
+        _has_fts[url] = inspect(db.engine).has_table('search_index')
+    return _has_fts[url]
+
+
+def _sqlite_rows(where, params, scope, kinds, order_by_rank, limit=CANDIDATES):
+    sql = (f"SELECT kind, ref_id, text FROM search_index WHERE {where} "
+           "AND kind IN :kinds AND barangay_id IN :barangay_ids")
+    params = dict(params, kinds=list(kinds), barangay_ids=scope['barangay_ids'], limit=limit)
+    if scope['farmer_id'] is not None:
+        sql += " AND farmer_id = :farmer_id"
+        params['farmer_id'] = scope['farmer_id']
+    sql += " ORDER BY bm25(search_index) LIMIT :limit" if order_by_rank else " LIMIT :limit"
+
+    stmt = text(sql).bindparams(bindparam('kinds', expanding=True),
+                                bindparam('barangay_ids', expanding=True))
+    return db.session.execute(stmt, params).fetchall()
+
+
+def _sqlite_candidates(query, kinds, scope, limit):
+    """Ids per kind from the FTS5 trigram table, re-ranked by match quality.
+
+    Exact substrings are looked up first, which is selective and stops at the
+    candidate limit. Only when that finds too little do we OR together the
+    trigrams of every one-typo spelling, ranked by bm25.
+    """
+    words = [w[:MAX_WORD_LENGTH] for w in re.findall(r'\w+', query.lower())[:MAX_QUERY_WORDS]]
+    long_words = [w for w in words if len(w) >= 3]
+
+    if long_words:
+        rows = _sqlite_rows("search_index MATCH :match",
+                            {'match': ' AND '.join(f'"{w}"' for w in long_words)},
+                            scope, kinds, order_by_rank=False)
+    else:
+        # Fewer than three characters: no trigram to look up, so scan for a word prefix
+        rows = _sqlite_rows("(text LIKE :prefix OR text LIKE :word_prefix)",
+                            {'prefix': f"{query}%", 'word_prefix': f"% {query}%"},
+                            scope, kinds, order_by_rank=False)
+
+    if long_words and len(rows) < limit:
+        terms = fts_terms(query)
+        seen = {(r.kind, r.ref_id) for r in rows}
+        rows += [r for r in _sqlite_rows("search_index MATCH :match",
+                                         {'match': ' OR '.join(f'"{t}"' for t in terms)},
+                                         scope, kinds, order_by_rank=True, limit=TYPO_CANDIDATES)
+                 if (r.kind, r.ref_id) not in seen]
+
+    scored = []
+    for r in rows:
+        score = word_score(query, r.text)
+        if score >= MIN_SCORE:
+            exact = any(w in r.text.lower().split() for w in words)
+            scored.append((r.kind, r.ref_id, round(score, 3), not exact, r.kind != 'farmer', len(r.text)))
+    scored.sort(key=lambda hit: (-hit[2],) + hit[3:])
+    return [hit[:3] for hit in scored]
+
+
+def _contains(query):
+    """LIKE pattern matching `query` anywhere, with its own % and _ taken literally (ESCAPE '\\')."""
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _postgres_candidates(query, kinds, scope, limit):
+    """Ids per kind using pg_trgm word similarity, served by the GIN trigram indexes."""
+    results = []
+    for kind, table, expr, farmer_column in (('farmer', 'farmers', FARMER_SEARCH_TEXT, 'id'),
+                                             ('record', 'drying_records', RECORD_SEARCH_TEXT, 'farmer_id')):
+        if kind not in kinds:
+            continue
+        sql = (f"SELECT id, word_similarity(:q, {expr}) AS score FROM {table} "
+               f"WHERE (:q <% {expr} OR {expr} LIKE :contains ESCAPE '\\') AND barangay_id IN :barangay_ids")
+        params = {'q': query.lower(), 'contains': _contains(query.lower()),
+                  'barangay_ids': scope['barangay_ids'], 'limit': limit}
+        if scope['farmer_id'] is not None:
+            sql += f" AND {farmer_column} = :farmer_id"
+            params['farmer_id'] = scope['farmer_id']
+        sql += " ORDER BY score DESC LIMIT :limit"
+        stmt = text(sql).bindparams(bindparam('barangay_ids', expanding=True))
+        results.extend((kind, row.id, round(float(row.score), 3))
+                       for row in db.session.execute(stmt, params))
+    return sorted(results, key=lambda r: (-r[2], r[0] != 'farmer'))
+
+
+def _fallback_candidates(query, kinds, scope, limit):
+    """Plain substring search for databases without a search index."""
+    pattern = _contains(query)
+    results = []
+    if 'farmer' in kinds:
+        farmers = Farmer.query.filter(Farmer.barangay_id.in_(scope['barangay_ids'])).filter(or_(
+            Farmer.first_name.ilike(pattern, escape='\\'), Farmer.middle_name.ilike(pattern, escape='\\'),
+            Farmer.last_name.ilike(pattern, escape='\\'), Farmer.username.ilike(pattern, escape='\\')))
+        if scope['farmer_id'] is not None:
+            farmers = farmers.filter(Farmer.id == scope['farmer_id'])
+        results.extend(('farmer', f.id, round(word_score(query, f"{f.full_name} {f.username}"), 3))
+                       for f in farmers.limit(limit))
+    if 'record' in kinds:
+        records = DryingRecord.query.filter(DryingRecord.barangay_id.in_(scope['barangay_ids'])).filter(or_(
+            DryingRecord.batch_name.ilike(pattern, escape='\\'), DryingRecord.farmer_name.ilike(pattern, escape='\\')))
+        if scope['farmer_id'] is not None:
+            records = records.filter(DryingRecord.farmer_id == scope['farmer_id'])
+        results.extend(('record', r.id, round(word_score(query, f"{r.batch_name} {r.farmer_name or ''}"), 3))
+                       for r in records.limit(limit))
+    return sorted(results, key=lambda r: (-r[2], r[0] != 'farmer'))
+
+
+def search(user, query, kinds=SEARCH_KINDS, limit=20):
+    """Typo-tolerant, prefix-friendly search over the farmers and records the user can see."""
+    query = (query or '').strip()
+    if not query:
+        return []
+
+    scope = search_scope(user)
+    if not scope['barangay_ids']:
+        return []
+
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        hits = _postgres_candidates(query, kinds, scope, limit)
+    elif dialect == 'sqlite' and _sqlite_has_fts():
+        hits = _sqlite_candidates(query, kinds, scope, limit)
+    else:
+        hits = _fallback_candidates(query, kinds, scope, limit)
+    hits = hits[:limit]
+
+    farmer_ids = [ref_id for kind, ref_id, _ in hits if kind == 'farmer']
+    record_ids = [ref_id for kind, ref_id, _ in hits if kind == 'record']
+    farmers = {f.id: f for f in Farmer.query.filter(Farmer.id.in_(farmer_ids)).all()} if farmer_ids else {}
+    records = {r.id: r for r in DryingRecord.query.filter(DryingRecord.id.in_(record_ids)).all()} if record_ids else {}
+
+    results = []
+    for kind, ref_id, score in hits:
+        if kind == 'farmer' and ref_id in farmers:
+            f = farmers[ref_id]
+            results.append({
+                "type": "farmer",
+                "id": f.id,
+                "uuid": f.uuid,
+                "full_name": f.full_name,
+                "username": f.username,
+                "barangay_id": f.barangay_id,
+                "score": score
+            })
+        elif kind == 'record' and ref_id in records:
+            r = records[ref_id]
+            results.append({
+                "type": "record",
+                "id": r.id,
+                "uuid": r.uuid,
+                "batch_name": r.batch_name,
+                "farmer_name": r.farmer_name,
+                "barangay_id": r.barangay_id,
+                "date_dried": r.date_dried.isoformat() if r.date_dried else None,
+                "score": score
+            })
+    return results
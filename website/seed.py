@@ -0,0 +1,260 @@
+import csv
+import io
+import time
+import uuid
+from datetime import date, datetime
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+
+from .extensions import db
+from .models import Municipality, Barangay, User, Farmer, DryingRecord
+
+MUNICIPALITY_NAMES = [
+    'Tagbilaran', 'Carmen', 'Ubay', 'Talibon', 'Jagna', 'Loboc', 'Tubigon', 'Panglao',
+    'Dauis', 'Baclayon', 'Loay', 'Bilar', 'Batuan', 'Sagbayan', 'Inabanga', 'Trinidad',
+    'Alicia', 'Anda', 'Guindulman', 'Garcia Hernandez', 'Valencia', 'Dimiao', 'Sevilla', 'Balilihan',
+]
+BARANGAY_NAMES = [
+    'Poblacion', 'San Isidro', 'Santa Cruz', 'San Jose', 'Cogon', 'Dao', 'Bool', 'Manga',
+    'Taloto', 'Ubujan', 'Mansasa', 'Tiptip', 'Cabawan', 'Booy', 'San Roque', 'Santo Niño',
+    'Bagumbayan', 'Lourdes', 'Canlongon', 'Tinangnan', 'Mayacabac', 'Bagacay', 'Lundag', 'Tangnan',
+]
+FIRST_NAMES = [
+    'Juan', 'Jose', 'Pedro', 'Maria', 'Ana', 'Rosa', 'Ramon', 'Elena', 'Carlo', 'Liza',
+    'Andres', 'Teresa', 'Felix', 'Gloria', 'Marites', 'Rodel', 'Jun', 'Nestor', 'Lorna', 'Edgar',
+]
+LAST_NAMES = [
+    'Dela Cruz', 'Santos', 'Reyes', 'Garcia', 'Mendoza', 'Torres', 'Flores', 'Ramos',
+    'Bautista', 'Villanueva', 'Aquino', 'Castillo', 'Cabahug', 'Lumayag', 'Bernales', 'Ompad',
+]
+MIDDLE_NAMES = LAST_NAMES + [None] * 8
+
+RECORD_COLUMNS = (
+    'id', 'uuid', 'timestamp', 'batch_name', 'farmer_name', 'initial_weight', 'temperature',
+    'humidity', 'sensor_value', 'initial_moisture', 'final_moisture', 'drying_time',
+    'drying_minutes', 'final_weight', 'date_dried', 'date_planted', 'date_harvested',
+    'due_date', 'created_at', 'user_id', 'farmer_id', 'barangay_id', 'municipality_id',
+)
+
+# Harvest peaks of the two Philippine rice seasons: dry (Mar-Apr) and wet (Oct)
+SEASON_PEAKS = ((3, 25), (10, 15))
+
+
+def _uuids(rng, n):
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    return [str(uuid.UUID(bytes=bytes(row), version=4)) for row in raw]
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _bulk_insert(table, columns, rows):
+    """COPY on Postgres, executemany on the raw DBAPI connection elsewhere."""
+    if not rows:
+        return
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        if db.engine.dialect.name == 'sqlite':
+            cursor.execute('PRAGMA synchronous = OFF')
+        if db.engine.dialect.name == 'postgresql':
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for row in rows:
+                writer.writerow(['\\N' if v is None else v for v in row])
+            buf.seek(0)
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buf)
+        else:
+            placeholders = ', '.join(['?'] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _reset_sequences():
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in ('municipalities', 'barangays', 'users', 'farmers', 'drying_records'):
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"))
+    db.session.commit()
+
+
+def _harvest_days(rng, n, years):
+    """Harvest dates clustered around the two seasonal peaks, as days since the epoch."""
+    this_year = date.today().year
+    year = rng.integers(this_year - years + 1, this_year + 1, n)
+    season = rng.integers(0, len(SEASON_PEAKS), n)
+    peaks = np.array([[date(y, m, d).toordinal() for m, d in SEASON_PEAKS]
+                      for y in range(this_year - years + 1, this_year + 1)])
+    peak = peaks[year - (this_year - years + 1), season]
+    epoch = date(1970, 1, 1).toordinal()
+    days = peak - epoch + np.rint(rng.normal(0, 18, n)).astype(np.int64)
+    # Nothing harvested in the future
+    return np.minimum(days, date.today().toordinal() - epoch)
+
+
+def _iso(days):
+    return (np.datetime64('1970-01-01') + days.astype('timedelta64[D]')).astype(str).tolist()
+
+
+def _record_rows(rng, n, start_id, farmers, years):
+    """One chunk of plausible drying records as tuples in RECORD_COLUMNS order."""
+    pick = rng.integers(0, len(farmers['id']), n)
+
+    harvested = _harvest_days(rng, n, years)
+    planted = harvested - rng.integers(100, 125, n)
+    dried = np.minimum(harvested + rng.integers(1, 5, n), date.today().toordinal() - date(1970, 1, 1).toordinal())
+    due = harvested + 3
+
+    wet_season = np.isin((np.datetime64('1970-01-01') + harvested.astype('timedelta64[D]'))
+                         .astype('datetime64[M]').astype(int) % 12 + 1, (9, 10, 11, 12))
+    initial_moisture = np.clip(rng.normal(np.where(wet_season, 26, 22), 2.0), 17, 34).round(1)
+    final_moisture = np.clip(rng.normal(14, 0.9, n), 11, 19).round(1)
+    temperature = np.clip(rng.normal(np.where(wet_season, 29, 33), 2.5), 22, 42).round(1)
+    humidity = np.clip(rng.normal(np.where(wet_season, 80, 65), 7), 35, 98).round(1)
+
+    initial_weight = np.clip(rng.lognormal(np.log(400), 0.6, n), 20, 5000).round(1)
+    # Dry matter is conserved, so final weight follows from the two moisture readings
+    final_weight = (initial_weight * (100 - initial_moisture) / (100 - final_moisture)
+                    * rng.normal(1.0, 0.01, n)).round(1)
+
+    hours = np.clip(2 + 0.9 * (initial_moisture - final_moisture)
+                    - 0.15 * (temperature - 30) + 0.04 * (humidity - 60)
+                    + rng.normal(0, 1.0, n), 1, None)
+    drying_minutes = (hours * 60).round()
+    drying_time = np.char.mod('%.1f hours', hours.round(1)).tolist()
+    sensor_value = np.clip(1023 - final_moisture * 35 + rng.normal(0, 15, n), 0, 1023).round()
+
+    farmer_id = farmers['id'][pick]
+    barangay_id = farmers['barangay_id'][pick]
+    names = farmers['name']
+    farmer_names = [names[i] for i in pick.tolist()]
+    batch_numbers = rng.integers(1, 40, n).tolist()
+
+    dried_iso = _iso(dried)
+    # Entered the evening of drying, but never later than now: data versions key on created_at
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    created = [min(f"{d} 17:00:00", now) for d in dried_iso]
+
+    return list(zip(
+        range(start_id, start_id + n),
+        _uuids(rng, n),
+        created,
+        [f"Batch {b}" for b in batch_numbers],
+        farmer_names,
+        initial_weight.tolist(),
+        temperature.tolist(),
+        humidity.tolist(),
+        sensor_value.tolist(),
+        initial_moisture.tolist(),
+        final_moisture.tolist(),
+        drying_time,
+        drying_minutes.tolist(),
+        final_weight.tolist(),
+        dried_iso,
+        _iso(planted),
+        _iso(harvested),
+        _iso(due),
+        created,
+        farmers['user_id'][pick].tolist(),
+        farmer_id.tolist(),
+        barangay_id.tolist(),
+        farmers['municipality_id'][pick].tolist(),
+    ))
+
+
+@click.command('seed')
+@click.option('--municipalities', default=2, show_default=True, help='Municipalities to create.')
+@click.option('--barangays', default=10, show_default=True, help='Barangays per municipality.')
+@click.option('--farmers', default=50, show_default=True, help='Farmers per barangay.')
+@click.option('--records', default=10000, show_default=True, help='Drying records in total.')
+@click.option('--years', default=3, show_default=True, help='Seasons span this many years up to today.')
+@click.option('--seed', 'seed_value', default=0, show_default=True, help='Random seed; same seed, same data.')
+@click.option('--password', default='password', show_default=True, help='Password for every seeded account.')
+@click.option('--chunk-size', default=50000, show_default=True, help='Records generated and inserted per batch.')
+@with_appcontext
+def seed_command(municipalities, barangays, farmers, records, years, seed_value, password, chunk_size):
+    """Generate a synthetic municipality -> barangay -> farmer -> record hierarchy."""
+    started = time.perf_counter()
+    password_hash = generate_password_hash(password)
+    tag = f"s{seed_value}"
+
+    # Reference data
+    m_start, b_start, u_start, f_start = (_next_id(Municipality), _next_id(Barangay),
+                                          _next_id(User), _next_id(Farmer))
+    # An empty database always gets the same data for a seed; seeding on top of
+    # existing rows shifts the stream so uuids do not collide with the first run.
+    rng = np.random.default_rng([seed_value, f_start])
+    municipality_rows, barangay_rows, user_rows = [], [], []
+    barangay_municipality, barangay_user = {}, {}
+
+    for mi in range(municipalities):
+        m_id = m_start + mi
+        base = MUNICIPALITY_NAMES[mi % len(MUNICIPALITY_NAMES)]
+        municipality_rows.append((m_id, f"{base} {tag}-{m_id}"))
+        user_rows.append((u_start + len(user_rows), f"municipal{m_id}.{tag}@seed.local", 'Municipal Officer',
+                          'municipal', password_hash, m_id, None))
+        for bi in range(barangays):
+            b_id = b_start + len(barangay_rows)
+            barangay_rows.append((b_id, f"{BARANGAY_NAMES[bi % len(BARANGAY_NAMES)]} {bi + 1}", m_id))
+            u_id = u_start + len(user_rows)
+            user_rows.append((u_id, f"barangay{b_id}.{tag}@seed.local", 'Barangay Officer',
+                              'barangay', password_hash, None, b_id))
+            barangay_municipality[b_id] = m_id
+            barangay_user[b_id] = u_id
+
+    _bulk_insert('municipalities', ('id', 'name'), municipality_rows)
+    _bulk_insert('barangays', ('id', 'name', 'municipality_id'), barangay_rows)
+    _bulk_insert('users', ('id', 'email', 'full_name', 'role', 'password', 'municipality_id', 'barangay_id'),
+                 user_rows)
+
+    n_farmers = len(barangay_rows) * farmers
+    farmer_ids = np.arange(f_start, f_start + n_farmers)
+    farmer_barangays = np.repeat([row[0] for row in barangay_rows], farmers)
+    firsts = rng.choice(FIRST_NAMES, n_farmers).tolist()
+    lasts = rng.choice(LAST_NAMES, n_farmers).tolist()
+    middles = [MIDDLE_NAMES[i] for i in rng.integers(0, len(MIDDLE_NAMES), n_farmers).tolist()]
+    farmer_uuids = _uuids(rng, n_farmers)
+    farmer_rows = [
+        (int(fid), farmer_uuids[i], firsts[i], middles[i], lasts[i],
+         f"{firsts[i].lower()}{fid}.{tag}", password_hash, int(farmer_barangays[i]),
+         barangay_user[int(farmer_barangays[i])])
+        for i, fid in enumerate(farmer_ids.tolist())
+    ]
+    for start in range(0, len(farmer_rows), chunk_size):
+        _bulk_insert('farmers', ('id', 'uuid', 'first_name', 'middle_name', 'last_name', 'username',
+                                 'password', 'barangay_id', 'user_id'),
+                     farmer_rows[start:start + chunk_size])
+    click.echo(f"{municipalities} municipalities, {len(barangay_rows)} barangays, "
+               f"{len(user_rows)} users, {n_farmers} farmers")
+
+    farmer_info = {
+        'id': farmer_ids,
+        'barangay_id': farmer_barangays,
+        'user_id': np.array([barangay_user[b] for b in farmer_barangays.tolist()]),
+        'municipality_id': np.array([barangay_municipality[b] for b in farmer_barangays.tolist()]),
+        'name': [f"{firsts[i]} {middles[i] + ' ' if middles[i] else ''}{lasts[i]}" for i in range(n_farmers)],
+    }
+
+    # Drying records, generated and loaded a chunk at a time to bound memory
+    r_start = _next_id(DryingRecord)
+    done = 0
+    while done < records and n_farmers:
+        n = min(chunk_size, records - done)
+        _bulk_insert('drying_records', RECORD_COLUMNS,
+                     _record_rows(rng, n, r_start + done, farmer_info, years))
+        done += n
+        elapsed = time.perf_counter() - started
+        click.echo(f"  {done:,}/{records:,} records ({done / elapsed:,.0f}/s)")
+
+    _reset_sequences()
+    click.echo(f"Seeded in {time.perf_counter() - started:.1f}s. "
+               f"Log in as municipal{m_start}.{tag}@seed.local / {password}")
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from .models import DryingRecord, Farmer, User, Barangay
+from .extensions import db
+from .bootstrap import scope_key, build_bundle, reference_version
+from .metrics import record_cache
+from .scope import record_version
+
+SNAPSHOT_SCHEMA_VERSION = 1
+REBUILD_INTERVAL = 60     # seconds between builds of one scope while its data keeps changing
+
+RECORD_COLUMNS = (
+    'uuid', 'batch_name', 'farmer_name', 'initial_weight', 'temperature', 'humidity',
+    'sensor_value', 'initial_moisture', 'final_moisture', 'drying_time', 'drying_minutes',
+    'final_weight', 'date_planted', 'date_harvested', 'due_date', 'date_dried',
+    'farmer_id', 'user_id', 'barangay_id', 'municipality_id', 'created_at', 'updated_at',
+)
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE municipalities (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE barangays (id INTEGER PRIMARY KEY, name TEXT NOT NULL, municipality_id INTEGER);
+CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT, full_name TEXT, role TEXT,
+                    barangay_id INTEGER, municipality_id INTEGER);
+CREATE TABLE farmers (uuid TEXT PRIMARY KEY, username TEXT, first_name TEXT, middle_name TEXT,
+                      last_name TEXT, barangay_id INTEGER);
+CREATE TABLE drying_records (
+    uuid TEXT PRIMARY KEY, batch_name TEXT, farmer_name TEXT, initial_weight REAL,
+    temperature REAL, humidity REAL, sensor_value REAL, initial_moisture REAL,
+    final_moisture REAL, drying_time TEXT, drying_minutes REAL, final_weight REAL,
+    date_planted TEXT, date_harvested TEXT, due_date TEXT, date_dried TEXT,
+    farmer_id INTEGER, user_id INTEGER, barangay_id INTEGER, municipality_id INTEGER,
+    created_at TEXT, updated_at TEXT, farmer_uuid TEXT
+);
+CREATE INDEX ix_drying_records_farmer_uuid ON drying_records (farmer_uuid);
+"""
+
+_building = set()
+_lock = threading.Lock()
+
+
+def snapshot_dir(app):
+    path = app.config.get('SNAPSHOT_DIR') or os.path.join(app.instance_path, 'snapshots')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def scoped_records(role, owner_id, barangay_id, municipality_id):
+    query = DryingRecord.query
+    if role == 'farmer':
+        return query.filter(DryingRecord.farmer_id == owner_id)
+    if role == 'barangay':
+        return query.filter(DryingRecord.barangay_id == barangay_id)
+    return query.join(Barangay, DryingRecord.barangay_id == Barangay.id) \
+                .filter(Barangay.municipality_id == municipality_id)
+
+
+def data_version(user):
+    """(record count, latest created/updated time) for the user's scope; changes whenever its records do."""
+    count, watermark = db.session.execute(record_version(user)).one()
+    return count, watermark
+
+
+def snapshot_name(scope, count, watermark, reference):
+    """File name for one version of a scope: its records' data version and the reference data version."""
+    digest = hashlib.sha1(
+        f"{SNAPSHOT_SCHEMA_VERSION}|{scope}|{count}|{watermark}|{reference}".encode()
+    ).hexdigest()[:16]
+    return f"{scope[0]}-{scope[1]}-{digest}.sqlite"
+
+
+def _newest(directory, scope):
+    """Path of the most recently completed snapshot of a scope, or None."""
+    prefix = f"{scope[0]}-{scope[1]}-"
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)
+             if name.startswith(prefix) and name.endswith('.sqlite')]
+    best = None
+    for path in paths:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue  # replaced by a newer build meanwhile
+        if best is None or mtime > best[0]:
+            best = (mtime, path)
+    return best[1] if best else None
+
+
+def _stored_watermark(path):
+    """The watermark a snapshot file was built at, from its meta table."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+    finally:
+        conn.close()
+    return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+
+def _owner(role, owner_id):
+    if role == 'farmer':
+        return Farmer.query.get(owner_id)
+    return User.query.get(owner_id)
+
+
+def build_snapshot(app, role, owner_id):
+    """Write the scope's reference data and records to a fresh SQLite file in the snapshot dir."""
+    with app.app_context():
+        owner = _owner(role, owner_id)
+        scope = scope_key(owner)
+        scope_args = (role, owner.id, owner.barangay_id, getattr(owner, 'municipality_id', None))
+        count, watermark = data_version(owner)
+        reference = reference_version()
+
+        directory = snapshot_dir(app)
+        name = snapshot_name(scope, count, watermark, reference)
+        path = os.path.join(directory, name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        bundle = build_bundle(owner)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript(SCHEMA)
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('schema_version', str(SNAPSHOT_SCHEMA_VERSION)),
+                ('scope', f"{scope[0]}:{scope[1]}"),
+                ('record_count', str(count)),
+                ('watermark', watermark.isoformat() if watermark else ''),
+                ('reference_version', str(reference)),
+                ('built_at', datetime.utcnow().isoformat()),
+            ])
+            if bundle['municipality']:
+                conn.execute("INSERT INTO municipalities VALUES (?, ?)",
+                             (bundle['municipality']['id'], bundle['municipality']['name']))
+            conn.executemany("INSERT INTO barangays VALUES (:id, :name, :municipality_id)", bundle['barangays'])
+            conn.executemany("INSERT INTO users VALUES (:id, :email, :full_name, :role, :barangay_id, :municipality_id)",
+                             bundle['users'])
+            conn.executemany("INSERT INTO farmers VALUES (:uuid, :username, :first_name, :middle_name, :last_name, :barangay_id)",
+                             bundle['farmers'])
+
+            columns = [getattr(DryingRecord, c) for c in RECORD_COLUMNS]
+            rows = scoped_records(*scope_args) \
+                .outerjoin(Farmer, DryingRecord.farmer_id == Farmer.id) \
+                .with_entities(*columns, Farmer.uuid) \
+                .execution_options(yield_per=2000)
+            placeholders = ', '.join('?' * (len(RECORD_COLUMNS) + 1))
+            batch = []
+            for row in rows:
+                batch.append(tuple(v.isoformat() if hasattr(v, 'isoformat') else v for v in row))
+                if len(batch) >= 2000:
+                    conn.executemany(f"INSERT INTO drying_records VALUES ({placeholders})", batch)
+                    batch = []
+            if batch:
+                conn.executemany(f"INSERT INTO drying_records VALUES ({placeholders})", batch)
+            conn.commit()
+        finally:
+            conn.close()
+        db.session.remove()
+
+        os.replace(tmp_path, path)
+
+        # Older versions of this scope are no longer useful
+        prefix = f"{scope[0]}-{scope[1]}-"
+        for other in os.listdir(directory):
+            if other.startswith(prefix) and other.endswith('.sqlite') and other != name:
+                try:
+                    os.remove(os.path.join(directory, other))
+                except OSError:
+                    pass
+        return path
+
+
+def _build_in_background(app, role, owner_id, key):
+    try:
+        build_snapshot(app, role, owner_id)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+    finally:
+        with _lock:
+            _building.discard(key)
+
+
+def current_snapshot(app, user):
+    """(path, watermark) of the newest snapshot for the user's scope, or (None, None) while the first builds.
+
+    An out-of-date snapshot is still served, with the watermark it was built at,
+    while a fresh one builds: under steady sync traffic the version moves on
+    before any build finishes, and `/api/fetch?since=` covers the gap anyway.
+    """
+    scope = scope_key(user)
+    count, watermark = data_version(user)
+    directory = snapshot_dir(app)
+    path = os.path.join(directory, snapshot_name(scope, count, watermark, reference_version()))
+    if os.path.exists(path):
+        record_cache('snapshot', True)
+        return path, watermark
+    record_cache('snapshot', False)
+
+    newest = _newest(directory, scope)
+    try:
+        stale = (newest, _stored_watermark(newest)) if newest else (None, None)
+        age = time.time() - os.path.getmtime(newest) if newest else None
+    except (OSError, sqlite3.Error):
+        stale, age = (None, None), None   # removed by a newer build just now; the client retries
+
+    if age is None or age >= REBUILD_INTERVAL:
+        with _lock:
+            start = scope not in _building
+            _building.add(scope)
+        if start:
+            threading.Thread(target=_build_in_background,
+                             args=(app, user.role, user.id, scope),
+                             daemon=True).start()
+    return stale
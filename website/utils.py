@@ -0,0 +1,55 @@
+import re
+
+IN_CHUNK = 500  # values per IN (...) list, well under SQLite's bound-parameter limit
+
+# Unit words a device or officer might type after a number, mapped to minutes
+DURATION_UNITS = {
+    'd': 1440, 'day': 1440, 'days': 1440,
+    'h': 60, 'hr': 60, 'hrs': 60, 'hour': 60, 'hours': 60,
+    'm': 1, 'min': 1, 'mins': 1, 'minute': 1, 'minutes': 1,
+    's': 1 / 60, 'sec': 1 / 60, 'secs': 1 / 60, 'second': 1 / 60, 'seconds': 1 / 60,
+}
+
+# A bare number right after a unit counts in the next smaller one: "2h30" is 2 h 30 min
+NEXT_UNIT = {1440: 60, 60: 1, 1: 1 / 60}
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)\s*([a-z]*)')
+
+
+def parse_drying_minutes(value):
+    """Turn a free-form drying time ("48 hours", "2h 30m", "1:45", "3.5") into minutes.
+
+    Bare numbers are read as hours, which is what the devices and the add-record
+    form send, except right after a unit ("2h30", "1 hr 30"), where they take the
+    next smaller unit. Returns None when nothing sensible can be parsed.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) * 60 if value >= 0 else None
+
+    text = str(value).strip().lower()
+    if not text:
+        return None
+
+    # "HH:MM" or "HH:MM:SS"
+    if re.fullmatch(r'\d+:\d{1,2}(:\d{1,2})?', text):
+        parts = [int(p) for p in text.split(':')]
+        minutes = parts[0] * 60 + parts[1]
+        if len(parts) == 3:
+            minutes += parts[2] / 60
+        return float(minutes)
+
+    total = 0.0
+    found = False
+    previous = None
+    for number, unit in DURATION_PART.findall(text):
+        if unit and unit not in DURATION_UNITS:
+            previous = None
+            continue
+        scale = DURATION_UNITS[unit] if unit else NEXT_UNIT.get(previous, 60)
+        total += float(number) * scale
+        previous = scale
+        found = True
+
+    return total if found else None
@@ -1,13 +1,47 @@
-from flask import Blueprint, render_template, redirect, url_for, request, jsonify, session
+from flask import (Blueprint, render_template, stream_template, redirect, url_for, request, jsonify, session,
+                   Response, send_file, current_app, abort)
 from flask_login import login_required, current_user
 from .models import DryingRecord, Farmer, Municipality, Barangay, User
 from .extensions import db
+from .utils import parse_drying_minutes
+from .analytics import drying_rates_by_barangay, distribution_for_user, SAFE_STORAGE_MOISTURE
+from . import prediction
+from .schedule import due_schedule, DEFAULT_WINDOW_DAYS
+from .bulk import record_scope
+from .scope import record_rows, any_record, farmer_rows, any_farmer, barangay_names
+from .charts import PERIODS
+from .reports import season_report, read_report_html, available_seasons, current_season, parse_season
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
 
 views = Blueprint('views', __name__)
 
+# Rows fetched per round trip on listing pages, and HTML buffered per write
+STREAM_ROWS = 500
+STREAM_BUFFER = 16 * 1024
+
+
+def stream_page(template_name, **context):
+    """Send a listing page while it renders instead of building it in memory first.
+
+    Pass queries with yield_per() so rows are pulled from a server-side cursor as
+    the template loops; only one chunk of rows and HTML is held at a time.
+    """
+    def buffered(chunks):
+        parts, size = [], 0
+        for chunk in chunks:
+            parts.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_BUFFER:
+                yield ''.join(parts)
+                parts, size = [], 0
+        if parts:
+            yield ''.join(parts)
+
+    return Response(buffered(stream_template(template_name, **context)), mimetype='text/html')
+
+
 @views.route('/')
 @login_required
 def dashboard():
@@ -17,36 +51,15 @@ def dashboard():
             print("Municipality not set for user")
             return redirect(url_for('auth.login'))
 
-        barangays = Barangay.query.filter_by(municipality_id=municipality.id).all()
-        barangay_data = {}
-        for barangay in barangays:
-            barangay_data[barangay.name] = {
-                'initial_weight': sum(record.initial_weight for record in barangay.drying_records),
-                'final_weight': sum(record.final_weight for record in barangay.drying_records)
-            }
-
         return render_template('dashboard.html', 
-                               monthly_data=barangay_data, 
+                               barangay_names=dict(db.session.execute(barangay_names(municipality.id)).all()),
                                user=current_user, 
                                is_municipal=True,
                                view_type='barangay_bar')  
     elif current_user.role == 'barangay':
         return redirect(url_for('views.barangay_dashboard'))
     elif current_user.role == 'farmer':
-        records = DryingRecord.query.filter_by(farmer_id=current_user.id).all()
-        batch_data = {}
-        for record in records:
-            batch = record.batch_name or "(Unnamed Batch)"
-            if batch not in batch_data:
-                batch_data[batch] = {'initial_weight': 0, 'final_weight': 0}
-            try:
-                batch_data[batch]['initial_weight'] += float(record.initial_weight)
-                batch_data[batch]['final_weight'] += float(record.final_weight)
-            except (ValueError, TypeError):
-                pass
-
         return render_template('dashboard.html', 
-                               monthly_data=batch_data, 
                                user=current_user, 
                                is_municipal=False,
                                view_type='batch_bar')
@@ -61,8 +74,12 @@ def farmers():
     if not hasattr(current_user, "role") or current_user.role != "barangay":
         return redirect(url_for("views.dashboard"))
 
-    farmer_list = Farmer.query.filter_by(barangay_id=current_user.barangay_id).all()
-    return render_template("farmers.html", farmers=farmer_list, user=current_user)
+    has_farmers = db.session.execute(any_farmer(current_user.barangay_id)).first() is not None
+    return stream_page("farmers.html",
+                       farmers=db.session.execute(farmer_rows(current_user.barangay_id),
+                                                  execution_options={'yield_per': STREAM_ROWS}),
+                       has_farmers=has_farmers,
+                       user=current_user)
 
 
 @views.route("/add-farmer", methods=["POST"])
@@ -98,21 +115,16 @@ def add_farmer():
 @views.route('/records')
 @login_required
 def records():
-    if current_user.role == 'municipal':
-        records = DryingRecord.query.join(Barangay).filter(Barangay.municipality_id == current_user.municipality_id).order_by(DryingRecord.timestamp.desc()).all()
-    elif current_user.role == 'barangay':
-        records = DryingRecord.query \
-            .filter_by(barangay_id=current_user.barangay_id) \
-            .order_by(DryingRecord.timestamp.desc()).all()
-    elif current_user.role == 'farmer':
-        records = DryingRecord.query \
-            .filter_by(farmer_id=current_user.id) \
-            .order_by(DryingRecord.timestamp.desc()).all()
-    else:
+    if current_user.role not in ('municipal', 'barangay', 'farmer'):
         # Unknown role
-        records = []
+        return render_template('records.html', records=[], has_records=False, user=current_user)
 
-    return render_template('records.html', records=records, user=current_user)
+    has_records = db.session.execute(any_record(current_user)).first() is not None
+    return stream_page('records.html',
+                       records=db.session.execute(record_rows(current_user),
+                                                  execution_options={'yield_per': STREAM_ROWS}),
+                       has_records=has_records,
+                       user=current_user)
 
 
 @views.route('/add_record', methods=['GET', 'POST'])
@@ -127,7 +139,7 @@ def add_record():
     farmers = None
 
     if current_user.role == 'barangay':
-        farmers = Farmer.query.filter_by(barangay_id=current_user.barangay_id).all()
+        farmers = db.session.execute(farmer_rows(current_user.barangay_id)).all()
 
     if request.method == 'POST':
         record_farmer_id_str = request.form.get('farmer_id')
@@ -139,17 +151,17 @@ def add_record():
             target_farmer = current_user
         elif current_user.role == 'barangay':
             if not record_farmer_id_str:
-                farmers = Farmer.query.filter_by(barangay_id=current_user.barangay_id).all()
+                farmers = db.session.execute(farmer_rows(current_user.barangay_id)).all()
                 return render_template('add_record.html', farmers=farmers, user=current_user)
 
             try:
                 record_farmer_id = int(record_farmer_id_str)
                 target_farmer = Farmer.query.get(record_farmer_id)
                 if not target_farmer or target_farmer.barangay_id != current_user.barangay_id:
-                    farmers = Farmer.query.filter_by(barangay_id=current_user.barangay_id).all()
+                    farmers = db.session.execute(farmer_rows(current_user.barangay_id)).all()
                     return render_template('add_record.html', farmers=farmers, user=current_user)
             except (ValueError, TypeError):
-                farmers = Farmer.query.filter_by(barangay_id=current_user.barangay_id).all()
+                farmers = db.session.execute(farmer_rows(current_user.barangay_id)).all()
                 return render_template('add_record.html', farmers=farmers, user=current_user)
 
         if current_user.role == 'farmer':
@@ -184,6 +196,7 @@ def add_record():
             initial_moisture=initial_moisture,
             final_moisture=final_moisture,
             drying_time=drying_time,
+            drying_minutes=parse_drying_minutes(drying_time),
             farmer_id=record_farmer_id,
             farmer_name=record_farmer_name,
             barangay_id=record_barangay_id,
@@ -194,7 +207,9 @@ def add_record():
             date_dried=date_dried
         )
         db.session.add(new_record)
+        observed = prediction.observed([new_record])
         db.session.commit()
+        prediction.observe(observed)
         return redirect(url_for('views.records'))
 
     return render_template('add_record.html', farmers=farmers, user=current_user)
@@ -204,47 +219,13 @@ def add_record():
 @login_required
 def barangay_dashboard():
     if current_user.role == 'municipal':
-        records = DryingRecord.query.all()
-        barangay_data = {}
-        for record in records:
-            barangay = record.barangay_id
-            if not barangay:
-                continue 
-            if barangay not in barangay_data:
-                barangay_data[barangay] = {'initial_weight': 0, 'final_weight': 0}
-            
-            try:
-                barangay_data[barangay]['initial_weight'] += float(record.initial_weight)
-                barangay_data[barangay]['final_weight'] += float(record.final_weight)
-            except (ValueError, TypeError):
-                pass 
-
         return render_template('dashboard.html', 
-                               monthly_data=barangay_data, 
                                user=current_user, 
                                is_municipal=True,
                                view_type='total') 
 
     elif current_user.role == 'barangay':
-        records = DryingRecord.query.filter_by(barangay_id=current_user.barangay_id).all()
-        farmer_data = {}
-
-        for record in records:
-            if not record.farmer_name:
-                continue
-            farmer_name = record.farmer_name
-
-            if farmer_name not in farmer_data:
-                farmer_data[farmer_name] = {'initial_weight': 0, 'final_weight': 0}
-            
-            try:
-                farmer_data[farmer_name]['initial_weight'] += float(record.initial_weight)
-                farmer_data[farmer_name]['final_weight'] += float(record.final_weight)
-            except (ValueError, TypeError):
-                pass
-
         return render_template('dashboard.html', 
-                               monthly_data=farmer_data, 
                                user=current_user, 
                                is_municipal=False,
                                view_type='farmer_bar')  
@@ -259,45 +240,16 @@ def barangay_analytics():
     if current_user.role != 'barangay':
         return redirect(url_for('views.dashboard'))
 
-    time_period = request.args.get('period', 'month')  
-    records = DryingRecord.query.filter_by(barangay_id=current_user.barangay_id).all()
-
-    analytics_data = {}
-
-
-    for record in records:
-        if record.date_dried:
-            if time_period == 'month':
-                key = record.date_dried.strftime('%b %Y')
-            else:
-                key = record.date_dried.strftime('%Y')
+    time_period = request.args.get('period', 'month')
+    if time_period not in PERIODS:
+        time_period = 'month'
 
-            if key not in analytics_data:
-                analytics_data[key] = 0
-            try:
-                analytics_data[key] += float(record.final_weight)
-            except (ValueError, TypeError):
-                pass
-
-    try:
-        if time_period == 'month':
-            sorted_keys = sorted(analytics_data.keys(), 
-                               key=lambda d: (datetime.strptime(d, '%b %Y').year, 
-                                            datetime.strptime(d, '%b %Y').month))
-        else:
-            sorted_keys = sorted(analytics_data.keys(), key=int)
-        
-
-        sorted_labels = sorted_keys
-        sorted_values = [analytics_data[key] for key in sorted_keys]
-    except ValueError:
-        sorted_labels = list(analytics_data.keys())
-        sorted_values = list(analytics_data.values())
+    distribution = distribution_for_user(current_user)
 
     return render_template('barangay_analytics.html',
-                           analytics_labels=sorted_labels,
-                           analytics_values=sorted_values,
                            time_period=time_period,
+                           distribution=distribution,
+                           safe_moisture=SAFE_STORAGE_MOISTURE,
                            user=current_user)
 
 
@@ -311,56 +263,22 @@ def farmer_analytics():
         else:
             return redirect(url_for('auth.login'))
 
-    time_period = request.args.get('period', 'month')  
-    records = DryingRecord.query.filter_by(farmer_id=current_user.id).all()
-
-    analytics_data = {}
-
-
-    for record in records:
-        if record.date_dried:
-            if time_period == 'month':
-                key = record.date_dried.strftime('%b %Y')
-            else:
-                key = record.date_dried.strftime('%Y')
-
-            if key not in analytics_data:
-                analytics_data[key] = 0
-            try:
-                analytics_data[key] += float(record.final_weight)
-            except (ValueError, TypeError):
-                pass
-
-
-    try:
-        if time_period == 'month':
-            sorted_keys = sorted(analytics_data.keys(), 
-                               key=lambda d: (datetime.strptime(d, '%b %Y').year, 
-                                            datetime.strptime(d, '%b %Y').month))
-        else:
-            sorted_keys = sorted(analytics_data.keys(), key=int)
-        
-
-        sorted_labels = sorted_keys
-        sorted_values = [analytics_data[key] for key in sorted_keys]
-    except ValueError:
-        sorted_labels = list(analytics_data.keys())
-        sorted_values = list(analytics_data.values())
+    time_period = request.args.get('period', 'month')
+    if time_period not in PERIODS:
+        time_period = 'month'
 
     return render_template('farmer_analytics.html',
-                           analytics_labels=sorted_labels,
-                           analytics_values=sorted_values,
                            time_period=time_period,
                            user=current_user)
 
 
-@login_required
 @views.route('/edit_record/<int:record_id>', methods=['GET', 'POST'])
+@login_required
 def edit_record(record_id):
     if current_user.role == 'municipal':
         return redirect(url_for('views.records'))
     
-    record = DryingRecord.query.get_or_404(record_id)
+    record = DryingRecord.query.filter(DryingRecord.id == record_id, record_scope(current_user)).first_or_404()
     if request.method == 'POST':
         record.batch_name = request.form['batch_name']
         record.initial_weight = request.form['initial_weight']
@@ -376,7 +294,11 @@ def edit_record(record_id):
 @views.route('/delete_record/<int:record_id>', methods=['POST'])
 @login_required
 def delete_record(record_id):
-    record = DryingRecord.query.get_or_404(record_id)
+    # Same rule as edit_record and /api/records/bulk: municipal accounts only view records
+    if current_user.role == 'municipal':
+        return redirect(url_for('views.records'))
+
+    record = DryingRecord.query.filter(DryingRecord.id == record_id, record_scope(current_user)).first_or_404()
     db.session.delete(record)
     db.session.commit()
     return redirect(url_for('views.records'))
@@ -386,49 +308,33 @@ def delete_record(record_id):
 def analytics():
     if current_user.role == 'municipal':
         view_type = request.args.get('view', 'year')
+        if view_type not in PERIODS:
+            view_type = 'year'
 
-        records = DryingRecord.query.join(Barangay).filter(
-            Barangay.municipality_id == current_user.municipality_id
-        ).all()
-
-        analytics_data = {}
-
-        for record in records:
-            if record.date_dried:
-                if view_type == 'month':
-                    key = record.date_dried.strftime('%b %Y')
-                else:
-                    key = record.date_dried.strftime('%Y')
-
-                if key not in analytics_data:
-                    analytics_data[key] = 0
-                try:
-                    analytics_data[key] += float(record.final_weight)
-                except (ValueError, TypeError):
-                    pass
-
-        try:
-            if view_type == 'month':
-                sorted_keys = sorted(analytics_data.keys(), 
-                                   key=lambda d: (datetime.strptime(d, '%b %Y').year, 
-                                                datetime.strptime(d, '%b %Y').month))
-            else:
-                sorted_keys = sorted(analytics_data.keys(), key=int)
-            
-
-            sorted_labels = sorted_keys
-            sorted_values = [analytics_data[key] for key in sorted_keys]
-        except Exception:
-            sorted_labels = list(analytics_data.keys())
-            sorted_values = list(analytics_data.values())
+        drying_rates = drying_rates_by_barangay(current_user.municipality_id)
+        distribution = distribution_for_user(current_user)
 
         return render_template('analytics.html', 
-                               analytics_labels=sorted_labels,
-                               analytics_values=sorted_values,
                                view_type=view_type,
+                               drying_rates=drying_rates,
+                               distribution=distribution,
+                               safe_moisture=SAFE_STORAGE_MOISTURE,
                                user=current_user)
 
 
+@views.route('/schedule')
+@login_required
+def schedule():
+    try:
+        start = datetime.strptime(request.args.get('start'), '%Y-%m-%d').date() if request.args.get('start') else None
+    except ValueError:
+        start = None
+    days = request.args.get('days', DEFAULT_WINDOW_DAYS, type=int)
+
+    schedule_data = due_schedule(current_user, start, days)
+    return render_template('schedule.html', schedule=schedule_data, user=current_user)
+
+
 @views.route('/municipality_dashboard/<int:municipality_id>')
 @login_required
 def municipality_dashboard(municipality_id):
@@ -451,5 +357,43 @@ def municipality_analytics(municipality_id):
     return render_template('analytics.html', records=drying_records)
 
 
+def _report_season():
+    season = request.args.get('season') or current_season()
+    try:
+        parse_season(season)
+    except ValueError:
+        abort(400)
+    return season
+
+
+@views.route('/reports')
+@login_required
+def reports():
+    if current_user.role != 'municipal':
+        return redirect(url_for('views.dashboard'))
+
+    seasons = available_seasons(current_user.municipality_id)
+    season = request.args.get('season') or (seasons[0] if seasons else current_season())
+    if season not in seasons:
+        seasons.insert(0, season)
+    return render_template('reports.html', seasons=seasons, season=season, user=current_user)
+
+
+@views.route('/reports/season.html')
+@login_required
+def report_html():
+    if current_user.role != 'municipal':
+        abort(403)
+    path = season_report(current_app._get_current_object(), current_user.municipality_id, _report_season())
+    return Response(read_report_html(path), mimetype='text/html')
 
 
+@views.route('/reports/season.zip')
+@login_required
+def report_download():
+    if current_user.role != 'municipal':
+        abort(403)
+    season = _report_season()
+    path = season_report(current_app._get_current_object(), current_user.municipality_id, season)
+    return send_file(path, mimetype='application/zip', as_attachment=True,
+                     download_name=f'season-report-{season}.zip', conditional=True)
@@ -0,0 +1,58 @@
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+from .extensions import db
+from . import prediction
+
+WARMUP_CONNECTIONS = 2    # pooled connections opened per process before it takes traffic
+
+
+def _timed(steps, name, fn):
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        # A cold cache is slower, not broken: never keep a worker from booting
+        print(f"Warmup step {name} failed: {e}")
+    steps[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _connections(app):
+    count = app.config.get('WARMUP_CONNECTIONS', WARMUP_CONNECTIONS)
+    conns = []
+    try:
+        for _ in range(count):
+            conn = db.engine.connect()
+            conn.execute(text('SELECT 1'))
+            conns.append(conn)
+    finally:
+        # Closing hands them back to the pool, still open
+        for conn in conns:
+            conn.close()
+
+
+def _templates(app):
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        app.jinja_env.get_template(name)
+
+
+def warmup(app):
+    """Do the work the first requests would otherwise pay for; returns milliseconds per step.
+
+    Safe to call more than once: later calls find everything cached and only
+    refill the connection pool. Under gunicorn with preload_app the master calls
+    it before forking (so workers inherit compiled templates and fitted models)
+    and disposes its connections; each worker then calls it again to open its own.
+    """
+    steps = {}
+    with app.app_context():
+        _timed(steps, 'mappers', configure_mappers)
+        _timed(steps, 'routes', app.url_map.update)
+        _timed(steps, 'templates', lambda: _templates(app))
+        _timed(steps, 'db', lambda: _connections(app))
+        # The municipality-wide drying time model is the fallback for every barangay
+        _timed(steps, 'prediction', lambda: prediction.get_model(None))
+        db.session.remove()
+    return steps